@@ -0,0 +1,2006 @@
+# mui_core.py
+# 菜单数据结构与 C 代码生成器，不依赖 Qt，可直接被构建脚本导入
+import os
+import sys
+
+from mui_glyphs import (render_glyph_bitmap, render_glyphs_parallel, crop_glyph, glyph_advances, u8g2_font,
+                        glyph_to_pages, glyph_runs, rle_choose_bits, rle_encode, GlyphCache)
+
+# ---------------- Menu 数据结构 ----------------
+class MenuItem:
+    _id_counter = 1
+    def __init__(self, name="菜单项", is_exec=False, visible=True, parent=None):
+        self.id = MenuItem._id_counter
+        MenuItem._id_counter += 1
+        self.name = name
+        self.is_exec = is_exec
+        self.visible = visible
+        self.parent = parent
+        self.children = []
+        self.cursor_pos = 0
+        self.callback_name = ""
+
+    def add_child(self, child):
+        child.parent = self
+        self.children.append(child)
+        
+        # 检查是否为最后一级菜单（叶子节点）
+        self.check_and_set_leaf_nodes_exec()
+    
+    def check_and_set_leaf_nodes_exec(self):
+        """自动检测并设置最后一级菜单为执行项"""
+        def set_leaf_nodes_exec_recursive(node):
+            if not node.children:  # 叶子节点
+                node.is_exec = True
+            else:
+                node.is_exec = False  # 非叶子节点为子菜单
+                for child in node.children:
+                    set_leaf_nodes_exec_recursive(child)
+        
+        set_leaf_nodes_exec_recursive(self)
+
+# ---------------- 工程设置与序列化 ----------------
+DEFAULT_SETTINGS = {
+    'font_size': '中(12px)',
+    'color_mode': '单色',
+    'preview_size': '实际大小',
+    'bg_color': '#004080',
+    'font_color': '#FFFFFF',
+    'selected_bg': '#FFFFFF',
+    'selected_font': '#000000',
+    'font_family': 'Segoe UI',
+    'emit_font_array': True,
+    'emit_draw_skeleton': True,
+    'emit_cjk_subset': True,
+    'glyph_rle': False,
+    'glyph_page_major': False,
+    'menu_const_table': False,
+    'preshape_labels': False,
+    'u8g2_font': False,
+    'export_no_u8g2': False,
+    'glyph_cache': True,
+    'glyph_cache_dir': '',
+    'glyph_cache_mb': 64,
+    'cjk_charset': 'menu',
+    'u8g2_buffer': 'f',
+    'tft_strip_lines': 16,
+    'tft_strip_bufs': 2,
+    'glyph_workers': 1,
+    'flash_budget': 0,
+    'ram_budget': 0
+}
+
+SETTINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'menu_designer_settings.json')
+
+def serialize_menu(root):
+    """序列化菜单数据为字典格式"""
+    def serialize_node(node):
+        return {
+            'name': node.name,
+            'is_exec': node.is_exec,
+            'visible': node.visible,
+            'callback_name': node.callback_name,
+            'cursor_pos': node.cursor_pos,
+            'children': [serialize_node(child) for child in node.children]
+        }
+
+    if root:
+        return serialize_node(root)
+    else:
+        return None
+
+def deserialize_menu(menu_data):
+    """从字典数据反序列化菜单数据"""
+    def deserialize_node(data, parent=None):
+        node = MenuItem(
+            name=data.get('name', '菜单项'),
+            is_exec=data.get('is_exec', False),
+            visible=data.get('visible', True),
+            parent=parent
+        )
+        node.callback_name = data.get('callback_name', '')
+        node.cursor_pos = data.get('cursor_pos', 0)
+
+        for child_data in data.get('children', []):
+            child_node = deserialize_node(child_data, node)
+            node.children.append(child_node)
+
+        return node
+
+    if menu_data:
+        return deserialize_node(menu_data)
+    else:
+        return None
+
+def gb2312_level1_chars():
+    """GB2312 一级汉字（16–55 区，共 3755 字）"""
+    out = []
+    for hi in range(0xB0, 0xD8):
+        for lo in range(0xA1, 0xFF):
+            if hi == 0xD7 and lo > 0xF9:
+                break
+            out.append(bytes((hi, lo)).decode('gb2312'))
+    return out
+
+def load_project(path):
+    """读取工程设置文件，返回 (settings, menu_root)"""
+    import json
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(data)
+    return settings, deserialize_menu(data.get('menu_data'))
+
+# ---------------- 代码导出器 ----------------
+class MuiBudgetError(ValueError):
+    """导出内容超出工程设置的 Flash/RAM 预算；footprint 为逐项占用明细"""
+    def __init__(self, message, footprint):
+        super().__init__(message)
+        self.footprint = footprint
+
+class MuiExporter:
+    """根据工程设置与菜单树生成 MUI C 代码，不依赖界面控件"""
+    def __init__(self, settings, menu_root, log=print):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings or {})
+        self.menu_root = menu_root
+        self.log = log
+        self.glyph_cache = None
+        self._glyphs = {}  # 单次导出内已栅格化的字形
+        self._shaping = {}  # 'ascii'/'cjk' -> {字符: (表下标, advance)}，供标签预排版
+        self.footprint = []  # 本次导出的 (分区, 符号, Flash 字节, RAM 字节)
+
+    def _opt(self, key):
+        return bool(self.settings.get(key, DEFAULT_SETTINGS.get(key, False)))
+
+    def _parse_font_px(self):
+        try:
+            txt = self.settings.get('font_size', '')
+            import re
+            m = re.search(r"\((\d+)px\)", txt)
+            return int(m.group(1)) if m else 12
+        except:
+            return 12
+
+    def _render_glyph_bitmap(self, ch, family, px):
+        k = (ch, family, px)
+        if k not in self._glyphs:
+            if self.glyph_cache is not None:
+                self._glyphs[k] = self.glyph_cache.render(ch, family, px, render_glyph_bitmap)
+            else:
+                self._glyphs[k] = render_glyph_bitmap(ch, family, px)
+        return self._glyphs[k]
+
+    def _prepare_glyphs(self, chars, family, px):
+        """批量准备字形：先查本次导出与磁盘缓存，剩余的在一张图集上一次绘制完成"""
+        todo = []
+        for ch in dict.fromkeys(chars):
+            k = (ch, family, px)
+            if k in self._glyphs:
+                continue
+            glyph = self.glyph_cache.get(family, px, ch) if self.glyph_cache is not None else None
+            if glyph is None:
+                todo.append(ch)
+            else:
+                self._glyphs[k] = glyph
+        if not todo:
+            return
+        workers = int(self.settings.get('glyph_workers', 1))
+        for ch, glyph in zip(todo, render_glyphs_parallel(todo, family, px, workers)):
+            self._glyphs[(ch, family, px)] = glyph
+            if self.glyph_cache is not None:
+                self.glyph_cache.put(family, px, ch, glyph)
+
+    def _glyph_advances(self, chars, family, px):
+        """字符步进，启用磁盘缓存时与字形一起缓存"""
+        if self.glyph_cache is not None:
+            return self.glyph_cache.advances(chars, family, px)
+        return glyph_advances(chars, family, px)
+
+    def _open_glyph_cache(self):
+        if not self._opt('glyph_cache'):
+            return
+        try:
+            self.glyph_cache = GlyphCache(self.settings.get('glyph_cache_dir') or None,
+                                          float(self.settings.get('glyph_cache_mb') or 64))
+        except Exception as e:
+            self.log(f"字形缓存不可用，直接栅格化: {e}")
+            self.glyph_cache = None
+
+    def _close_glyph_cache(self):
+        cache, self.glyph_cache = self.glyph_cache, None
+        if cache is None:
+            return
+        try:
+            if cache.hits or cache.misses:
+                self.log(f"字形缓存: 命中 {cache.hits}，新栅格化 {cache.misses}")
+            cache.close()
+        except Exception as e:
+            self.log(f"写入字形缓存失败: {e}")
+
+    def _emit_ascii_font_array(self):
+        family = self.settings.get('font_family') or 'Segoe UI'
+        px = self._parse_font_px()
+        self._prepare_glyphs([chr(c) for c in range(32,127)], family, px)
+        lines = []
+        lines.append("")
+        lines.append(f"const uint8_t ascii_font_{px}[] = {{")
+        size = 0
+        for code in range(32,127):
+            ch = chr(code)
+            w,h,buf = self._render_glyph_bitmap(ch, family, px)
+            size += len(buf)
+            lines.append(f"    /* {code} '{ch}' {w}x{h} */")
+            for i in range(0,len(buf),16):
+                part = ", ".join(f"0x{b:02X}" for b in buf[i:i+16])
+                lines.append(f"    {part},")
+        lines.append("};")
+        self._account("字形位图", f"ascii_font_{px}", flash=size)
+        return lines
+
+    # 裁剪后字形表的结构体字段；w/h 为墨迹包围盒，x_off/y_off 为其在字格中的位置，advance 为字体步进
+    GLYPH_FIELDS = "uint16_t code; uint32_t offset; uint8_t w; uint8_t h; uint8_t x_off; uint8_t y_off; uint8_t advance;"
+
+    def _glyph_table(self, chars, family, px, prefix, type_name, code_fmt, typedef=True):
+        """把字形按墨迹包围盒裁剪后输出位图数组 {prefix}_bitmap_{px} 与索引表 {prefix}_table_{px}；
+        启用 glyph_rle 时位图为游程编码，另输出位宽 {prefix}_rle_bits_{px}；内容相同的字形共用同一偏移"""
+        bitmap_name = f"{prefix}_bitmap_{px}"
+        self._prepare_glyphs(chars, family, px)
+        glyphs = []
+        full = 0
+        for ch, adv in zip(chars, self._glyph_advances(chars, family, px)):
+            w,h,buf = self._render_glyph_bitmap(ch, family, px)
+            full += len(buf)
+            glyphs.append((ord(ch), crop_glyph(w, h, buf), max(0, min(adv, 255))))
+        self._shaping[prefix] = {ch: (i, g[2]) for i, (ch, g) in enumerate(zip(chars, glyphs))}
+        cropped = sum(len(g[1][4]) for g in glyphs)
+        if full:
+            self.log(f"字形裁剪 {bitmap_name}: {full} → {cropped} 字节（节省 {100 - cropped*100//full}%）")
+        fmt = self._glyph_format()
+        rle = fmt == 'rle'
+        if fmt == 'page':
+            glyphs = [(code, (xo, yo, cw, chh, glyph_to_pages(cw, chh, data)), adv)
+                      for code, (xo, yo, cw, chh, data), adv in glyphs]
+            paged = sum(len(g[1][4]) for g in glyphs)
+            if cropped:
+                self.log(f"页布局 {bitmap_name}: {cropped} → {paged} 字节（按 8 行一页、逐列一字节）")
+        if rle:
+            runs = [glyph_runs(cw, chh, data) for _, (xo, yo, cw, chh, data), _ in glyphs]
+            b0, b1 = rle_choose_bits(runs)
+            encoded = [rle_encode(r, b0, b1) for r in runs]
+            size = sum(len(e[0]) for e in encoded)
+            pairs = sum(e[1] for e in encoded)
+            pixels = sum(g[1][2]*g[1][3] for g in glyphs)
+            if cropped:
+                n = max(len(glyphs), 1)
+                self.log(f"游程压缩 {bitmap_name}: {cropped} → {size} 字节（压缩比 {size/cropped:.2f}，位宽 {b0}/{b1}）；"
+                         f"解码平均每字形 {pairs/n:.1f} 个游程对、读取 {pairs*(b0 + b1)/n:.0f} 位、遍历 {pixels/n:.0f} 像素")
+            glyphs = [(code, (xo, yo, cw, chh, enc[0]), adv)
+                      for (code, (xo, yo, cw, chh, _), adv), enc in zip(glyphs, encoded)]
+        bitmap = []
+        entries = []
+        offsets = {}  # 位图内容 -> 偏移
+        dups = 0
+        for code, (xo, yo, cw, chh, data), adv in glyphs:
+            key = bytes(data)
+            if key in offsets:
+                dups += 1
+            else:
+                offsets[key] = len(bitmap)
+                bitmap.extend(data)
+            entries.append((code, offsets[key], cw, chh, xo, yo, adv))
+        total = sum(len(g[1][4]) for g in glyphs)
+        if total > len(bitmap):
+            self.log(f"字形去重 {bitmap_name}: {dups} 个字形与已有位图相同，节省 {total - len(bitmap)} 字节")
+        self._account("字形位图", bitmap_name, flash=max(len(bitmap), 1))
+        self._account("字形表", f"{prefix}_table_{px}", flash=len(entries) * self._sizeof(self.GLYPH_FIELDS))
+        if rle:
+            self._account("字形表", f"{prefix}_rle_bits_{px}", flash=2)
+        lines = []
+        lines.append("")
+        if rle:
+            lines.append(f"const uint8_t {prefix}_rle_bits_{px}[2] = {{{b0}, {b1}}};")
+        lines.append(f"const uint8_t {bitmap_name}[] = {{")
+        for i in range(0, len(bitmap), 16):
+            part = ", ".join(f"0x{b:02X}" for b in bitmap[i:i+16])
+            lines.append(f"    {part},")
+        if not bitmap:
+            lines.append("    0x00,")
+        lines.append("};")
+        lines.append("")
+        if typedef:
+            lines.append(f"typedef struct {{ {self.GLYPH_FIELDS} }} {type_name};")
+        lines.append(f"const {type_name} {prefix}_table_{px}[] = {{")
+        for code,off,w,h,xo,yo,adv in entries:
+            lines.append(f"    {{0x{code:{code_fmt}}, {off}, {w}, {h}, {xo}, {yo}, {adv}}},")
+        lines.append("};")
+        return lines
+
+    def _glyph_format(self):
+        """字形位图格式：'rle' 游程压缩；'page' SSD1306 页布局（仅裸机单色导出）；'row' 按行打包"""
+        if self._opt('glyph_rle'):
+            return 'rle'
+        if self._opt('glyph_page_major') and self._opt('export_no_u8g2') and not self._tft():
+            return 'page'
+        return 'row'
+
+    def _u8g2_buffer(self):
+        """U8G2 帧缓：'f' 全缓冲；'1'/'2' 为 8/16 行页缓冲（对应 u8g2_Setup_*_1/_2 构造函数）"""
+        buf = str(self.settings.get('u8g2_buffer', DEFAULT_SETTINGS['u8g2_buffer']))
+        return buf if buf in ('f', '1', '2') else 'f'
+
+    def _screen_size(self):
+        """工程设置的屏幕尺寸（字符串保存），无法解析时按 128x64"""
+        try:
+            return int(self.settings.get('screen_width', 128)), int(self.settings.get('screen_height', 64))
+        except (TypeError, ValueError):
+            return 128, 64
+
+    def _oled_size(self):
+        """SSD1306 模板（STM32 与主机 I2C 模拟）的屏幕尺寸：取工程设置，宽不超过 128 列，高取 8 的倍数且不超过 64 行"""
+        w, h = self._screen_size()
+        return max(1, min(w, 128)), max(8, min(h, 64) // 8 * 8)
+
+    def _tft(self):
+        """裸机导出且屏幕类型为 TFT：按 RGB565 页条逐条绘制并发送，不分配整屏帧缓"""
+        return self._opt('export_no_u8g2') and self.settings.get('screen_type', 'OLED') == 'TFT'
+
+    def _tft_strip_lines(self, w, h):
+        """页条行数：不超过屏高，单个页条的字节数不超过 DMA 计数上限 65535"""
+        try:
+            n = int(self.settings.get('tft_strip_lines', DEFAULT_SETTINGS['tft_strip_lines']))
+        except (TypeError, ValueError):
+            n = DEFAULT_SETTINGS['tft_strip_lines']
+        return max(1, min(n, h, 65535 // (2 * w)))
+
+    def _tft_strip_bufs(self):
+        """页条缓冲块数：2 为绘制与发送交替进行，1 为每个页条先等上一条发完"""
+        try:
+            n = int(self.settings.get('tft_strip_bufs', DEFAULT_SETTINGS['tft_strip_bufs']))
+        except (TypeError, ValueError):
+            n = DEFAULT_SETTINGS['tft_strip_bufs']
+        return 1 if n <= 1 else 2
+
+    def _tft_color(self, key):
+        """工程颜色 '#RRGGBB' 转 RGB565；预设颜色名等无法解析时用默认值"""
+        value = str(self.settings.get(key, DEFAULT_SETTINGS[key])).strip()
+        try:
+            if len(value) != 7 or value[0] != '#':
+                raise ValueError(value)
+            rgb = int(value[1:], 16)
+        except ValueError:
+            self.log(f"颜色 {key}={value!r} 不是 #RRGGBB，按默认值 {DEFAULT_SETTINGS[key]} 导出")
+            rgb = int(DEFAULT_SETTINGS[key][1:], 16)
+        r, g, b = rgb >> 16, (rgb >> 8) & 0xFF, rgb & 0xFF
+        return ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
+
+    def _rle_decoder(self, sig, plot):
+        """游程解码绘制函数：逐对读取 0/1 游程，1 游程直接交给 plot(列, 行) 绘制，不需要中间缓冲区"""
+        lines = []
+        lines.append("static uint8_t rle_read(const uint8_t **p, uint8_t *cur, uint8_t *left, uint8_t n){ uint8_t v=0; while(n--){ if(!*left){ *cur=*(*p)++; *left=8; } v=(uint8_t)((v<<1)|(*cur>>7)); *cur=(uint8_t)(*cur<<1); (*left)--; } return v; }")
+        lines.append(f"static void draw_glyph_rle({sig}int x, int y, int w, int h, const uint8_t *p, const uint8_t *bits){{")
+        lines.append("  uint8_t cur=0, left=0; int col=0, row=0;")
+        lines.append("  while(row<h){")
+        lines.append("    int z=rle_read(&p,&cur,&left,bits[0]); int o=rle_read(&p,&cur,&left,bits[1]);")
+        lines.append("    col+=z; while(col>=w){ col-=w; row++; }")
+        lines.append(f"    while(o-- > 0){{ {plot('x+col', 'y+row')}; if(++col==w){{ col=0; row++; }} }}")
+        lines.append("  }")
+        lines.append("}")
+        return lines
+
+    def _emit_ascii_font_full(self):
+        family = self.settings.get('font_family') or 'Segoe UI'
+        px = self._parse_font_px()
+        chars = [chr(c) for c in range(32,127)]
+        return self._glyph_table(chars, family, px, "ascii", "AsciiGlyph", "02X")
+
+    # 预排版文字：字形引用最高位为 1 表示中文表下标；x 为相对文字起点的横坐标
+    LABEL_TYPES = [
+        "typedef struct { uint16_t glyph; uint16_t x; } MuiGlyphRef;",
+        "typedef struct { uint16_t first; uint16_t count; } MuiLabel;",
+    ]
+
+    # U8G2 混排函数中一次 u8g2_DrawStr 的 ASCII 段最大长度（栈上缓冲），更长的段分批绘制
+    ASCII_RUN = 32
+
+    # 裸机菜单底部的导航提示
+    NAV_HINT = "< 上/下 选择  确认 >"
+
+    def _collect_menu_chars(self):
+        s = set(self.NAV_HINT) if self._opt('export_no_u8g2') else set()
+        def walk(n):
+            s.update(list(n.name))
+            for c in n.children:
+                walk(c)
+        if self.menu_root:
+            walk(self.menu_root)
+        return s
+
+    def _cjk_chars(self):
+        used = self._collect_menu_chars()
+        if self.settings.get('cjk_charset') == 'gb2312_l1':
+            used.update(gb2312_level1_chars())
+        # 按码位排序，cjk_find_idx 的二分查找依赖该顺序
+        return [ch for ch in sorted(used) if ('\u4e00' <= ch <= '\u9fff') or ('\u3000' <= ch <= '\u303f')]
+
+    def _emit_cjk_font_subset(self, typedef=True):
+        fam = self.settings.get('font_family') or 'Microsoft YaHei'
+        px = self._parse_font_px()
+        cjk = self._cjk_chars()
+        if not cjk:
+            return []
+        return self._glyph_table(cjk, fam, px, "cjk", "GlyphEntry", "04X", typedef)
+
+    def _u8g2_font_chars(self):
+        """原生 U8G2 字体的字符：ASCII 32–126、中文子集与菜单中其他 BMP 字符，按码位排序"""
+        chars = set(chr(c) for c in range(32, 127)) | set(self._cjk_chars())
+        chars.update(ch for ch in self._collect_menu_chars() if 0x80 <= ord(ch) <= 0xFFFF)
+        return sorted(chars)
+
+    def _emit_u8g2_font(self):
+        """把 ASCII 与中文子集栅格化后编码为 U8G2 字体 mui_u8g2_font_{px}，由 u8g2_SetFont/u8g2_DrawUTF8 使用"""
+        family = self.settings.get('font_family') or 'Microsoft YaHei'
+        px = self._parse_font_px()
+        chars = self._u8g2_font_chars()
+        self._prepare_glyphs(chars, family, px)
+        glyphs = []
+        for ch, adv in zip(chars, self._glyph_advances(chars, family, px)):
+            w, h, buf = self._render_glyph_bitmap(ch, family, px)
+            xo, yo, cw, chh, data = crop_glyph(w, h, buf)
+            # 字格内基线位于 y=px：u8g2 的 y 偏移为包围盒底边到基线的距离
+            glyphs.append((ord(ch), xo, px - (yo + chh) if chh else 0, cw, chh, data, max(0, min(adv, 127))))
+        data, info = u8g2_font(glyphs)
+        name = f"mui_u8g2_font_{px}"
+        self.log(f"U8G2 字体 {name}: {info['glyphs']} 个字形（ASCII 95 + 其他 {info['glyphs'] - 95}），{len(data)} 字节，"
+                 f"游程位宽 {info['bits'][0]}/{info['bits'][1]}，跳转表 {info['blocks']} 段，最大字形 {info['max_w']}x{info['max_h']}")
+        self._account("字形位图", name, flash=len(data))
+        lines = []
+        lines.append("")
+        lines.append(f"const uint8_t {name}[{len(data)}] U8G2_FONT_SECTION(\"{name}\") = {{")
+        for i in range(0, len(data), 16):
+            lines.append("    " + ", ".join(f"0x{b:02X}" for b in data[i:i+16]) + ",")
+        lines.append("};")
+        return lines
+
+    def _menu_cb_ident(self, node):
+        name = node.callback_name if node.callback_name else f"menu_cb_{node.id}"
+        return self._sanitize_ident(name, f"menu_cb_{node.id}")
+
+    @staticmethod
+    def _sanitize_ident(s, fallback):
+        import re
+        ident = re.sub(r"[^A-Za-z0-9_]", "_", s)
+        ident = re.sub(r"_+", "_", ident).strip("_")
+        if not ident or ident[0].isdigit():
+            ident = fallback
+        return ident
+
+    def _menu_nodes_bfs(self):
+        """广度优先展开菜单树：根为 0 号节点，同一节点的子项连续存放"""
+        order = [self.menu_root]
+        first = {}
+        i = 0
+        while i < len(order):
+            n = order[i]
+            first[n.id] = len(order) if n.children else 0
+            order.extend(n.children)
+            i += 1
+        return order, first
+
+    def _emit_menu_table(self, lines, labels=None):
+        """输出常量节点表 menu_nodes 与回调函数表 menu_callbacks，整棵树位于 Flash；
+        labels 为 名称 -> 预排版文字下标，给出时每项末尾附 label 字段"""
+        order, first = self._menu_nodes_bfs()
+        if len(order) > 0xFFFF:
+            raise ValueError(f"菜单节点数 {len(order)} 超出 16 位下标范围")
+        callbacks = [self._menu_cb_ident(n) for n in order if n.is_exec]
+        cb_index = {}
+        for n in order:
+            if n.is_exec:
+                cb_index[n.id] = len(cb_index)
+        lines.append(f"void (*const menu_callbacks[{max(len(callbacks), 1)}])(void) = {{ {', '.join(callbacks) or '0'} }};")
+        lines.append(f"const MenuItem menu_nodes[{len(order)}] = {{")
+        for idx, n in enumerate(order):
+            cb = cb_index.get(n.id, "MENU_NO_CALLBACK")
+            label = f", {labels[n.name]}" if labels is not None else ""
+            lines.append(f'  {{"{n.name}", {first[n.id]}, {len(n.children)}, {cb}, {1 if n.is_exec else 0}{label}}}, /* {idx} */')
+        lines.append("};")
+        lines.append("const MenuItem *const menu_root = &menu_nodes[0];")
+
+    def _labels(self):
+        """需要预排版的文字：各菜单项名称（按节点表顺序去重），裸机导出另含导航提示"""
+        order, _ = self._menu_nodes_bfs()
+        texts = [n.name for n in order]
+        if self._opt('export_no_u8g2'):
+            texts.append(self.NAV_HINT)
+        return list(dict.fromkeys(texts))
+
+    def _shape_label(self, text, u8g2_ascii_adv=None):
+        """把文字排版为 [(字形引用, 起点 x)]，逐字符规则与运行时的混排函数一致；
+        引用最高位为 1 时是中文表下标，否则为 ASCII 表下标（U8G2 模式为字符码，由 u8g2 字体绘制）"""
+        ascii_m = self._shaping.get('ascii')
+        cjk_m = self._shaping.get('cjk', {})
+        out = []
+        x = 0
+        for ch in text:
+            if u8g2_ascii_adv is not None:
+                if ord(ch) < 128:
+                    out.append((ord(ch), x))
+                    x += u8g2_ascii_adv
+                elif ch in cjk_m:
+                    idx, adv = cjk_m[ch]
+                    out.append((0x8000 | idx, x))
+                    x += adv
+                else:
+                    out.append((ord('?'), x))
+                    x += u8g2_ascii_adv
+            elif ord(ch) < 128:
+                if ascii_m is None:
+                    x += 6
+                elif ch in ascii_m:
+                    idx, adv = ascii_m[ch]
+                    out.append((idx, x))
+                    x += adv
+            elif ch in cjk_m:
+                idx, adv = cjk_m[ch]
+                out.append((0x8000 | idx, x))
+                x += adv
+            else:
+                x += 6
+        return out
+
+    def _emit_labels(self, u8g2_ascii_adv=None):
+        """输出预排版文字：mui_label_glyphs 为全部字形引用，mui_labels[i] 给出第 i 条文字的起始位置与字形数"""
+        lines = []
+        refs = []
+        spans = []
+        for text in self._labels():
+            shaped = self._shape_label(text, u8g2_ascii_adv)
+            spans.append((len(refs), len(shaped), text))
+            refs.extend(shaped)
+        lines.append("")
+        lines.append(f"const MuiGlyphRef mui_label_glyphs[{max(len(refs), 1)}] = {{")
+        for i in range(0, len(refs), 8):
+            lines.append("    " + " ".join(f"{{0x{g:04X}, {x}}}," for g, x in refs[i:i+8]))
+        if not refs:
+            lines.append("    {0, 0},")
+        lines.append("};")
+        lines.append(f"const MuiLabel mui_labels[{len(spans)}] = {{")
+        for i, (first, count, text) in enumerate(spans):
+            lines.append(f"    {{{first}, {count}}}, /* {i}: {text.replace('*/', '* /')} */")
+        lines.append("};")
+        ref_size = self._sizeof(self.LABEL_TYPES[0].split("{")[1].split("}")[0])
+        label_size = self._sizeof(self.LABEL_TYPES[1].split("{")[1].split("}")[0])
+        self._account("预排版文字", "mui_label_glyphs", flash=max(len(refs), 1) * ref_size)
+        self._account("预排版文字", "mui_labels", flash=len(spans) * label_size)
+        self.log(f"文字预排版: {len(spans)} 条文字、{len(refs)} 个字形引用，约 {len(refs)*ref_size + len(spans)*label_size} 字节 Flash")
+        return lines
+
+    # 裸机滚动动画时长（毫秒），与预览默认值一致
+    ANIM_MS = 140
+
+    def _emit_ease_lut(self):
+        """滚动缓动表：第 i 项为 t=i/ANIM_MS 时 t*t*(3-2t) 的 Q0.8 值（255 表示 1），每毫秒一项，运行时不做浮点运算"""
+        n = self.ANIM_MS
+        lut = [round(255 * (i / n) ** 2 * (3 - 2 * i / n)) for i in range(n + 1)]
+        lines = [f"#define MUI_ANIM_MS {n}"]
+        lines.append(f"static const uint8_t mui_ease_lut[MUI_ANIM_MS+1] = {{")
+        for i in range(0, len(lut), 20):
+            lines.append("    " + ", ".join(str(v) for v in lut[i:i+20]) + ",")
+        lines.append("};")
+        self._account("动画", "mui_ease_lut", flash=len(lut))
+        return lines
+
+    # 按键消抖：1ms 采样，电平连续保持 MUI_KEY_DEBOUNCE_MS 次才认定变化；事件队列长度（2 的幂）
+    KEY_DEBOUNCE_MS = 10
+    KEY_QUEUE_LEN = 8
+
+    def _emit_key_queue(self):
+        """按键消抖与事件环形队列（桩实现与 STM32 模板共用）：采样在定时中断中调用 key_sample，
+        按下沿写入队列；单生产者（中断）单消费者（主循环），各自只改 head/tail，无需关中断"""
+        lines = []
+        lines.append("#ifndef MUI_KEY_DEBOUNCE_MS")
+        lines.append(f"#define MUI_KEY_DEBOUNCE_MS {self.KEY_DEBOUNCE_MS}")
+        lines.append("#endif")
+        lines.append("#ifndef MUI_KEY_QUEUE_LEN")
+        lines.append(f"#define MUI_KEY_QUEUE_LEN {self.KEY_QUEUE_LEN}  /* 2 的幂，不超过 128 */")
+        lines.append("#endif")
+        lines.append("static volatile uint8_t key_q[MUI_KEY_QUEUE_LEN];")
+        lines.append("static volatile uint8_t key_head, key_tail;  /* 自由递增，差值为队列中的事件数 */")
+        lines.append("static volatile uint8_t key_stable;  /* 消抖后的电平，bit0..3 对应 UP/DOWN/ENTER/BACK */")
+        lines.append("static uint8_t key_cnt[4];")
+        # 队列满时丢弃新事件：tail 只归主循环所有，中断不能覆盖未读事件
+        lines.append("static void key_push(uint8_t k){ uint8_t h=key_head; if((uint8_t)(h-key_tail)>=MUI_KEY_QUEUE_LEN) return; key_q[h&(MUI_KEY_QUEUE_LEN-1)]=k; key_head=(uint8_t)(h+1); }")
+        lines.append("static void key_sample(uint8_t raw){")
+        lines.append("  for(uint8_t i=0;i<4;i++){")
+        lines.append("    uint8_t bit=(uint8_t)(1u<<i);")
+        lines.append("    if(((raw^key_stable)&bit)==0){ key_cnt[i]=0; continue; }")
+        lines.append("    if(++key_cnt[i]<MUI_KEY_DEBOUNCE_MS) continue;")
+        lines.append("    key_cnt[i]=0; key_stable^=bit;")
+        lines.append("    if(raw&bit) key_push((uint8_t)(MENU_KEY_UP+i));")
+        lines.append("  }")
+        lines.append("}")
+        lines.append("MenuKey input_port_pop(void){ uint8_t t=key_tail; if(t==key_head) return MENU_KEY_NONE; MenuKey k=(MenuKey)key_q[t&(MUI_KEY_QUEUE_LEN-1)]; key_tail=(uint8_t)(t+1); return k; }")
+        lines.append("static MenuKey key_level(void){ uint8_t s=key_stable; for(uint8_t i=0;i<4;i++) if(s&(1u<<i)) return (MenuKey)(MENU_KEY_UP+i); return MENU_KEY_NONE; }")
+        return lines
+
+    def _menu_item_fields(self, flat, preshape):
+        """MenuItem 字段（两种导出模式相同）：常量表为 16 位下标与回调编号，指针树为子项数组与函数指针"""
+        if flat:
+            fields = "const char *name; uint16_t first_child; uint16_t child_count; uint16_t callback; uint8_t is_exec; "
+        else:
+            fields = "const char *name; uint8_t is_exec; uint8_t child_count; struct MenuItem *children; void (*callback)(void); "
+        return fields + ("uint16_t label; " if preshape else "")
+
+    # ---------------- 占用统计与预算 ----------------
+    # 目标 MCU 的指针宽度（32 位 ARM），结构体按自然对齐计算大小
+    POINTER_SIZE = 4
+    C_TYPE_SIZES = {'uint8_t': 1, 'int8_t': 1, 'char': 1, 'uint16_t': 2, 'int16_t': 2, 'uint32_t': 4, 'int32_t': 4, 'int': 4}
+
+    def _sizeof(self, fields):
+        """按 "类型 名; ..." 字段串计算结构体大小：每个字段按自身大小对齐，总大小补齐到最大对齐"""
+        size = 0
+        align = 1
+        for decl in fields.split(";"):
+            decl = decl.strip()
+            if not decl:
+                continue
+            if "*" in decl:
+                n = self.POINTER_SIZE
+            else:
+                n = self.C_TYPE_SIZES[decl.split()[-2]]
+            size = (size + n - 1) // n * n + n
+            align = max(align, n)
+        return (size + align - 1) // align * align
+
+    def _account(self, section, symbol, flash=0, ram=0):
+        self.footprint.append((section, symbol, flash, ram))
+
+    def footprint_sections(self):
+        """按分区汇总：[(分区, Flash, RAM)]，保持首次出现的顺序"""
+        sums = {}
+        for section, _, flash, ram in self.footprint:
+            f, r = sums.get(section, (0, 0))
+            sums[section] = (f + flash, r + ram)
+        return [(k, f, r) for k, (f, r) in sums.items()]
+
+    def footprint_rows(self, detail=False):
+        """占用表的行：[(名称, Flash, RAM, 是否汇总行)]，依次为各分区（detail 时其下按大小列出各数组）、合计与预算"""
+        flash_budget = int(self.settings.get('flash_budget') or 0)
+        ram_budget = int(self.settings.get('ram_budget') or 0)
+        rows = []
+        for section, f, r in self.footprint_sections():
+            rows.append((section, f, r, True))
+            if detail:
+                for sec, sym, sf, sr in sorted((e for e in self.footprint if e[0] == section), key=lambda e: -(e[2] + e[3])):
+                    rows.append((sym, sf, sr, False))
+        rows.append(("合计", sum(e[2] for e in self.footprint), sum(e[3] for e in self.footprint), True))
+        if flash_budget or ram_budget:
+            rows.append(("预算", flash_budget or '-', ram_budget or '-', True))
+        return rows
+
+    def footprint_table(self, detail=False):
+        """占用表文本行；detail 时在每个分区下列出各数组"""
+        def pad(text, width):
+            # 中文按两列宽对齐
+            import unicodedata
+            cols = sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+            return text + " " * max(width - cols, 1)
+        lines = [f"{pad('分区', 30)}{'Flash':>8}{'RAM':>8}"]
+        for name, f, r, summary in self.footprint_rows(detail):
+            lines.append(f"{pad(name, 30)}{f:>8}{r:>8}" if summary else f"  {pad(name, 28)}{f:>8}{r:>8}")
+        return lines
+
+    def _menu_table(self, flat, preshape):
+        """菜单节点表各数组：[(符号, Flash, RAM)]；指针树是可写的 .data，RAM 中一份、Flash 中另存初值"""
+        order, _ = self._menu_nodes_bfs()
+        item = self._sizeof(self._menu_item_fields(flat, preshape))
+        ptr = self.POINTER_SIZE
+        if flat:
+            callbacks = sum(1 for n in order if n.is_exec)
+            return [("menu_nodes", len(order) * item, 0), ("menu_callbacks", max(callbacks, 1) * ptr, 0), ("menu_root", ptr, 0)]
+        table = []
+        for n in order:
+            if n.children:
+                size = len(n.children) * item
+                table.append((f"{self._sanitize_ident(n.name, f'node_{n.id}')}_{n.id}_children", size, size))
+        table.append(("menu_root_node", item, item))
+        table.append(("menu_root", ptr, ptr))
+        return table
+
+    def _account_menu(self, flat, preshape, bare_nav_text=False):
+        """菜单节点表与字符串字面量；另一种表结构按同样的字段计算，只记入日志作对比"""
+        order, _ = self._menu_nodes_bfs()
+        for symbol, flash, ram in self._menu_table(flat, preshape):
+            self._account("菜单节点", symbol, flash=flash, ram=ram)
+        def total(table):
+            return sum(e[1] for e in table), sum(e[2] for e in table)
+        tree_f, tree_r = total(self._menu_table(False, preshape))
+        flat_f, flat_r = total(self._menu_table(True, preshape))
+        cur = "常量表" if flat else "指针树"
+        self.log(f"菜单表（{len(order)} 个节点，按 {self.POINTER_SIZE * 8} 位 MCU 计算，当前导出{cur}）: 指针树 RAM {tree_r} B、Flash {tree_f} B"
+                 f" → 常量表 RAM {flat_r} B、Flash {flat_f} B")
+        self._account("字符串", "菜单名称", flash=sum(len(n.name.encode('utf-8')) + 1 for n in order))
+        # 默认回调以 MUI_CB_PRINT("函数名") 打印，函数名字面量也在 Flash
+        self._account("字符串", "回调名（MUI_CB_PRINT）", flash=sum(len(self._menu_cb_ident(n)) + 1 for n in order if n.is_exec))
+        if bare_nav_text:
+            self._account("字符串", "底部导航提示", flash=len(self.NAV_HINT.encode('utf-8')) + 1)
+
+    def _check_budget(self):
+        """超出 flash_budget/ram_budget（字节，0 为不限）时抛出 MuiBudgetError，附逐项明细"""
+        flash_budget = int(self.settings.get('flash_budget') or 0)
+        ram_budget = int(self.settings.get('ram_budget') or 0)
+        total_f = sum(e[2] for e in self.footprint)
+        total_r = sum(e[3] for e in self.footprint)
+        over = []
+        if flash_budget and total_f > flash_budget:
+            over.append(f"Flash {total_f} B 超出预算 {flash_budget} B（多 {total_f - flash_budget} B）")
+        if ram_budget and total_r > ram_budget:
+            over.append(f"RAM {total_r} B 超出预算 {ram_budget} B（多 {total_r - ram_budget} B）")
+        if over:
+            msg = "导出失败：" + "；".join(over) + "\n" + "\n".join(self.footprint_table(detail=True))
+            raise MuiBudgetError(msg, list(self.footprint))
+
+    # ---------------- 导出完整 C 代码 ----------------
+    def export(self, out_dir):
+        """将 MUI C 代码写入 out_dir/MUI，返回导出目录"""
+        self._glyphs = {}
+        self._shaping = {}
+        self.footprint = []
+        self._open_glyph_cache()
+        try:
+            return self._export(out_dir)
+        finally:
+            self._close_glyph_cache()
+
+    def _export(self, out_dir):
+        px = self._parse_font_px()
+        no_u8g2 = self._opt('export_no_u8g2')
+        if self._opt('glyph_page_major') and self._glyph_format() != 'page':
+            self.log("字形页布局仅用于未启用游程压缩的裸机单色导出，本次按" + ("游程压缩" if self._opt('glyph_rle') else "行") + "存储")
+        _sanitize_ident = self._sanitize_ident
+        # 常量表模式下节点经 menu_nodes 下标访问、回调经 menu_callbacks 间接调用，指针树模式保持原有写法
+        flat = self._opt('menu_const_table')
+        item = "const MenuItem" if flat else "MenuItem"
+        def child(node, i):
+            return f"menu_nodes[{node}->first_child + {i}]" if flat else f"{node}->children[{i}]"
+        def call_cb(node):
+            if flat:
+                return f"if({node}->is_exec && {node}->callback != MENU_NO_CALLBACK) menu_callbacks[{node}->callback]();"
+            return f"if({node}->is_exec && {node}->callback) {node}->callback();"
+        # 预排版：菜单项多一个 label 字段，绘制时按 mui_labels 下标取字形序列
+        preshape = self._opt('preshape_labels')
+        if preshape and not no_u8g2 and not self._opt('emit_cjk_subset'):
+            self.log("文字预排版需要导出中文子集（U8G2 模式下由 cjk_font.c 提供绘制函数），本次未启用")
+            preshape = False
+        # 原生 U8G2 字体：ASCII 与中文子集编码为一套 u8g2 字体，菜单直接 u8g2_DrawUTF8，取代 cjk_font.c 的逐像素绘制
+        native_font = self._opt('u8g2_font') and not no_u8g2
+        if native_font and not self._opt('emit_cjk_subset'):
+            self.log("原生 U8G2 字体由中文子集生成，未导出中文子集时不启用")
+            native_font = False
+        if native_font and preshape:
+            self.log("原生 U8G2 字体由 u8g2_DrawUTF8 绘制，不使用预排版，本次未启用预排版")
+            preshape = False
+        # TFT：按页条绘制 RGB565 并逐条发送到屏，RAM 随屏宽 × 页条行数增长而与屏高无关
+        tft = self._tft()
+        if not no_u8g2 and self.settings.get('screen_type', 'OLED') == 'TFT':
+            self.log("U8G2 导出按单色屏生成；TFT 的 RGB565 页条输出请使用裸机导出")
+        label_idx = {t: i for i, t in enumerate(self._labels())} if preshape else None
+        item_fields = self._menu_item_fields(flat, preshape)
+        def lab(node):
+            return f", {label_idx[node.name]}" if preshape else ""
+        self._account_menu(flat, preshape, bare_nav_text=no_u8g2 and not preshape)
+        menu_h = []
+        menu_h.append("#ifndef MENU_H")
+        menu_h.append("#define MENU_H")
+        menu_h.append("#include <u8g2.h>")
+        menu_h.append("#include <stdint.h>")
+        menu_h.append("#include <stddef.h>")
+        menu_h.append("typedef struct MenuItem {")
+        for field in item_fields.split(";")[:-1]:
+            menu_h.append(f"  {field.strip()};")
+        menu_h.append("} MenuItem;")
+        if flat:
+            menu_h.append("#define MENU_NO_CALLBACK 0xFFFF")
+            menu_h.append("extern const MenuItem menu_nodes[];")
+            menu_h.append("extern void (*const menu_callbacks[])(void);")
+            menu_h.append("extern const MenuItem *const menu_root;")
+        else:
+            menu_h.append("extern MenuItem *menu_root;")
+        if self._u8g2_buffer() == 'f':
+            menu_h.append("/* draw_menu 按全缓冲绘制（ClearBuffer/SendBuffer），使用 u8g2_Setup_*_f 构造函数 */")
+        else:
+            menu_h.append(f"/* draw_menu 按页缓冲绘制（firstPage/nextPage），使用 u8g2_Setup_*_{self._u8g2_buffer()} 构造函数 */")
+        menu_h.append(f"#define MUI_U8G2_BUFFER '{self._u8g2_buffer()}'")
+        menu_h.append("uint8_t menu_visible_lines(u8g2_t *u8g2);  /* 传给 menu_nav_on_key 的 visible_lines */")
+        menu_h.append(f"void draw_menu(u8g2_t *u8g2, {item} *root, uint8_t cursor, uint8_t view_start);")
+        menu_h.append("#endif")
+
+        menu_c = []
+        menu_c.append("#include \"menu.h\"")
+        if native_font:
+            menu_c.append("#include \"../fonts/mui_font.h\"")
+        elif self._opt('emit_cjk_subset'):
+            menu_c.append("#include \"../fonts/cjk_font.h\"")
+        menu_c.append("#include \"../callbacks/callbacks.h\"")
+        menu_c.append("")
+        callbacks_h = []
+        callbacks_c = []
+        callbacks_c.append("#include \"callbacks.h\"")
+        callbacks_h.append("#ifndef MENU_CALLBACKS_H")
+        callbacks_h.append("#define MENU_CALLBACKS_H")
+        callbacks_h.append("#include <stdint.h>")
+        callbacks_h.append("#ifndef MUI_CB_PRINT")
+        callbacks_h.append("#include <stdio.h>")
+        callbacks_h.append("#define MUI_CB_PRINT(msg) do { printf(\"%s\\n\", (msg)); } while(0)")
+        callbacks_h.append("#endif")
+        def gen_callbacks_to(node):
+            for c in node.children:
+                if c.is_exec:
+                    cb = c.callback_name if c.callback_name else f"menu_cb_{c.id}"
+                    cb = _sanitize_ident(cb, f"menu_cb_{c.id}")
+                    callbacks_h.append(f"void {cb}(void);")
+                    callbacks_c.append(f"void {cb}(void){{ MUI_CB_PRINT(\"{cb}\"); }}")
+                gen_callbacks_to(c)
+        gen_callbacks_to(self.menu_root)
+        callbacks_h.append("#endif")
+        def gen_nodes_to(lines, node):
+            for c in node.children:
+                if c.children:
+                    gen_nodes_to(lines, c)
+            arr_name = f"{_sanitize_ident(node.name, f'node_{node.id}')}_{node.id}_children"
+            lines.append(f"MenuItem {arr_name}[{len(node.children)}] = {{")
+            for c in node.children:
+                child_ptr = f"{_sanitize_ident(c.name, f'node_{c.id}')}_{c.id}_children" if c.children else "NULL"
+                cb_name = c.callback_name if c.callback_name else (f"menu_cb_{c.id}" if c.is_exec else "")
+                cb_ptr = _sanitize_ident(cb_name, f"menu_cb_{c.id}") if c.is_exec else "NULL"
+                lines.append(f'  {{"{c.name}", {1 if c.is_exec else 0}, {len(c.children)}, {child_ptr}, {cb_ptr}{lab(c)}}},')
+            lines.append("};")
+            lines.append("")
+        if flat:
+            self._emit_menu_table(menu_c, label_idx)
+        else:
+            gen_nodes_to(menu_c, self.menu_root)
+            root_arr_name = f"{_sanitize_ident(self.menu_root.name, f'node_{self.menu_root.id}')}_{self.menu_root.id}_children"
+            menu_c.append(f'MenuItem menu_root_node = {{"{self.menu_root.name}", 0, {len(self.menu_root.children)}, {root_arr_name}, NULL{lab(self.menu_root)}}};')
+            menu_c.append("MenuItem *menu_root = &menu_root_node;")
+        menu_c.append("")
+        # 行高取当前字体最大字高加 2（u8g2_font_6x10_tf 为 12，与裸机 line_h 一致），可见行数由屏高决定；
+        # 只绘制 view_start 起的可见行，选中条与滚动条与裸机 draw_menu_bare 相同
+        menu_c.append("uint8_t menu_visible_lines(u8g2_t *u8g2){")
+        menu_c.append(f"  u8g2_SetFont(u8g2, {f'mui_u8g2_font_{px}' if native_font else 'u8g2_font_6x10_tf'});")
+        menu_c.append("  int vis = u8g2_GetDisplayHeight(u8g2) / (u8g2_GetMaxCharHeight(u8g2) + 2);")
+        menu_c.append("  return (uint8_t)(vis < 1 ? 1 : (vis > 255 ? 255 : vis));")
+        menu_c.append("}")
+        menu_c.append("")
+        # 页缓冲模式下 draw_menu_page 每个页条调用一次：只画与当前页条相交的行，绘制状态在每次调用内自行设置与恢复
+        buffer = self._u8g2_buffer()
+        has_cjk_text = preshape or (self._opt('emit_cjk_subset') and not native_font)
+        menu_c.append(f"static void draw_menu_page(u8g2_t *u8g2, {item} *root, uint8_t cursor, uint8_t view_start, int vis, int line_h){{")
+        menu_c.append("  int base_y = line_h; int scr_w = u8g2_GetDisplayWidth(u8g2);")
+        menu_c.append("  int total = root->child_count;")
+        if buffer != 'f':
+            menu_c.append("  int strip_y0 = u8g2_GetBufferCurrTileRow(u8g2) * 8;")
+            menu_c.append("  int strip_y1 = strip_y0 + u8g2_GetBufferTileHeight(u8g2) * 8;")
+            # 行的像素范围：选中条 [y-line_h+1, y]，文字在基线下方还有下伸（中文字形按 y - px + 字高 放置）
+            if has_cjk_text:
+                menu_c.append("  int below = u8g2_GetMaxCharHeight(u8g2);")
+            else:
+                menu_c.append("  int below = -u8g2_GetDescent(u8g2);")
+        menu_c.append("  u8g2_SetFontMode(u8g2, 1);")
+        menu_c.append("  for (int i = 0; i < vis; ++i) {")
+        menu_c.append("    int idx = view_start + i; if(idx >= total) break;")
+        menu_c.append("    int y = base_y + i * line_h;")
+        if buffer != 'f':
+            menu_c.append("    if(y - (line_h - 1) >= strip_y1) break;")
+            menu_c.append("    if(y + 1 + below <= strip_y0) continue;")
+        menu_c.append("    if(idx == cursor){ u8g2_DrawBox(u8g2, 0, y - (line_h - 1), scr_w, line_h); u8g2_SetDrawColor(u8g2, 0); }")
+        if preshape:
+            menu_c.append(f"    draw_label(u8g2, {child('root', 'idx')}.label, 2, y);")
+        elif native_font:
+            menu_c.append(f"    u8g2_DrawUTF8(u8g2, 2, y, {child('root', 'idx')}.name);")
+        elif self._opt('emit_cjk_subset'):
+            menu_c.append(f"    draw_text_mixed(u8g2, {child('root', 'idx')}.name, 2, y);")
+        else:
+            menu_c.append(f"    u8g2_DrawStr(u8g2, 2, y, {child('root', 'idx')}.name);")
+        menu_c.append("    u8g2_SetDrawColor(u8g2, 1);")
+        menu_c.append("  }")
+        menu_c.append("  if(total > vis){ int track_x = scr_w - 3; int track_y = base_y - (line_h - 1); int track_h = vis * line_h; u8g2_DrawVLine(u8g2, track_x, track_y, track_h); int thumb_h = track_h * vis / total; if(thumb_h < 4) thumb_h = 4; int thumb_y = track_y + (track_h - thumb_h) * view_start / (total - vis); u8g2_DrawBox(u8g2, track_x + 1, thumb_y, 2, thumb_h); }")
+        menu_c.append("}")
+        menu_c.append("")
+        menu_c.append(f"void draw_menu(u8g2_t *u8g2, {item} *root, uint8_t cursor, uint8_t view_start){{")
+        menu_c.append("  int vis = menu_visible_lines(u8g2);")
+        menu_c.append("  int line_h = u8g2_GetMaxCharHeight(u8g2) + 2;")
+        menu_c.append("  int total = root->child_count;")
+        menu_c.append("  if(total <= vis) view_start = 0; else if(view_start > total - vis) view_start = (uint8_t)(total - vis);")
+        if buffer == 'f':
+            menu_c.append("  u8g2_ClearBuffer(u8g2);")
+            menu_c.append("  draw_menu_page(u8g2, root, cursor, view_start, vis, line_h);")
+            menu_c.append("  u8g2_SendBuffer(u8g2);")
+        else:
+            menu_c.append("  u8g2_FirstPage(u8g2);")
+            menu_c.append("  do {")
+            menu_c.append("    draw_menu_page(u8g2, root, cursor, view_start, vis, line_h);")
+            menu_c.append("  } while(u8g2_NextPage(u8g2));")
+        menu_c.append("}")
+
+        ascii_h = []
+        ascii_c = []
+        if self._opt('emit_font_array') and not no_u8g2:
+            ascii_h.append(f"#ifndef ASCII_FONT_PX_{px}_H")
+            ascii_h.append(f"#define ASCII_FONT_PX_{px}_H")
+            ascii_h.append("#include <stdint.h>")
+            ascii_h.append(f"extern const uint8_t ascii_font_{px}[];")
+            ascii_h.append("#endif")
+            ascii_c.append(f"#include \"ascii_font.h\"")
+            ascii_c.extend(self._emit_ascii_font_array())
+
+        font_h = []
+        font_c = []
+        if native_font:
+            font_h.append(f"#ifndef MUI_FONT_PX_{px}_H")
+            font_h.append(f"#define MUI_FONT_PX_{px}_H")
+            font_h.append("#include <u8g2.h>")
+            font_h.append(f"/* ASCII 与菜单汉字的 U8G2 字体（{px}px），u8g2_SetFont 后用 u8g2_DrawUTF8 绘制 */")
+            font_h.append(f"extern const uint8_t mui_u8g2_font_{px}[];")
+            font_h.append(f"#define MUI_U8G2_FONT mui_u8g2_font_{px}")
+            font_h.append("void draw_text_mixed(u8g2_t *u8g2, const char *utf8, int x, int y);")
+            font_h.append("#endif")
+            font_c.append("#include \"mui_font.h\"")
+            font_c.extend(self._emit_u8g2_font())
+            font_c.append("")
+            font_c.append("/* 与中文子集导出的同名函数兼容：使用当前字体（须已 u8g2_SetFont(u8g2, MUI_U8G2_FONT)） */")
+            font_c.append("void draw_text_mixed(u8g2_t *u8g2, const char *utf8, int x, int y){")
+            font_c.append("  u8g2_DrawUTF8(u8g2, x, y, utf8);")
+            font_c.append("}")
+
+        cjk_h = []
+        cjk_c = []
+        if self._opt('emit_cjk_subset') and not no_u8g2 and not native_font:
+            cjk_h.append(f"#ifndef CJK_FONT_PX_{px}_H")
+            cjk_h.append(f"#define CJK_FONT_PX_{px}_H")
+            cjk_h.append("#include <stdint.h>")
+            cjk_h.append("#include <u8g2.h>")
+            cjk_h.append(f"typedef struct {{ {self.GLYPH_FIELDS} }} GlyphEntry;")
+            cjk_h.append(f"extern const uint8_t cjk_bitmap_{px}[];")
+            cjk_h.append(f"extern const GlyphEntry cjk_table_{px}[];")
+            if self._opt('glyph_rle'):
+                cjk_h.append(f"extern const uint8_t cjk_rle_bits_{px}[2];")
+            cjk_h.append("int cjk_find_idx(uint16_t code);")
+            cjk_h.append("void draw_cjk_char(u8g2_t *u8g2, uint16_t code, int x, int y);")
+            cjk_h.append("void draw_text_mixed(u8g2_t *u8g2, const char *utf8, int x, int y);")
+            if preshape:
+                cjk_h.extend(self.LABEL_TYPES)
+                cjk_h.append("extern const MuiGlyphRef mui_label_glyphs[];")
+                cjk_h.append("extern const MuiLabel mui_labels[];")
+                cjk_h.append("void draw_label(u8g2_t *u8g2, uint16_t label, int x, int y);")
+            cjk_h.append("#endif")
+            cjk_c.append("#include <string.h>")
+            cjk_c.append("#include \"cjk_font.h\"")
+            cjk_c.extend(self._emit_cjk_font_subset(typedef=False))
+            cjk_c.append("")
+            cjk_c.append("int cjk_find_idx(uint16_t code){")
+            cjk_c.append(f"  int l=0; int r=(int)(sizeof(cjk_table_{px})/sizeof(GlyphEntry))-1;")
+            cjk_c.append("  while(l<=r){")
+            cjk_c.append("    int m=(l+r)/2;")
+            cjk_c.append(f"    if(cjk_table_{px}[m].code==code) return m;")
+            cjk_c.append(f"    if(cjk_table_{px}[m].code<code) l=m+1; else r=m-1;")
+            cjk_c.append("  }")
+            cjk_c.append("  return -1;")
+            cjk_c.append("}")
+            cjk_c.append("")
+            if self._opt('glyph_rle'):
+                cjk_c.extend(self._rle_decoder("u8g2_t *u8g2, ", lambda x, y: f"u8g2_DrawPixel(u8g2, {x}, {y})"))
+                cjk_c.append("")
+            cjk_c.append("static void draw_cjk_glyph(u8g2_t *u8g2, int idx, int x, int y){")
+            cjk_c.append(f"  GlyphEntry e=cjk_table_{px}[idx];")
+            if self._opt('glyph_rle'):
+                cjk_c.append(f"  draw_glyph_rle(u8g2, x+e.x_off, y+e.y_off, e.w, e.h, cjk_bitmap_{px}+e.offset, cjk_rle_bits_{px});")
+            else:
+                cjk_c.append(f"  const uint8_t *p=cjk_bitmap_{px};")
+                cjk_c.append("  p+=e.offset;")
+                cjk_c.append("  uint8_t stride=(e.w+7)/8;")
+                cjk_c.append("  for(uint8_t yy=0; yy<e.h; ++yy){")
+                cjk_c.append("    const uint8_t *row=p+yy*stride;")
+                cjk_c.append("    uint8_t bit=0; uint8_t b=0;")
+                cjk_c.append("    for(uint8_t xx=0; xx<e.w; ++xx){")
+                cjk_c.append("      if(bit==0){ b=*row++; bit=8; }")
+                cjk_c.append("      uint8_t on=(b&0x80)?1:0; b<<=1; bit--;")
+                cjk_c.append("      if(on) u8g2_DrawPixel(u8g2, x+e.x_off+xx, y+e.y_off+yy);")
+                cjk_c.append("    }")
+                cjk_c.append("  }")
+            cjk_c.append("}")
+            cjk_c.append("")
+            cjk_c.append("void draw_cjk_char(u8g2_t *u8g2, uint16_t code, int x, int y){")
+            cjk_c.append("  int idx=cjk_find_idx(code);")
+            cjk_c.append("  if(idx>=0) draw_cjk_glyph(u8g2, idx, x, y);")
+            cjk_c.append("}")
+            cjk_c.append("")
+            cjk_c.append("static uint32_t utf8_next(const char *s, uint32_t *i){")
+            cjk_c.append("  uint8_t c=(uint8_t)s[*i];")
+            cjk_c.append("  if(c<0x80){ (*i)++; return c; }")
+            cjk_c.append("  if((c&0xE0)==0xC0){ uint32_t cp=(c&0x1F)<<6; c=(uint8_t)s[++(*i)]; cp|=(c&0x3F); (*i)++; return cp; }")
+            cjk_c.append("  if((c&0xF0)==0xE0){ uint8_t c1=(uint8_t)s[*i+1]; uint8_t c2=(uint8_t)s[*i+2]; uint32_t cp=((uint32_t)(c&0x0F)<<12)|((uint32_t)(c1&0x3F)<<6)|(uint32_t)(c2&0x3F); *i+=3; return cp; }")
+            cjk_c.append("  if((c&0xF8)==0xF0){ uint8_t c1=(uint8_t)s[*i+1]; uint8_t c2=(uint8_t)s[*i+2]; uint8_t c3=(uint8_t)s[*i+3]; uint32_t cp=((uint32_t)(c&0x07)<<18)|((uint32_t)(c1&0x3F)<<12)|((uint32_t)(c2&0x3F)<<6)|(uint32_t)(c3&0x3F); *i+=4; return cp; }")
+            cjk_c.append("  (*i)++; return 0x3F;")
+            cjk_c.append("}")
+            cjk_c.append("")
+            # 连续 ASCII 合成一段交给一次 u8g2_DrawStr，步进取其返回值（字形 delta 之和），
+            # 每个字符只做一次字形查找；段落在串尾时直接画原串，中间的段拷贝到栈上补 '\0'
+            cjk_c.append("#ifndef MUI_ASCII_RUN")
+            cjk_c.append(f"#define MUI_ASCII_RUN {self.ASCII_RUN}")
+            cjk_c.append("#endif")
+            cjk_c.append("void draw_text_mixed(u8g2_t *u8g2, const char *utf8, int x, int y){")
+            cjk_c.append("  uint32_t i=0; int cx=x;")
+            cjk_c.append(f"  int cy=y - {px} + u8g2_GetMaxCharHeight(u8g2);")
+            cjk_c.append("  char run[MUI_ASCII_RUN+1];")
+            cjk_c.append("  while(utf8[i]){")
+            cjk_c.append("    if((uint8_t)utf8[i]<0x80){")
+            cjk_c.append("      uint32_t n=1;")
+            cjk_c.append("      while(utf8[i+n] && (uint8_t)utf8[i+n]<0x80) n++;")
+            cjk_c.append("      if(!utf8[i+n]){ u8g2_DrawStr(u8g2, cx, y, utf8+i); return; }")
+            cjk_c.append("      while(n){")
+            cjk_c.append("        uint32_t k = n<MUI_ASCII_RUN ? n : MUI_ASCII_RUN;")
+            cjk_c.append("        memcpy(run, utf8+i, k); run[k]='\\0';")
+            cjk_c.append("        cx += u8g2_DrawStr(u8g2, cx, y, run);")
+            cjk_c.append("        i += k; n -= k;")
+            cjk_c.append("      }")
+            cjk_c.append("      continue;")
+            cjk_c.append("    }")
+            cjk_c.append("    uint32_t cp=utf8_next(utf8,&i);")
+            cjk_c.append("    int idx=cjk_find_idx((uint16_t)cp);")
+            cjk_c.append(f"    if(idx>=0){{ draw_cjk_glyph(u8g2, idx, cx, cy); cx += cjk_table_{px}[idx].advance; }}")
+            cjk_c.append("    else cx += u8g2_DrawStr(u8g2, cx, y, \"?\");")
+            cjk_c.append("  }")
+            cjk_c.append("}")
+            if preshape:
+                # 菜单项使用 u8g2_font_6x10_tf（等宽 6 像素），ASCII 按 6 像素排版
+                cjk_c.extend(self._emit_labels(u8g2_ascii_adv=6))
+                cjk_c.append("")
+                cjk_c.append("void draw_label(u8g2_t *u8g2, uint16_t label, int x, int y){")
+                cjk_c.append("  const MuiLabel l=mui_labels[label];")
+                cjk_c.append(f"  int cy=y - {px} + u8g2_GetMaxCharHeight(u8g2);")
+                cjk_c.append("  for(uint16_t k=0; k<l.count; ++k){")
+                cjk_c.append("    const MuiGlyphRef g=mui_label_glyphs[l.first+k];")
+                cjk_c.append("    if(g.glyph & 0x8000) draw_cjk_glyph(u8g2, g.glyph & 0x7FFF, x+g.x, cy);")
+                cjk_c.append("    else u8g2_DrawGlyph(u8g2, x+g.x, y, g.glyph);")
+                cjk_c.append("  }")
+                cjk_c.append("}")
+
+        # 先收集全部文件，预算检查通过后再写盘，超预算时不留下半套导出
+        pending = []
+        def _write(path, lines):
+            pending.append((path, lines))
+
+        mui_dir = os.path.join(out_dir, "MUI")
+        if not no_u8g2:
+            menu_dir = os.path.join(mui_dir, "menu")
+            fonts_dir = os.path.join(mui_dir, "fonts")
+            callbacks_dir = os.path.join(mui_dir, "callbacks")
+            _write(os.path.join(menu_dir, "menu.h"), menu_h)
+            _write(os.path.join(menu_dir, "menu.c"), menu_c)
+            if ascii_h:
+                _write(os.path.join(fonts_dir, "ascii_font.h"), ascii_h)
+                _write(os.path.join(fonts_dir, "ascii_font.c"), ascii_c)
+            if cjk_h:
+                _write(os.path.join(fonts_dir, "cjk_font.h"), cjk_h)
+                _write(os.path.join(fonts_dir, "cjk_font.c"), cjk_c)
+            if font_h:
+                _write(os.path.join(fonts_dir, "mui_font.h"), font_h)
+                _write(os.path.join(fonts_dir, "mui_font.c"), font_c)
+            _write(os.path.join(callbacks_dir, "callbacks.h"), callbacks_h)
+            _write(os.path.join(callbacks_dir, "callbacks.c"), callbacks_c)
+            # 导出移植接口与聚合头
+            port_h = []
+            port_h.append("#ifndef PORTING_INTERFACE_H")
+            port_h.append("#define PORTING_INTERFACE_H")
+            port_h.append("#include <stdint.h>")
+            port_h.append("#include \"menu/menu.h\"")
+            port_h.append("typedef enum { MENU_KEY_NONE=0, MENU_KEY_UP, MENU_KEY_DOWN, MENU_KEY_ENTER, MENU_KEY_BACK } MenuKey;")
+            port_h.append("typedef struct { uint8_t cursor; uint8_t view_start; } MenuState;")
+            port_h.append(f"typedef struct {{ {item}* current; {item}* stack[16]; uint8_t depth; MenuState state; }} MenuNav;")
+            port_h.append(f"void menu_nav_init(MenuNav* nav, {item}* root);")
+            port_h.append("void menu_nav_on_key(MenuNav* nav, MenuKey key, uint8_t visible_lines);")
+            port_h.append("#endif")
+            _write(os.path.join(mui_dir, "porting_interface.h"), port_h)
+
+            port_c = []
+            port_c.append("#include \"porting_interface.h\"")
+            port_c.append("")
+            port_c.append(f"void menu_nav_init(MenuNav* nav, {item}* root){{")
+            port_c.append("  nav->current = root;")
+            port_c.append("  nav->depth = 0;")
+            port_c.append("  nav->state.cursor = 0;")
+            port_c.append("  nav->state.view_start = 0;")
+            port_c.append("}")
+            port_c.append("")
+            port_c.append("void menu_nav_on_key(MenuNav* nav, MenuKey key, uint8_t visible_lines){")
+            port_c.append("  if(!nav || !nav->current) return;")
+            port_c.append("  uint8_t count = nav->current->child_count;")
+            port_c.append("  switch(key){")
+            port_c.append("    case MENU_KEY_UP: if(nav->state.cursor > 0) nav->state.cursor--; break;")
+            port_c.append("    case MENU_KEY_DOWN: if(nav->state.cursor + 1 < count) nav->state.cursor++; break;")
+            port_c.append("    case MENU_KEY_ENTER: {")
+            port_c.append(f"      {item}* sel = &{child('nav->current', 'nav->state.cursor')};")
+            port_c.append(f"      {call_cb('sel')}")
+            port_c.append("      else if(sel->child_count){ if(nav->depth < 16) nav->stack[nav->depth++] = nav->current; nav->current = sel; nav->state.cursor = 0; nav->state.view_start = 0; }")
+            port_c.append("    } break;")
+            port_c.append("    case MENU_KEY_BACK: if(nav->depth > 0){ nav->current = nav->stack[--nav->depth]; nav->state.cursor = 0; nav->state.view_start = 0; } break;")
+            port_c.append("    default: break;")
+            port_c.append("  }")
+            port_c.append("  if(nav->state.cursor < nav->state.view_start) nav->state.view_start = nav->state.cursor;")
+            port_c.append("  if(visible_lines > 0 && nav->state.cursor >= nav->state.view_start + visible_lines) nav->state.view_start = nav->state.cursor - visible_lines + 1;")
+            port_c.append("}")
+            _write(os.path.join(mui_dir, "porting_interface.c"), port_c)
+            bundle_h = []
+            bundle_h.append("#ifndef U8G2_CODE_BUNDLE_H")
+            bundle_h.append("#define U8G2_CODE_BUNDLE_H")
+            bundle_h.append("#include \"menu/menu.h\"")
+            bundle_h.append("#include \"porting_interface.h\"")
+            bundle_h.append("#include \"callbacks/callbacks.h\"")
+            if cjk_h:
+                bundle_h.append("#include \"fonts/cjk_font.h\"")
+            if font_h:
+                bundle_h.append("#include \"fonts/mui_font.h\"")
+            bundle_h.append("#endif")
+            _write(os.path.join(mui_dir, "mui_bundle.h"), bundle_h)
+        else:
+            bare_dir = mui_dir
+            bare_menu_h = []
+            bare_menu_h.append("#ifndef MENU_BARE_H")
+            bare_menu_h.append("#define MENU_BARE_H")
+            bare_menu_h.append("#include <stdint.h>")
+            bare_menu_h.append("#include <stddef.h>")
+            if flat:
+                bare_menu_h.append("typedef struct MenuItem { " + item_fields + "} MenuItem;")
+                bare_menu_h.append("#define MENU_NO_CALLBACK 0xFFFF")
+                bare_menu_h.append("extern const MenuItem menu_nodes[];")
+                bare_menu_h.append("extern void (*const menu_callbacks[])(void);")
+                bare_menu_h.append("extern const MenuItem *const menu_root;")
+            else:
+                bare_menu_h.append("typedef struct MenuItem { " + item_fields + "} MenuItem;")
+                bare_menu_h.append("extern MenuItem *menu_root;")
+            bare_menu_h.append("void draw_menu_bare(uint8_t cursor, uint8_t view_start);")
+            bare_menu_h.append("void mui_nav_init(void);")
+            bare_menu_h.append("void mui_nav_on_key(uint8_t key);")
+            bare_menu_h.append("void mui_anim_tick(int dt_ms);")
+            bare_menu_h.append("void mui_set_tick_source(uint32_t (*millis)(void));")
+            bare_menu_h.append("void mui_anim_update(void);")
+            bare_menu_h.append("uint8_t mui_get_cursor(void);")
+            bare_menu_h.append("uint8_t mui_get_view_start(void);")
+            # 按键、动画推进或 mui_invalidate（菜单外数据变化）置脏，draw_menu_bare 清除
+            bare_menu_h.append("uint8_t mui_needs_redraw(void);")
+            bare_menu_h.append("void mui_invalidate(void);")
+            bare_menu_h.append("#ifndef MUI_CB_PRINT")
+            bare_menu_h.append("#include <stdio.h>")
+            bare_menu_h.append("#define MUI_CB_PRINT(msg) do { printf(\"%s\\n\", (msg)); } while(0)")
+            bare_menu_h.append("#endif")
+            bare_menu_h.append("#endif")
+            bare_menu_c = []
+            bare_menu_c.append("#include \"menu_bare.h\"")
+            bare_menu_c.append("#include \"gfx_port.h\"")
+            def gen_callbacks_to_bare(lines, node):
+                for c in node.children:
+                    if c.is_exec:
+                        cb = c.callback_name if c.callback_name else f"menu_cb_{c.id}"
+                        cb = _sanitize_ident(cb, f"menu_cb_{c.id}")
+                        lines.append(f"void {cb}(void){{ MUI_CB_PRINT(\"{cb}\"); }}")
+                    gen_callbacks_to_bare(lines, c)
+            gen_callbacks_to_bare(bare_menu_c, self.menu_root)
+            bare_menu_c.append("")
+            def gen_nodes_bare(lines, node):
+                for c in node.children:
+                    if c.children:
+                        gen_nodes_bare(lines, c)
+                arr_name = f"{_sanitize_ident(node.name, f'node_{node.id}')}_{node.id}_children"
+                lines.append(f"MenuItem {arr_name}[{len(node.children)}] = {{")
+                for c in node.children:
+                    child_ptr = f"{_sanitize_ident(c.name, f'node_{c.id}')}_{c.id}_children" if c.children else "NULL"
+                    cb_name = c.callback_name if c.callback_name else (f"menu_cb_{c.id}" if c.is_exec else "")
+                    cb_ptr = _sanitize_ident(cb_name, f"menu_cb_{c.id}") if c.is_exec else "NULL"
+                    lines.append(f'  {{"{c.name}", {1 if c.is_exec else 0}, {len(c.children)}, {child_ptr}, {cb_ptr}{lab(c)}}},')
+                lines.append("};")
+                lines.append("")
+            if flat:
+                self._emit_menu_table(bare_menu_c, label_idx)
+            else:
+                gen_nodes_bare(bare_menu_c, self.menu_root)
+                root_arr_name_bare = f"{_sanitize_ident(self.menu_root.name, f'node_{self.menu_root.id}')}_{self.menu_root.id}_children"
+                bare_menu_c.append(f'MenuItem menu_root_node = {{"{self.menu_root.name}", 0, {len(self.menu_root.children)}, {root_arr_name_bare}, NULL{lab(self.menu_root)}}};')
+                bare_menu_c.append("MenuItem *menu_root = &menu_root_node;")
+            bare_menu_c.append("")
+            bare_menu_c.append("static uint8_t g_cursor=0; static uint8_t g_view=0; static uint8_t g_last_view=0;")
+            bare_menu_c.append("static int g_from=0; static int g_to=0;")
+            bare_menu_c.append("static uint8_t g_dirty=1;")
+            bare_menu_c.append("uint8_t mui_needs_redraw(void){ return g_dirty; }")
+            bare_menu_c.append("void mui_invalidate(void){ g_dirty=1; }")
+            bare_menu_c.extend(self._emit_ease_lut())
+            bare_menu_c.append("static uint16_t g_anim_t=MUI_ANIM_MS;  /* 当前动画已进行的毫秒数 */")
+            bare_menu_c.append("static uint32_t (*g_millis)(void)=0; static uint32_t g_last_ms=0;")
+            bare_menu_c.append("void mui_set_tick_source(uint32_t (*millis)(void)){ g_millis=millis; if(millis) g_last_ms=millis(); }")
+            bare_menu_c.append("void mui_anim_tick(int dt_ms){ if(g_anim_t < MUI_ANIM_MS && dt_ms > 0){ uint32_t t=(uint32_t)g_anim_t + (uint32_t)dt_ms; g_anim_t = t > MUI_ANIM_MS ? MUI_ANIM_MS : (uint16_t)t; g_dirty=1; } }")
+            # 按实际经过的毫秒推进：绘制跟不上时直接跳到当前时刻对应的位置（跳帧）
+            bare_menu_c.append("void mui_anim_update(void){ if(!g_millis) return; uint32_t now=g_millis(); uint32_t dt=now-g_last_ms; g_last_ms=now; if(dt > MUI_ANIM_MS) dt=MUI_ANIM_MS; mui_anim_tick((int)dt); }")
+            bare_menu_c.append("void mui_nav_init(void){ g_cursor=0; g_view=0; g_last_view=0; g_from=0; g_to=0; g_anim_t=MUI_ANIM_MS; g_dirty=1; }")
+            bare_menu_c.append(f"void mui_nav_on_key(uint8_t key){{ uint8_t count=menu_root->child_count; if(key) g_dirty=1; if(key==1){{ if(g_cursor>0) g_cursor--; }} else if(key==2){{ if(g_cursor+1<count) g_cursor++; }} else if(key==3){{ {item}* sel=&{child('menu_root', 'g_cursor')}; {call_cb('sel')} }} else if(key==4){{ }}"
+                               " if(g_cursor < g_view) g_view = g_cursor; int scr_h=gfx_height(); int line_h=12; int bottom=12; int vis = (scr_h-bottom)/line_h; if(vis>0 && g_cursor >= g_view + vis) g_view = g_cursor - vis + 1; int delta = (int)g_view - (int)g_last_view; if(delta != 0){ int step = line_h * (delta>0 ? 1 : -1) * ( (delta>0?delta:-delta) > 3 ? 3 : (delta>0?delta:-delta) ); g_from = step; g_to = 0; g_anim_t = 0; if(g_millis) g_last_ms = g_millis(); g_last_view = g_view; } }")
+            bare_menu_c.append("uint8_t mui_get_cursor(void){ return g_cursor; }")
+            bare_menu_c.append("uint8_t mui_get_view_start(void){ return g_view; }")
+            row_text = f"gfx_draw_label(margin_x, y, {child('menu_root', 'idx')}.label); }}" if preshape else f"const char* txt = {child('menu_root', 'idx')}.name; gfx_draw_text_mixed(margin_x, y, txt); }}"
+            nav_text = "gfx_draw_label(2, nav_y, MUI_LABEL_NAV);" if preshape else f"gfx_draw_text_mixed(2, nav_y, \"{self.NAV_HINT}\");"
+            if tft:
+                # 每个页条重放一遍绘制：图元裁剪到当前页条，整行落在页条外的菜单项直接跳过，不做文字解码与查表
+                # 一行占 [y-(line_h-1), y] 的选中条与 [y+12-px, y+12) 的文字单元
+                row_top = max(11, px - 12)
+                bare_menu_c.append("static void draw_menu_strip(uint8_t cursor, uint8_t view_start){")
+            else:
+                bare_menu_c.append("void draw_menu_bare(uint8_t cursor, uint8_t view_start){")
+            bare_menu_c.append("  int base_y=12; int line_h=12; int margin_x=2; int bottom_h=12;")
+            bare_menu_c.append("  int scr_w=gfx_width(); int scr_h=gfx_height(); int eff_h = scr_h - bottom_h; int vis = eff_h / line_h; if(vis<1) vis=1;")
+            if tft:
+                bare_menu_c.append("  int sy0=gfx_strip_y0(); int sy1=gfx_strip_y1();")
+            else:
+                bare_menu_c.append("  gfx_clear();")
+            bare_menu_c.append("  int total = menu_root->child_count;")
+            # 与预览的 int(from + (to-from)*e) 一致：整体按 Q0.8 计算后再截断
+            bare_menu_c.append("  int off = (g_from*255 + (g_to - g_from) * (int)mui_ease_lut[g_anim_t]) / 255;")
+            if tft:
+                bare_menu_c.append(f"  for(int i=0;i<vis;i++){{ int idx = view_start + i; if(idx>=total) break; int y = base_y + i*line_h + off; if(y+12 <= sy0) continue; if(y-{row_top} >= sy1) break; if(idx==cursor){{ gfx_set_color(MUI_COLOR_SEL_BG); gfx_fill_rect(0, y-(line_h-1), scr_w, line_h); gfx_set_color(MUI_COLOR_SEL_FG); }} else gfx_set_color(MUI_COLOR_FG); " + row_text)
+                bare_menu_c.append("  gfx_set_color(MUI_COLOR_FG);")
+            else:
+                bare_menu_c.append("  for(int i=0;i<vis;i++){ int idx = view_start + i; if(idx>=total) break; int y = base_y + i*line_h + off; if(idx==cursor){ gfx_fill_rect(0, y-(line_h-1), scr_w, line_h); } " + row_text)
+            bare_menu_c.append("  if(total>vis){ int track_x = scr_w-3; int track_y = base_y- (line_h-1); int track_h = vis*line_h; gfx_vline(track_x, track_y, track_h); int thumb_h = track_h * vis / total; if(thumb_h<4) thumb_h=4; int thumb_y = track_y + (track_h - thumb_h) * view_start / (total - vis); gfx_fill_rect(track_x+1, thumb_y, 2, thumb_h); }")
+            if tft:
+                bare_menu_c.append(f"  int nav_y = eff_h + (bottom_h/2); if(nav_y+12 > sy0 && nav_y+12-{px} < sy1) " + nav_text)
+                bare_menu_c.append("}")
+                bare_menu_c.append("void draw_menu_bare(uint8_t cursor, uint8_t view_start){")
+                bare_menu_c.append("  for(int y0=0; y0<gfx_height(); y0+=MUI_TFT_STRIP){ gfx_strip_begin(y0); draw_menu_strip(cursor, view_start); gfx_strip_end(); }")
+            else:
+                bare_menu_c.append("  int nav_y = eff_h + (bottom_h/2); " + nav_text)
+                bare_menu_c.append("  gfx_send_async();")
+            bare_menu_c.append("  g_dirty=0;")
+            bare_menu_c.append("}")
+            gfx_h = []
+            gfx_h.append("#ifndef GFX_PORT_H")
+            gfx_h.append("#define GFX_PORT_H")
+            gfx_h.append("#include <stdint.h>")
+            if tft:
+                tft_w, tft_h = self._screen_size()
+                strip = self._tft_strip_lines(tft_w, tft_h)
+                bufs = self._tft_strip_bufs()
+                gfx_h.append(f"#define GFX_W {tft_w}")
+                gfx_h.append(f"#define GFX_H {tft_h}")
+                gfx_h.append("/* 页条行数：RAM 为 GFX_W*MUI_TFT_STRIP*2 字节 × MUI_TFT_STRIP_BUFS，与屏高无关 */")
+                gfx_h.append("#ifndef MUI_TFT_STRIP")
+                gfx_h.append(f"#define MUI_TFT_STRIP {strip}")
+                gfx_h.append("#endif")
+                gfx_h.append("/* 2：一块页条在发送时绘制另一块；1：每个页条先等上一条发完 */")
+                gfx_h.append("#ifndef MUI_TFT_STRIP_BUFS")
+                gfx_h.append(f"#define MUI_TFT_STRIP_BUFS {bufs}")
+                gfx_h.append("#endif")
+                gfx_h.append("/* 缓冲中的像素按屏的字节序存放（高字节先发），8 位 SPI/DMA 直接发送 */")
+                gfx_h.append("#ifndef MUI_TFT_BYTE_SWAP")
+                gfx_h.append("#define MUI_TFT_BYTE_SWAP 1")
+                gfx_h.append("#endif")
+                gfx_h.append("#define MUI_TFT_PX(c) ((uint16_t)(MUI_TFT_BYTE_SWAP ? ((((c)>>8)&0xFF)|(((c)&0xFF)<<8)) : (c)))")
+                gfx_h.append("/* 工程配色（RGB565）：bg_color / font_color / selected_bg / selected_font */")
+                for name, key in (("BG", 'bg_color'), ("FG", 'font_color'), ("SEL_BG", 'selected_bg'), ("SEL_FG", 'selected_font')):
+                    gfx_h.append(f"#define MUI_COLOR_{name} 0x{self._tft_color(key):04X}")
+                gfx_h.append("void gfx_init(void);")
+                gfx_h.append("void gfx_set_color(uint16_t rgb565);")
+                gfx_h.append("void gfx_strip_begin(int y0);  /* 开始绘制 [y0, y0+MUI_TFT_STRIP) 的页条并清为背景色 */")
+                gfx_h.append("void gfx_strip_end(void);  /* 发送当前页条，换到另一块缓冲 */")
+                gfx_h.append("int gfx_strip_y0(void);")
+                gfx_h.append("int gfx_strip_y1(void);")
+            else:
+                gfx_h.append("void gfx_init(void);")
+                gfx_h.append("void gfx_clear(void);")
+                gfx_h.append("void gfx_send(void);")
+                # 异步刷新：发起后立即返回，可继续绘制下一帧；上一帧未发完时再次发起会先等待
+                gfx_h.append("void gfx_send_async(void);")
+            gfx_h.append("int gfx_flush_busy(void);")
+            gfx_h.append("void gfx_set_flush_done_cb(void (*cb)(void));")
+            gfx_h.append("void gfx_draw_pixel(int x,int y);")
+            gfx_h.append("void gfx_fill_rect(int x,int y,int w,int h);")
+            gfx_h.append("void gfx_hline(int x,int y,int w);")
+            gfx_h.append("void gfx_vline(int x,int y,int h);")
+            gfx_h.append("void gfx_draw_bitmap_1bpp(int x,int y,int w,int h,const uint8_t* data);")
+            gfx_h.append("void gfx_draw_bitmap_pages(int x,int y,int w,int h,const uint8_t* data);")
+            gfx_h.append("void gfx_draw_text_mixed(int x,int y,const char* utf8);")
+            if preshape:
+                gfx_h.extend(self.LABEL_TYPES)
+                gfx_h.append(f"#define MUI_LABEL_NAV {label_idx[self.NAV_HINT]}")
+                gfx_h.append("extern const MuiGlyphRef mui_label_glyphs[];")
+                gfx_h.append("extern const MuiLabel mui_labels[];")
+                gfx_h.append("void gfx_draw_label(int x,int y,uint16_t label);")
+            gfx_h.append("int gfx_width(void);")
+            gfx_h.append("int gfx_height(void);")
+            if tft:
+                gfx_h.append("/* 屏驱动（移植实现）：开窗 (0,y0)-(GFX_W-1,y0+h-1) 并发送 GFX_W*h 个像素，可异步返回，发送完成后调用 gfx_tft_write_done */")
+                gfx_h.append("void tft_panel_init(void);")
+                gfx_h.append("void tft_panel_write(int y0,int h,const uint16_t* px);")
+                gfx_h.append("void gfx_tft_write_done(void);")
+            gfx_h.append("#endif")
+            gfx_c = []
+            gfx_c.append("#include \"gfx_port.h\"")
+            if tft:
+                # 屏驱动桩：换成开窗 + 发送像素（SPI/8080）；用 DMA 异步发送时在完成中断里调用 gfx_tft_write_done
+                gfx_c.append("void tft_panel_init(void){}")
+                gfx_c.append("void tft_panel_write(int y0,int h,const uint16_t* px){ (void)y0; (void)h; (void)px; gfx_tft_write_done(); }")
+                # 页条缓冲与绘制原语与屏驱动无关，单独成文件，桩实现、STM32 模板与仿真共用
+                tft_c = []
+                tft_c.append("#include \"gfx_port.h\"")
+                tft_c.append("#ifndef MUI_TFT_WAIT")
+                tft_c.append("#define MUI_TFT_WAIT() ((void)0)")
+                tft_c.append("#endif")
+                tft_c.append("static uint16_t strip_buf[MUI_TFT_STRIP_BUFS][GFX_W*MUI_TFT_STRIP];")
+                tft_c.append("static uint16_t* strip=strip_buf[0]; static uint8_t strip_i=0;")
+                tft_c.append("static int strip_y0=0, strip_y1=0;")
+                tft_c.append("static uint16_t color;")
+                tft_c.append("static volatile uint8_t in_flight=0, frame_end=0;")
+                tft_c.append("static void (*flush_done_cb)(void);")
+                tft_c.append("int gfx_width(void){ return GFX_W; }")
+                tft_c.append("int gfx_height(void){ return GFX_H; }")
+                tft_c.append("int gfx_strip_y0(void){ return strip_y0; }")
+                tft_c.append("int gfx_strip_y1(void){ return strip_y1; }")
+                tft_c.append("void gfx_init(void){ tft_panel_init(); }")
+                tft_c.append("void gfx_set_color(uint16_t rgb565){ color=MUI_TFT_PX(rgb565); }")
+                tft_c.append("int gfx_flush_busy(void){ return in_flight; }")
+                tft_c.append("void gfx_set_flush_done_cb(void (*cb)(void)){ flush_done_cb = cb; }")
+                # 屏驱动发送完一个页条后调用（可在中断里）；整帧最后一条发完时通知 flush_done_cb
+                tft_c.append("void gfx_tft_write_done(void){ in_flight=0; if(frame_end){ frame_end=0; if(flush_done_cb) flush_done_cb(); } }")
+                tft_c.append("void gfx_strip_begin(int y0){")
+                tft_c.append("  if(MUI_TFT_STRIP_BUFS==1) while(in_flight) MUI_TFT_WAIT();")
+                tft_c.append("  strip_y0=y0; strip_y1=(y0+MUI_TFT_STRIP > GFX_H) ? GFX_H : y0+MUI_TFT_STRIP;")
+                tft_c.append("  uint16_t bg=MUI_TFT_PX(MUI_COLOR_BG); for(int i=0, n=GFX_W*(strip_y1-strip_y0); i<n; ++i) strip[i]=bg;")
+                tft_c.append("}")
+                # 屏一次只能接收一个窗口：先等上一条发完再发起本条，随后换到刚发完的那块缓冲继续绘制
+                tft_c.append("void gfx_strip_end(void){")
+                tft_c.append("  while(in_flight) MUI_TFT_WAIT();")
+                tft_c.append("  in_flight=1; frame_end=(uint8_t)(strip_y1>=GFX_H);")
+                tft_c.append("  tft_panel_write(strip_y0, strip_y1-strip_y0, strip);")
+                tft_c.append("  if(MUI_TFT_STRIP_BUFS>1){ strip_i^=1; strip=strip_buf[strip_i]; }")
+                tft_c.append("}")
+                # 图元先裁剪到屏宽与当前页条，再按行写入；位图只遍历落在页条内的行
+                tft_c.append("void gfx_draw_pixel(int x,int y){ if(x<0||x>=GFX_W||y<strip_y0||y>=strip_y1) return; strip[(y-strip_y0)*GFX_W + x]=color; }")
+                tft_c.append("void gfx_fill_rect(int x,int y,int w,int h){")
+                tft_c.append("  if(x<0){ w+=x; x=0; } if(x+w>GFX_W) w=GFX_W-x; if(y<strip_y0){ h-=strip_y0-y; y=strip_y0; } if(y+h>strip_y1) h=strip_y1-y; if(w<=0||h<=0) return;")
+                tft_c.append("  for(int yy=0; yy<h; ++yy){ uint16_t* p=&strip[(y-strip_y0+yy)*GFX_W + x]; for(int i=0; i<w; ++i) p[i]=color; }")
+                tft_c.append("}")
+                tft_c.append("void gfx_hline(int x,int y,int w){ gfx_fill_rect(x,y,w,1); }")
+                tft_c.append("void gfx_vline(int x,int y,int h){ gfx_fill_rect(x,y,1,h); }")
+                tft_c.append("void gfx_draw_bitmap_1bpp(int x,int y,int w,int h,const uint8_t* data){")
+                tft_c.append("  int stride=(w+7)/8; int r0 = y<strip_y0 ? strip_y0-y : 0; int r1 = y+h>strip_y1 ? strip_y1-y : h;")
+                tft_c.append("  for(int yy=r0; yy<r1; ++yy){ const uint8_t* row=data+yy*stride; uint16_t* p=&strip[(y+yy-strip_y0)*GFX_W]; int bit=0; uint8_t b=0; for(int xx=0; xx<w; ++xx){ if(bit==0){ b=*row++; bit=8; } if((b&0x80) && (unsigned)(x+xx)<(unsigned)GFX_W) p[x+xx]=color; b<<=1; bit--; } }")
+                tft_c.append("}")
+                tft_c.append("void gfx_draw_bitmap_pages(int x,int y,int w,int h,const uint8_t* data){")
+                tft_c.append("  int r0 = y<strip_y0 ? strip_y0-y : 0; int r1 = y+h>strip_y1 ? strip_y1-y : h;")
+                tft_c.append("  for(int yy=r0; yy<r1; ++yy){ const uint8_t* col=data+(yy>>3)*w; uint16_t* p=&strip[(y+yy-strip_y0)*GFX_W]; for(int xx=0; xx<w; ++xx){ if((col[xx]&(1<<(yy&7))) && (unsigned)(x+xx)<(unsigned)GFX_W) p[x+xx]=color; } }")
+                tft_c.append("}")
+                self._account("帧缓与刷新", f"strip_buf（RGB565 {tft_w}x{strip} × {bufs}）", ram=bufs * tft_w * strip * 2)
+                self.log(f"TFT 页条 {tft_w}x{strip} × {bufs} 块共 {bufs * tft_w * strip * 2} 字节（整屏 RGB565 帧缓需 {tft_w * tft_h * 2} 字节）")
+            else:
+                gfx_c.append("")
+                scr_w, scr_h = self._screen_size()
+                gfx_c.append(f"int gfx_width(void){{ return {scr_w}; }}");
+                gfx_c.append(f"int gfx_height(void){{ return {scr_h}; }}");
+                gfx_c.append("void gfx_init(void){}");
+                gfx_c.append("void gfx_send(void){}");
+                gfx_c.append("static void (*flush_done_cb)(void);")
+                gfx_c.append("void gfx_send_async(void){ gfx_send(); if(flush_done_cb) flush_done_cb(); }")
+                gfx_c.append("int gfx_flush_busy(void){ return 0; }")
+                gfx_c.append("void gfx_set_flush_done_cb(void (*cb)(void)){ flush_done_cb = cb; }")
+                # 定义 GFX_FB_ROW_MAJOR 时提供行主序 1bpp 帧缓（每行 (W+7)/8 字节，高位在左），gfx_send 里把 fb 发给屏即可：
+                # 横线与矩形按行整段写入，首末字节用头/尾掩码 OR，中间 memset 0xFF，与 STM32 模板按页填充同理
+                gfx_c.append("#ifdef GFX_FB_ROW_MAJOR")
+                gfx_c.append("#include <string.h>")
+                gfx_c.append(f"#define GFX_W {scr_w}")
+                gfx_c.append(f"#define GFX_H {scr_h}")
+                gfx_c.append("#define GFX_STRIDE ((GFX_W+7)/8)")
+                gfx_c.append("static uint8_t fb[GFX_H*GFX_STRIDE];")
+                gfx_c.append("void gfx_clear(void){ memset(fb,0,sizeof(fb)); }")
+                gfx_c.append("void gfx_draw_pixel(int x,int y){ if(x<0||x>=GFX_W||y<0||y>=GFX_H) return; fb[y*GFX_STRIDE+(x>>3)] |= (uint8_t)(0x80>>(x&7)); }")
+                gfx_c.append("static void row_span(uint8_t* row,int x0,int x1){ int b0=x0>>3, b1=x1>>3; uint8_t m0=(uint8_t)(0xFF>>(x0&7)), m1=(uint8_t)(0xFF<<(7-(x1&7))); if(b0==b1){ row[b0] |= (uint8_t)(m0&m1); return; } row[b0] |= m0; if(b1>b0+1) memset(&row[b0+1],0xFF,(size_t)(b1-b0-1)); row[b1] |= m1; }")
+                gfx_c.append("void gfx_fill_rect(int x,int y,int w,int h){")
+                gfx_c.append("  if(x<0){ w+=x; x=0; } if(y<0){ h+=y; y=0; } if(x+w>GFX_W) w=GFX_W-x; if(y+h>GFX_H) h=GFX_H-y; if(w<=0||h<=0) return;")
+                gfx_c.append("  for(int yy=y; yy<y+h; ++yy) row_span(&fb[yy*GFX_STRIDE],x,x+w-1);")
+                gfx_c.append("}")
+                gfx_c.append("void gfx_hline(int x,int y,int w){ gfx_fill_rect(x,y,w,1); }")
+                gfx_c.append("void gfx_vline(int x,int y,int h){ if(x<0||x>=GFX_W) return; if(y<0){ h+=y; y=0; } if(y+h>GFX_H) h=GFX_H-y; uint8_t* p=&fb[y*GFX_STRIDE+(x>>3)]; const uint8_t m=(uint8_t)(0x80>>(x&7)); for(int i=0; i<h; ++i, p+=GFX_STRIDE) *p |= m; }")
+                gfx_c.append("#else")
+                gfx_c.append("void gfx_clear(void){}");
+                gfx_c.append("void gfx_draw_pixel(int x,int y){}");
+                # 先裁剪再按行/列绘制，逐像素不再判断边界；帧缓布局未知，只能经 gfx_draw_pixel 逐像素写
+                gfx_c.append("void gfx_hline(int x,int y,int w){ if(y<0||y>=gfx_height()) return; if(x<0){ w+=x; x=0; } if(x+w>gfx_width()) w=gfx_width()-x; for(int i=0; i<w; ++i) gfx_draw_pixel(x+i,y); }");
+                gfx_c.append("void gfx_vline(int x,int y,int h){ if(x<0||x>=gfx_width()) return; if(y<0){ h+=y; y=0; } if(y+h>gfx_height()) h=gfx_height()-y; for(int i=0; i<h; ++i) gfx_draw_pixel(x,y+i); }");
+                gfx_c.append("void gfx_fill_rect(int x,int y,int w,int h){ if(y<0){ h+=y; y=0; } if(y+h>gfx_height()) h=gfx_height()-y; for(int yy=0; yy<h; ++yy) gfx_hline(x,y+yy,w); }");
+                gfx_c.append("#endif")
+                gfx_c.append("void gfx_draw_bitmap_1bpp(int x,int y,int w,int h,const uint8_t* data){ int stride=(w+7)/8; for(int yy=0; yy<h; ++yy){ const uint8_t* row=data+yy*stride; int bit=0; uint8_t b=0; for(int xx=0; xx<w; ++xx){ if(bit==0){ b=*row++; bit=8; } int on=(b&0x80)?1:0; b<<=1; bit--; if(on) gfx_draw_pixel(x+xx,y+yy); } } }");
+                gfx_c.append("void gfx_draw_bitmap_pages(int x,int y,int w,int h,const uint8_t* data){ for(int yy=0; yy<h; ++yy){ const uint8_t* col=data+(yy>>3)*w; for(int xx=0; xx<w; ++xx){ if(col[xx]&(1<<(yy&7))) gfx_draw_pixel(x+xx,y+yy); } } }");
+            # 字库与混排文本只依赖 gfx_draw_pixel/gfx_draw_bitmap_1bpp，单独成文件，桩实现与 STM32 实现共用
+            text_c = []
+            text_c.append("#include \"gfx_port.h\"")
+            # 未导出的字库不参与文字绘制，保证关闭字库选项时仍可编译
+            has_ascii = self._opt('emit_font_array')
+            has_cjk = self._opt('emit_cjk_subset') and bool(self._cjk_chars())
+            fmt = self._glyph_format()
+            rle = fmt == 'rle'
+            if has_ascii:
+                text_c.extend(self._emit_ascii_font_full())
+            if has_cjk:
+                text_c.extend(self._emit_cjk_font_subset())
+            text_c.append("")
+            if rle and (has_ascii or has_cjk):
+                text_c.extend(self._rle_decoder("", lambda x, y: f"gfx_draw_pixel({x}, {y})"))
+            # 字形位图只保存墨迹包围盒：绘制位置加上 x_off/y_off，光标按 advance 前进
+            def blit(var, prefix):
+                if rle and tft:
+                    # 游程要从头解码：整个字形落在当前页条外时不解码
+                    return f"{{ int gy=y-{px}+12+{var}.y_off; if(gy < gfx_strip_y1() && gy+{var}.h > gfx_strip_y0()) draw_glyph_rle(cx+{var}.x_off, gy, {var}.w, {var}.h, {prefix}_bitmap_{px}+{var}.offset, {prefix}_rle_bits_{px}); }}"
+                if rle:
+                    return f"draw_glyph_rle(cx+{var}.x_off, y-{px}+12+{var}.y_off, {var}.w, {var}.h, {prefix}_bitmap_{px}+{var}.offset, {prefix}_rle_bits_{px});"
+                if fmt == 'page':
+                    return f"gfx_draw_bitmap_pages(cx+{var}.x_off, y-{px}+12+{var}.y_off, {var}.w, {var}.h, {prefix}_bitmap_{px}+{var}.offset);"
+                return f"gfx_draw_bitmap_1bpp(cx+{var}.x_off, y-{px}+12+{var}.y_off, {var}.w, {var}.h, {prefix}_bitmap_{px}+{var}.offset);"
+            if has_ascii:
+                text_c.append(f"static int find_ascii(uint16_t code){{ int n=sizeof(ascii_table_{px})/sizeof(AsciiGlyph); int l=0,r=n-1; while(l<=r){{ int m=(l+r)/2; if(ascii_table_{px}[m].code==code) return m; if(ascii_table_{px}[m].code<code) l=m+1; else r=m-1;}} return -1; }}")
+                ascii_draw = f"int idx=find_ascii(c); if(idx>=0){{ const AsciiGlyph a=ascii_table_{px}[idx]; {blit('a', 'ascii')} cx += a.advance; }}"
+            else:
+                ascii_draw = "cx += 6;"
+            if has_cjk:
+                text_c.append(f"static int find_cjk(uint16_t code){{ int n=sizeof(cjk_table_{px})/sizeof(GlyphEntry); int l=0,r=n-1; while(l<=r){{ int m=(l+r)/2; if(cjk_table_{px}[m].code==code) return m; if(cjk_table_{px}[m].code<code) l=m+1; else r=m-1;}} return -1; }}")
+                cjk_draw = f"int idx=find_cjk(cp); if(idx>=0){{ const GlyphEntry e=cjk_table_{px}[idx]; {blit('e', 'cjk')} cx += e.advance; }} else {{ cx += 6; }}"
+            else:
+                cjk_draw = "cx += 6;"
+            text_c.append("void gfx_draw_text_mixed(int x,int y,const char* utf8){")
+            text_c.append(f"  uint32_t i=0; int cx=x; while(utf8[i]){{ uint8_t c=(uint8_t)utf8[i]; if(c<128){{ {ascii_draw} i++; }} else {{")
+            text_c.append("    uint8_t c1=(uint8_t)utf8[i+1]; uint8_t c2=(uint8_t)utf8[i+2]; uint16_t cp=((c & 0x0F)<<12) | ((c1 & 0x3F)<<6) | (c2 & 0x3F); i+=3; ")
+            text_c.append(f"    {cjk_draw} }}")
+            text_c.append("  }")
+            text_c.append("}")
+            if preshape:
+                text_c.extend(self._emit_labels())
+                text_c.append("")
+                text_c.append("void gfx_draw_label(int x,int y,uint16_t label){")
+                text_c.append("  const MuiLabel l=mui_labels[label];")
+                text_c.append("  for(uint16_t k=0; k<l.count; ++k){ const MuiGlyphRef g=mui_label_glyphs[l.first+k]; int cx=x+g.x;")
+                if has_cjk:
+                    text_c.append(f"    if(g.glyph & 0x8000){{ const GlyphEntry e=cjk_table_{px}[g.glyph & 0x7FFF]; {blit('e', 'cjk')} continue; }}")
+                if has_ascii:
+                    text_c.append(f"    {{ const AsciiGlyph a=ascii_table_{px}[g.glyph]; {blit('a', 'ascii')} }}")
+                else:
+                    text_c.append("    (void)cx;")
+                text_c.append("  }")
+                text_c.append("}")
+            example_c = []
+            example_c.append("#include \"menu_bare.h\"")
+            example_c.append("#include \"gfx_port.h\"")
+            example_c.append("#include \"input_port.h\"")
+            example_c.append("#include <stdint.h>")
+            # 只在有变化时绘制与刷新：空闲时休眠，动画按时基的实际毫秒推进
+            example_c.append("int main(void){")
+            example_c.append("  gfx_init(); input_port_init(); mui_nav_init(); mui_set_tick_source(input_port_millis);")
+            example_c.append("  for(;;){")
+            # 按键在定时中断中消抖入队，主循环取尽本轮的全部事件，绘制慢时也不丢短按
+            example_c.append("    for(MenuKey k; (k=input_port_pop())!=MENU_KEY_NONE; ) mui_nav_on_key((uint8_t)k);")
+            example_c.append("    mui_anim_update();")
+            example_c.append("    if(!mui_needs_redraw()){ input_port_wait(); continue; }")
+            # 上一帧仍在传输时同样休眠，由 DMA 完成中断或 1 ms 定时中断唤醒；
+            # 主机桩实现的 gfx_flush_busy 恒为 0、input_port_wait 为空，直接往下绘制
+            example_c.append("    if(gfx_flush_busy()){ input_port_wait(); continue; }")
+            example_c.append("    draw_menu_bare(mui_get_cursor(), mui_get_view_start());")
+            example_c.append("  }")
+            example_c.append("  return 0;")
+            example_c.append("}")
+            _write(os.path.join(bare_dir, "menu", "menu_bare.h"), bare_menu_h)
+            _write(os.path.join(bare_dir, "menu", "menu_bare.c"), bare_menu_c)
+            _write(os.path.join(bare_dir, "port", "gfx_port.h"), gfx_h)
+            _write(os.path.join(bare_dir, "port", "gfx_port.c"), gfx_c)
+            if tft:
+                _write(os.path.join(bare_dir, "port", "gfx_tft.c"), tft_c)
+            _write(os.path.join(bare_dir, "port", "gfx_text.c"), text_c)
+            # 输入接口文件
+            input_h = []
+            input_h.append("#ifndef INPUT_PORT_H")
+            input_h.append("#define INPUT_PORT_H")
+            input_h.append("#include <stdint.h>")
+            input_h.append("typedef enum { MENU_KEY_NONE=0, MENU_KEY_UP, MENU_KEY_DOWN, MENU_KEY_ENTER, MENU_KEY_BACK } MenuKey;")
+            input_h.append("void input_port_init(void);  /* 按键引脚与 1ms 定时采样 */")
+            input_h.append("MenuKey input_port_pop(void);  /* 取出一次按下事件（已消抖），无事件返回 MENU_KEY_NONE */")
+            input_h.append("MenuKey input_port_read(void);  /* 当前消抖后的电平（按住期间一直返回该键） */")
+            input_h.append("void input_port_tick(void);  /* 1ms 定时中断中调用：时基加一并采样按键 */")
+            input_h.append("void input_port_wait(void);  /* 空闲时休眠到下一次中断 */")
+            input_h.append("uint32_t input_port_millis(void);  /* 毫秒时基，供 mui_set_tick_source 使用 */")
+            input_h.append("/* 仅桩实现：设置模拟的按键电平（bit0..3 为 UP/DOWN/ENTER/BACK，1 为按下）；推进 ms 毫秒的时基与采样，桩实现的时间只由它推进 */")
+            input_h.append("void input_port_sim_set(uint8_t pressed);")
+            input_h.append("void input_port_sim_advance(uint32_t ms);")
+            input_h.append("#endif")
+            input_c = []
+            input_c.append("#include \"input_port.h\"")
+            input_c.extend(self._emit_key_queue())
+            input_c.append("static volatile uint32_t g_ms=0;")
+            input_c.append("static uint8_t g_sim_pressed=0;")
+            input_c.append("void input_port_init(void){}")
+            input_c.append("void input_port_tick(void){ g_ms++; key_sample(g_sim_pressed); }")
+            input_c.append("void input_port_sim_set(uint8_t pressed){ g_sim_pressed=(uint8_t)(pressed&0x0F); }")
+            input_c.append("void input_port_sim_advance(uint32_t ms){ while(ms--) input_port_tick(); }")
+            input_c.append("MenuKey input_port_read(void){ return key_level(); }")
+            input_c.append("void input_port_wait(void){}")
+            # 桩实现没有定时器：读取不推进时间，主机循环用 input_port_sim_advance 显式推进
+            input_c.append("uint32_t input_port_millis(void){ return g_ms; }")
+            self._account("按键", "key_q", ram=self.KEY_QUEUE_LEN)
+            self._account("按键", "key_head/tail, key_stable, key_cnt", ram=2 + 1 + 4)
+            self._account("按键", "g_ms", ram=4)
+            _write(os.path.join(bare_dir, "port", "input_port.h"), input_h)
+            _write(os.path.join(bare_dir, "port", "input_port.c"), input_c)
+            _write(os.path.join(bare_dir, "examples", "example_bare.c"), example_c)
+            # STM32 StdPeriph implementation templates
+            stm_dir = os.path.join(bare_dir, "port", "stm32_std")
+            stm_gfx = []
+            if tft:
+                # ST7789 示例（SPI1：PA5 SCK / PA7 MOSI，PA4 CS、PB1 DC、PB0 RST）；ILI9341 等同样用 2A/2B/2C 开窗写入，换初始化序列即可
+                stm_gfx.append("#include \"stm32f10x.h\"")
+                stm_gfx.append("#include \"stm32f10x_rcc.h\"")
+                stm_gfx.append("#include \"stm32f10x_gpio.h\"")
+                stm_gfx.append("#include \"stm32f10x_spi.h\"")
+                stm_gfx.append("#include \"stm32f10x_dma.h\"")
+                stm_gfx.append("#include \"misc.h\"")
+                stm_gfx.append("#include \"gfx_port.h\"")
+                stm_gfx.append("/* 显存窗口偏移：240x240 的 ST7789 屏常需 TFT_Y_OFF=80（按模组资料设置） */")
+                stm_gfx.append("#ifndef TFT_X_OFF")
+                stm_gfx.append("#define TFT_X_OFF 0")
+                stm_gfx.append("#endif")
+                stm_gfx.append("#ifndef TFT_Y_OFF")
+                stm_gfx.append("#define TFT_Y_OFF 0")
+                stm_gfx.append("#endif")
+                stm_gfx.append("#define TFT_CS(v) ((v) ? GPIO_SetBits(GPIOA,GPIO_Pin_4) : GPIO_ResetBits(GPIOA,GPIO_Pin_4))")
+                stm_gfx.append("#define TFT_DC(v) ((v) ? GPIO_SetBits(GPIOB,GPIO_Pin_1) : GPIO_ResetBits(GPIOB,GPIO_Pin_1))")
+                stm_gfx.append("#define TFT_RST(v) ((v) ? GPIO_SetBits(GPIOB,GPIO_Pin_0) : GPIO_ResetBits(GPIOB,GPIO_Pin_0))")
+                stm_gfx.append("static void delay_ms(uint32_t ms){ volatile uint32_t n = ms * (SystemCoreClock / 8000u); while(n--); }")
+                stm_gfx.append("static void spi1_init(void){ GPIO_InitTypeDef gi; SPI_InitTypeDef si; RCC_APB2PeriphClockCmd(RCC_APB2Periph_GPIOA|RCC_APB2Periph_GPIOB|RCC_APB2Periph_SPI1, ENABLE); gi.GPIO_Pin=GPIO_Pin_5|GPIO_Pin_7; gi.GPIO_Speed=GPIO_Speed_50MHz; gi.GPIO_Mode=GPIO_Mode_AF_PP; GPIO_Init(GPIOA,&gi); gi.GPIO_Pin=GPIO_Pin_4; gi.GPIO_Mode=GPIO_Mode_Out_PP; GPIO_Init(GPIOA,&gi); gi.GPIO_Pin=GPIO_Pin_0|GPIO_Pin_1; GPIO_Init(GPIOB,&gi); TFT_CS(1); si.SPI_Direction=SPI_Direction_1Line_Tx; si.SPI_Mode=SPI_Mode_Master; si.SPI_DataSize=SPI_DataSize_8b; si.SPI_CPOL=SPI_CPOL_High; si.SPI_CPHA=SPI_CPHA_2Edge; si.SPI_NSS=SPI_NSS_Soft; si.SPI_BaudRatePrescaler=SPI_BaudRatePrescaler_2; si.SPI_FirstBit=SPI_FirstBit_MSB; si.SPI_CRCPolynomial=7; SPI_Init(SPI1,&si); SPI_Cmd(SPI1,ENABLE); }")
+                stm_gfx.append("static void spi1_send(const uint8_t* d,int n){ for(int i=0;i<n;i++){ while(SPI_I2S_GetFlagStatus(SPI1,SPI_I2S_FLAG_TXE)==RESET); SPI_I2S_SendData(SPI1,d[i]); } while(SPI_I2S_GetFlagStatus(SPI1,SPI_I2S_FLAG_BSY)==SET); }")
+                stm_gfx.append("static void tft_cmd(uint8_t c,const uint8_t* args,int n){ TFT_CS(0); TFT_DC(0); spi1_send(&c,1); if(n){ TFT_DC(1); spi1_send(args,n); } TFT_CS(1); }")
+                # SPI1_TX 对应 DMA1 通道 3：命令与窗口参数轮询发送，页条像素由 DMA 搬运，传完进中断
+                stm_gfx.append("static void dma_init(void){ DMA_InitTypeDef di; NVIC_InitTypeDef ni; RCC_AHBPeriphClockCmd(RCC_AHBPeriph_DMA1, ENABLE); DMA_DeInit(DMA1_Channel3); di.DMA_PeripheralBaseAddr=(uint32_t)&SPI1->DR; di.DMA_MemoryBaseAddr=0; di.DMA_DIR=DMA_DIR_PeripheralDST; di.DMA_BufferSize=1; di.DMA_PeripheralInc=DMA_PeripheralInc_Disable; di.DMA_MemoryInc=DMA_MemoryInc_Enable; di.DMA_PeripheralDataSize=DMA_PeripheralDataSize_Byte; di.DMA_MemoryDataSize=DMA_MemoryDataSize_Byte; di.DMA_Mode=DMA_Mode_Normal; di.DMA_Priority=DMA_Priority_High; di.DMA_M2M=DMA_M2M_Disable; DMA_Init(DMA1_Channel3,&di); DMA_ITConfig(DMA1_Channel3,DMA_IT_TC,ENABLE); ni.NVIC_IRQChannel=DMA1_Channel3_IRQn; ni.NVIC_IRQChannelPreemptionPriority=2; ni.NVIC_IRQChannelSubPriority=0; ni.NVIC_IRQChannelCmd=ENABLE; NVIC_Init(&ni); SPI_I2S_DMACmd(SPI1,SPI_I2S_DMAReq_Tx,ENABLE); }")
+                # 复位、退出睡眠、16 位色（COLMOD=0x55）、正向扫描、反显（多数 IPS 模组需要）、开显示
+                stm_gfx.append("void tft_panel_init(void){ uint8_t a; spi1_init(); dma_init(); TFT_RST(0); delay_ms(10); TFT_RST(1); delay_ms(120); tft_cmd(0x01,0,0); delay_ms(150); tft_cmd(0x11,0,0); delay_ms(120); a=0x55; tft_cmd(0x3A,&a,1); a=0x00; tft_cmd(0x36,&a,1); tft_cmd(0x21,0,0); tft_cmd(0x13,0,0); tft_cmd(0x29,0,0); }")
+                stm_gfx.append("void tft_panel_write(int y0,int h,const uint16_t* px){")
+                stm_gfx.append("  uint16_t xa=TFT_X_OFF, xb=(uint16_t)(TFT_X_OFF+GFX_W-1), ya=(uint16_t)(TFT_Y_OFF+y0), yb=(uint16_t)(TFT_Y_OFF+y0+h-1); uint8_t c=0x2C;")
+                stm_gfx.append("  uint8_t ca[4]={(uint8_t)(xa>>8),(uint8_t)xa,(uint8_t)(xb>>8),(uint8_t)xb}; uint8_t ra[4]={(uint8_t)(ya>>8),(uint8_t)ya,(uint8_t)(yb>>8),(uint8_t)yb};")
+                stm_gfx.append("  tft_cmd(0x2A,ca,4); tft_cmd(0x2B,ra,4);")
+                stm_gfx.append("  TFT_CS(0); TFT_DC(0); spi1_send(&c,1); TFT_DC(1);")
+                stm_gfx.append("  DMA_Cmd(DMA1_Channel3,DISABLE); DMA1_Channel3->CMAR=(uint32_t)px; DMA1_Channel3->CNDTR=(uint16_t)(GFX_W*h*2); DMA_Cmd(DMA1_Channel3,ENABLE);")
+                stm_gfx.append("}")
+                stm_gfx.append("void DMA1_Channel3_IRQHandler(void){ if(DMA_GetITStatus(DMA1_IT_TC3)){ DMA_ClearITPendingBit(DMA1_IT_TC3); DMA_Cmd(DMA1_Channel3,DISABLE); while(SPI_I2S_GetFlagStatus(SPI1,SPI_I2S_FLAG_BSY)==SET); TFT_CS(1); gfx_tft_write_done(); } }")
+                _write(os.path.join(stm_dir, "tft_panel_stm32_std.c"), stm_gfx)
+            else:
+                # 定义 MUI_I2C_MOCK 时不依赖 StdPeriph，I2C 写入交给 port/host/i2c_mock.c，可在 PC 上统计传输字节
+                stm_gfx.append("#ifndef MUI_I2C_MOCK")
+                stm_gfx.append("#include \"stm32f10x.h\"")
+                stm_gfx.append("#include \"stm32f10x_rcc.h\"")
+                stm_gfx.append("#include \"stm32f10x_gpio.h\"")
+                stm_gfx.append("#include \"stm32f10x_i2c.h\"")
+                stm_gfx.append("#include \"stm32f10x_dma.h\"")
+                stm_gfx.append("#include \"misc.h\"")
+                stm_gfx.append("#endif")
+                stm_gfx.append("#include \"gfx_port.h\"")
+                stm_gfx.append("#include <string.h>")
+                stm_gfx.append("#define SSD1306_ADDR 0x3C")
+                oled_w, oled_h = self._oled_size()
+                scr_w, scr_h = self._screen_size()
+                if (oled_w, oled_h) != (scr_w, scr_h):
+                    self.log(f"STM32 SSD1306 模板按 {oled_w}x{oled_h} 生成（工程设置为 {scr_w}x{scr_h}，控制器最大 128x64）")
+                stm_gfx.append(f"#define GFX_W {oled_w}")
+                stm_gfx.append(f"#define GFX_H {oled_h}")
+                stm_gfx.append("#define GFX_PAGES (GFX_H/8)")
+                stm_gfx.append("static uint8_t fb[GFX_W*GFX_H/8];")
+                stm_gfx.append("int gfx_width(void){ return GFX_W; }")
+                stm_gfx.append("int gfx_height(void){ return GFX_H; }")
+                # 脏区：每页记录本帧改动过的列范围（x0>x1 表示干净）；used 为上次清屏后画过的范围，清屏时并入脏区
+                # shadow 为屏上已有内容，发送时只传与之不同的列窗口
+                stm_gfx.append("static uint8_t shadow[GFX_W*GFX_H/8];")
+                stm_gfx.append("static uint8_t dirty_x0[GFX_PAGES], dirty_x1[GFX_PAGES], used_x0[GFX_PAGES], used_x1[GFX_PAGES];")
+                stm_gfx.append("static uint8_t force_full=1;")
+                stm_gfx.append("static void mark(int page,int x0,int x1){ if(x0<dirty_x0[page]) dirty_x0[page]=(uint8_t)x0; if(x1>dirty_x1[page]) dirty_x1[page]=(uint8_t)x1; if(x0<used_x0[page]) used_x0[page]=(uint8_t)x0; if(x1>used_x1[page]) used_x1[page]=(uint8_t)x1; }")
+                stm_gfx.append("#ifdef MUI_I2C_MOCK")
+                stm_gfx.append("void mui_i2c_mock_write(uint8_t addr,uint8_t control,const uint8_t* data,int len);")
+                stm_gfx.append("static void clock_init(void){}")
+                stm_gfx.append("static void gpio_init(void){}")
+                stm_gfx.append("static void i2c1_init(void){}")
+                stm_gfx.append("static void i2c1_write(uint8_t control,const uint8_t* data,int len){ mui_i2c_mock_write(SSD1306_ADDR,control,data,len); }")
+                stm_gfx.append("void mui_dma_mock_start(uint8_t addr,uint8_t control,const uint8_t* data,int len);")
+                stm_gfx.append("int mui_dma_mock_step(void);")
+                stm_gfx.append("static void dma_init(void){}")
+                stm_gfx.append("static void i2c1_dma_start(uint8_t control,const uint8_t* data,int len){ mui_dma_mock_start(SSD1306_ADDR,control,data,len); }")
+                stm_gfx.append("static void i2c1_stop(void){}")
+                stm_gfx.append("#define I2C1_WAIT_IDLE() ((void)0)")
+                stm_gfx.append("#define FLUSH_WAIT() mui_dma_mock_step()")
+                stm_gfx.append("#else")
+                stm_gfx.append("static void clock_init(void){ RCC_APB2PeriphClockCmd(RCC_APB2Periph_GPIOB|RCC_APB2Periph_GPIOA, ENABLE); RCC_APB1PeriphClockCmd(RCC_APB1Periph_I2C1, ENABLE); }")
+                stm_gfx.append("static void gpio_init(void){ GPIO_InitTypeDef gi; gi.GPIO_Pin=GPIO_Pin_6|GPIO_Pin_7; gi.GPIO_Speed=GPIO_Speed_50MHz; gi.GPIO_Mode=GPIO_Mode_AF_OD; GPIO_Init(GPIOB,&gi); gi.GPIO_Pin=GPIO_Pin_0|GPIO_Pin_1|GPIO_Pin_2|GPIO_Pin_3; gi.GPIO_Speed=GPIO_Speed_50MHz; gi.GPIO_Mode=GPIO_Mode_IPU; GPIO_Init(GPIOA,&gi); }")
+                stm_gfx.append("static void i2c1_init(void){ I2C_InitTypeDef ii; I2C_DeInit(I2C1); ii.I2C_ClockSpeed=400000; ii.I2C_Mode=I2C_Mode_I2C; ii.I2C_DutyCycle=I2C_DutyCycle_2; ii.I2C_OwnAddress1=0x00; ii.I2C_Ack=I2C_Ack_Disable; ii.I2C_AcknowledgedAddress=I2C_AcknowledgedAddress_7bit; I2C_Init(I2C1,&ii); I2C_Cmd(I2C1,ENABLE); }")
+                stm_gfx.append("static void i2c1_write(uint8_t control,const uint8_t* data,int len){ while(I2C_GetFlagStatus(I2C1,I2C_FLAG_BUSY)); I2C_GenerateSTART(I2C1,ENABLE); while(!I2C_CheckEvent(I2C1,I2C_EVENT_MASTER_MODE_SELECT)); I2C_Send7bitAddress(I2C1,SSD1306_ADDR<<1,I2C_Direction_Transmitter); while(!I2C_CheckEvent(I2C1,I2C_EVENT_MASTER_TRANSMITTER_MODE_SELECTED)); I2C_SendData(I2C1,control); while(!I2C_CheckEvent(I2C1,I2C_EVENT_MASTER_BYTE_TRANSMITTED)); for(int i=0;i<len;i++){ I2C_SendData(I2C1,data[i]); while(!I2C_CheckEvent(I2C1,I2C_EVENT_MASTER_BYTE_TRANSMITTED)); } I2C_GenerateSTOP(I2C1,ENABLE); }")
+                # I2C1_TX 对应 DMA1 通道 6。每段传输由中断推进，中断里只读写寄存器、不等待标志：
+                # START → I2C1_EV（SB）发地址 → I2C1_EV（ADDR）写控制字节并交给 DMA 搬运数据 → DMA 传完后开 I2C 事件中断等 BTF
+                # → 下一段直接重复起始（不发 STOP），最后一段之后才 STOP
+                stm_gfx.append("static void dma_init(void){ DMA_InitTypeDef di; NVIC_InitTypeDef ni; RCC_AHBPeriphClockCmd(RCC_AHBPeriph_DMA1, ENABLE); DMA_DeInit(DMA1_Channel6); di.DMA_PeripheralBaseAddr=(uint32_t)&I2C1->DR; di.DMA_MemoryBaseAddr=0; di.DMA_DIR=DMA_DIR_PeripheralDST; di.DMA_BufferSize=1; di.DMA_PeripheralInc=DMA_PeripheralInc_Disable; di.DMA_MemoryInc=DMA_MemoryInc_Enable; di.DMA_PeripheralDataSize=DMA_PeripheralDataSize_Byte; di.DMA_MemoryDataSize=DMA_MemoryDataSize_Byte; di.DMA_Mode=DMA_Mode_Normal; di.DMA_Priority=DMA_Priority_High; di.DMA_M2M=DMA_M2M_Disable; DMA_Init(DMA1_Channel6,&di); DMA_ITConfig(DMA1_Channel6,DMA_IT_TC,ENABLE); ni.NVIC_IRQChannel=DMA1_Channel6_IRQn; ni.NVIC_IRQChannelPreemptionPriority=2; ni.NVIC_IRQChannelSubPriority=0; ni.NVIC_IRQChannelCmd=ENABLE; NVIC_Init(&ni); ni.NVIC_IRQChannel=I2C1_EV_IRQn; NVIC_Init(&ni); }")
+                stm_gfx.append("static uint8_t xfer_control; static const uint8_t* xfer_data; static uint16_t xfer_len;")
+                stm_gfx.append("static void i2c1_dma_start(uint8_t control,const uint8_t* data,int len){ xfer_control=control; xfer_data=data; xfer_len=(uint16_t)len; I2C_ITConfig(I2C1,I2C_IT_EVT,ENABLE); I2C_GenerateSTART(I2C1,ENABLE); }")
+                stm_gfx.append("static void i2c1_stop(void){ I2C_GenerateSTOP(I2C1,ENABLE); }")
+                # 每帧第一段在主循环中发起，此时上一帧的 STOP 可能还未发完
+                stm_gfx.append("#define I2C1_WAIT_IDLE() while(I2C_GetFlagStatus(I2C1,I2C_FLAG_BUSY))")
+                stm_gfx.append("#define FLUSH_WAIT() ((void)0)")
+                stm_gfx.append("#endif")
+                stm_gfx.append("static void ssd1306_cmd(uint8_t c){ i2c1_write(0x00,&c,1); }")
+                stm_gfx.append("void gfx_init(void){ clock_init(); gpio_init(); i2c1_init(); dma_init(); ssd1306_cmd(0xAE); ssd1306_cmd(0x20); ssd1306_cmd(0x00); ssd1306_cmd(0xB0); ssd1306_cmd(0xC8); ssd1306_cmd(0x00); ssd1306_cmd(0x10); ssd1306_cmd(0x40); ssd1306_cmd(0x81); ssd1306_cmd(0x7F); ssd1306_cmd(0xA1); ssd1306_cmd(0xA6); ssd1306_cmd(0xA8); ssd1306_cmd(GFX_H-1); ssd1306_cmd(0xA4); ssd1306_cmd(0xD3); ssd1306_cmd(0x00); ssd1306_cmd(0xD5); ssd1306_cmd(0x80); ssd1306_cmd(0xD9); ssd1306_cmd(0xF1); ssd1306_cmd(0xDA); ssd1306_cmd(GFX_H>32 ? 0x12 : 0x02); ssd1306_cmd(0xDB); ssd1306_cmd(0x40); ssd1306_cmd(0x8D); ssd1306_cmd(0x14); ssd1306_cmd(0xAF); for(int p=0;p<GFX_PAGES;p++){ dirty_x0[p]=used_x0[p]=0xFF; dirty_x1[p]=used_x1[p]=0; } force_full=1; }")
+                stm_gfx.append("void gfx_clear(void){ for(int p=0;p<GFX_PAGES;p++){ if(used_x0[p]>used_x1[p]) continue; for(int x=used_x0[p]; x<=used_x1[p]; x++) fb[p*GFX_W+x]=0x00; if(used_x0[p]<dirty_x0[p]) dirty_x0[p]=used_x0[p]; if(used_x1[p]>dirty_x1[p]) dirty_x1[p]=used_x1[p]; used_x0[p]=0xFF; used_x1[p]=0; } }")
+                # 双缓冲：绘制只写 fb（后台缓冲），shadow 既是屏上内容的副本也是 DMA 的数据源（前台缓冲）
+                # 每页在脏区内与 shadow 比较，收缩到首末差异列，拷入 shadow 后用列/页地址命令（水平寻址模式）只发送该窗口
+                xfer_fields = "uint8_t control; uint8_t len; const uint8_t* data; "
+                stm_gfx.append("typedef struct { " + xfer_fields + "} FlushXfer;")
+                stm_gfx.append("static FlushXfer flush_q[GFX_PAGES*2]; static uint8_t flush_win[GFX_PAGES][6];")
+                stm_gfx.append("static volatile uint8_t flush_n=0, flush_i=0, flush_busy=0;")
+                stm_gfx.append("static void (*flush_done_cb)(void);")
+                stm_gfx.append("static void flush_next(void){ if(flush_i < flush_n){ const FlushXfer t=flush_q[flush_i++]; i2c1_dma_start(t.control,t.data,t.len); } else { flush_busy=0; if(flush_done_cb) flush_done_cb(); } }")
+                # 一段传输（含最后一字节移出）完成：还有下一段则重复起始，否则 STOP 并通知完成
+                stm_gfx.append("void gfx_flush_dma_irq(void){ if(flush_i >= flush_n) i2c1_stop(); flush_next(); }")
+                stm_gfx.append("#ifndef MUI_I2C_MOCK")
+                stm_gfx.append("void I2C1_EV_IRQHandler(void){")
+                stm_gfx.append("  uint16_t sr1=I2C1->SR1;")
+                stm_gfx.append("  if(sr1 & I2C_SR1_SB){ I2C_Send7bitAddress(I2C1,SSD1306_ADDR<<1,I2C_Direction_Transmitter); return; }")
+                stm_gfx.append("  if(sr1 & I2C_SR1_ADDR){ (void)I2C1->SR2; I2C1->DR=xfer_control; I2C_ITConfig(I2C1,I2C_IT_EVT,DISABLE); DMA_Cmd(DMA1_Channel6,DISABLE); DMA1_Channel6->CMAR=(uint32_t)xfer_data; DMA1_Channel6->CNDTR=xfer_len; I2C_DMACmd(I2C1,ENABLE); DMA_Cmd(DMA1_Channel6,ENABLE); return; }")
+                stm_gfx.append("  if(sr1 & I2C_SR1_BTF){ I2C_ITConfig(I2C1,I2C_IT_EVT,DISABLE); gfx_flush_dma_irq(); }")
+                stm_gfx.append("}")
+                # DMA 写完最后一字节时它还在移位寄存器里：关掉 DMA，改由 BTF 事件中断收尾
+                stm_gfx.append("void DMA1_Channel6_IRQHandler(void){ if(DMA_GetITStatus(DMA1_IT_TC6)){ DMA_ClearITPendingBit(DMA1_IT_TC6); I2C_DMACmd(I2C1,DISABLE); DMA_Cmd(DMA1_Channel6,DISABLE); I2C_ITConfig(I2C1,I2C_IT_EVT,ENABLE); } }")
+                stm_gfx.append("#endif")
+                stm_gfx.append("static void flush_wait(void){ while(flush_busy) FLUSH_WAIT(); }")
+                stm_gfx.append("int gfx_flush_busy(void){ return flush_busy; }")
+                stm_gfx.append("void gfx_set_flush_done_cb(void (*cb)(void)){ flush_done_cb = cb; }")
+                stm_gfx.append("void gfx_send_async(void){")
+                stm_gfx.append("  flush_wait();")
+                stm_gfx.append("  flush_n=0; flush_i=0;")
+                stm_gfx.append("  for(int p=0; p<GFX_PAGES; p++){")
+                stm_gfx.append("    int x0 = force_full ? 0 : dirty_x0[p]; int x1 = force_full ? GFX_W-1 : dirty_x1[p];")
+                stm_gfx.append("    dirty_x0[p]=0xFF; dirty_x1[p]=0;")
+                stm_gfx.append("    const uint8_t* row=&fb[p*GFX_W]; uint8_t* sh=&shadow[p*GFX_W];")
+                stm_gfx.append("    if(!force_full){ while(x0<=x1 && row[x0]==sh[x0]) x0++; while(x1>=x0 && row[x1]==sh[x1]) x1--; }")
+                stm_gfx.append("    if(x0>x1) continue;")
+                stm_gfx.append("    for(int x=x0; x<=x1; x++) sh[x]=row[x];")
+                stm_gfx.append("    uint8_t* w=flush_win[p]; w[0]=0x21; w[1]=(uint8_t)x0; w[2]=(uint8_t)x1; w[3]=0x22; w[4]=(uint8_t)p; w[5]=(uint8_t)p;")
+                stm_gfx.append("    flush_q[flush_n].control=0x00; flush_q[flush_n].data=w; flush_q[flush_n].len=6; flush_n++;")
+                stm_gfx.append("    flush_q[flush_n].control=0x40; flush_q[flush_n].data=&sh[x0]; flush_q[flush_n].len=(uint8_t)(x1-x0+1); flush_n++;")
+                stm_gfx.append("  }")
+                stm_gfx.append("  force_full=0;")
+                stm_gfx.append("  if(flush_n){ I2C1_WAIT_IDLE(); }")
+                stm_gfx.append("  flush_busy=1; flush_next();")
+                stm_gfx.append("}")
+                stm_gfx.append("void gfx_send(void){ gfx_send_async(); flush_wait(); }")
+                stm_gfx.append("void gfx_draw_pixel(int x,int y){ if(x<0||x>=GFX_W||y<0||y>=GFX_H) return; fb[(y>>3)*GFX_W + x] |= (1<<(y&7)); mark(y>>3,x,x); }")
+                # 矩形按页填充：首末页用头/尾掩码 OR，中间整页直接 memset 0xFF；横线/竖线是高或宽为 1 的矩形
+                stm_gfx.append("void gfx_fill_rect(int x,int y,int w,int h){")
+                stm_gfx.append("  if(x<0){ w+=x; x=0; } if(y<0){ h+=y; y=0; } if(x+w>GFX_W) w=GFX_W-x; if(y+h>GFX_H) h=GFX_H-y; if(w<=0||h<=0) return;")
+                stm_gfx.append("  int p0=y>>3, p1=(y+h-1)>>3;")
+                stm_gfx.append("  for(int p=p0; p<=p1; ++p){")
+                stm_gfx.append("    uint8_t m=0xFF; if(p==p0) m&=(uint8_t)(0xFF<<(y&7)); if(p==p1) m&=(uint8_t)(0xFF>>(7-((y+h-1)&7)));")
+                stm_gfx.append("    uint8_t* row=&fb[p*GFX_W+x];")
+                stm_gfx.append("    if(m==0xFF) memset(row,0xFF,(size_t)w); else for(int i=0; i<w; ++i) row[i]|=m;")
+                stm_gfx.append("    mark(p,x,x+w-1);")
+                stm_gfx.append("  }")
+                stm_gfx.append("}")
+                stm_gfx.append("void gfx_hline(int x,int y,int w){ gfx_fill_rect(x,y,w,1); }")
+                stm_gfx.append("void gfx_vline(int x,int y,int h){ gfx_fill_rect(x,y,1,h); }")
+                stm_gfx.append("void gfx_draw_bitmap_1bpp(int x,int y,int w,int h,const uint8_t* data){ int stride=(w+7)/8; for(int yy=0; yy<h; ++yy){ const uint8_t* row=data+yy*stride; int bit=0; uint8_t b=0; for(int xx=0; xx<w; ++xx){ if(bit==0){ b=*row++; bit=8; } if(b&0x80) gfx_draw_pixel(x+xx,y+yy); b<<=1; bit--; } } }")
+                # 页布局位图与帧缓同为纵向字节：整字节 OR 进帧缓，y 未按 8 对齐时拆到相邻两页
+                stm_gfx.append("void gfx_draw_bitmap_pages(int x,int y,int w,int h,const uint8_t* data){")
+                stm_gfx.append("  int page0 = (y>=0) ? (y>>3) : -((7-y)>>3); int sh = y - page0*8;")
+                stm_gfx.append("  int x0 = x<0 ? -x : 0; int x1 = (x+w>GFX_W) ? GFX_W-x : w;")
+                stm_gfx.append("  for(int p=0; p<(h+7)/8; ++p){")
+                stm_gfx.append("    const uint8_t* col = data + p*w; int pg = page0 + p;")
+                stm_gfx.append("    uint8_t* lo = (pg>=0 && pg<GFX_H/8) ? &fb[pg*GFX_W] : 0;")
+                stm_gfx.append("    uint8_t* hi = (sh && pg+1>=0 && pg+1<GFX_H/8) ? &fb[(pg+1)*GFX_W] : 0;")
+                stm_gfx.append("    if(x0<x1){ if(lo) mark(pg,x+x0,x+x1-1); if(hi) mark(pg+1,x+x0,x+x1-1); }")
+                stm_gfx.append("    for(int i=x0; i<x1; ++i){ uint16_t v = (uint16_t)col[i] << sh; if(lo) lo[x+i] |= (uint8_t)v; if(hi) hi[x+i] |= (uint8_t)(v>>8); }")
+                stm_gfx.append("  }")
+                stm_gfx.append("}")
+                _write(os.path.join(stm_dir, "gfx_port_stm32_std.c"), stm_gfx)
+                # STM32 模板按工程屏幕尺寸：帧缓（后台）、shadow（前台/DMA 源）、每页脏区与刷新队列
+                pages = oled_h // 8
+                self._account("帧缓与刷新", f"fb（STM32 模板 {oled_w}x{oled_h}）", ram=oled_w * pages)
+                self._account("帧缓与刷新", "shadow", ram=oled_w * pages)
+                self._account("帧缓与刷新", "dirty_x0/x1, used_x0/x1", ram=4 * pages)
+                self._account("帧缓与刷新", "flush_q", ram=pages * 2 * self._sizeof(xfer_fields))
+                self._account("帧缓与刷新", "flush_win", ram=pages * 6)
+            stm_input = []
+            stm_input.append("#include \"stm32f10x.h\"")
+            stm_input.append("#include \"stm32f10x_rcc.h\"")
+            stm_input.append("#include \"stm32f10x_gpio.h\"")
+            stm_input.append("#include \"input_port.h\"")
+            stm_input.extend(self._emit_key_queue())
+            # SysTick 1ms 时基兼按键采样（PA0..PA3 上拉，低电平按下，一次读 IDR 取 4 位）；
+            # 工程中已有 SysTick_Handler 时定义 MUI_NO_SYSTICK_HANDLER，并在其中每毫秒调用 input_port_tick()
+            stm_input.append("static volatile uint32_t g_ms=0;")
+            stm_input.append("static volatile uint8_t inited=0;")
+            stm_input.append("void input_port_init(void){ if(inited) return; RCC_APB2PeriphClockCmd(RCC_APB2Periph_GPIOA, ENABLE); GPIO_InitTypeDef gi; gi.GPIO_Pin=GPIO_Pin_0|GPIO_Pin_1|GPIO_Pin_2|GPIO_Pin_3; gi.GPIO_Speed=GPIO_Speed_50MHz; gi.GPIO_Mode=GPIO_Mode_IPU; GPIO_Init(GPIOA,&gi); SysTick_Config(SystemCoreClock/1000); inited=1; }")
+            stm_input.append("void input_port_tick(void){ g_ms++; if(inited) key_sample((uint8_t)(~GPIOA->IDR & 0x0F)); }")
+            stm_input.append("#ifndef MUI_NO_SYSTICK_HANDLER")
+            stm_input.append("void SysTick_Handler(void){ input_port_tick(); }")
+            stm_input.append("#endif")
+            # WFI 由任意中断唤醒（SysTick 每毫秒一次、刷新 DMA 完成）
+            stm_input.append("void input_port_wait(void){ __WFI(); }")
+            stm_input.append("uint32_t input_port_millis(void){ return g_ms; }")
+            stm_input.append("MenuKey input_port_read(void){ return key_level(); }")
+            _write(os.path.join(stm_dir, "input_port_stm32_std.c"), stm_input)
+            if not tft:
+                # PC 端 I2C/DMA 模拟：与 -DMUI_I2C_MOCK 编译的 gfx_port_stm32_std.c 链接，统计总线字节并按水平寻址模式还原屏上显存；
+                # DMA 传输在 mui_dma_mock_step 时才读取数据并触发完成中断，用于检查传输期间前台缓冲不被改写
+                host_dir = os.path.join(bare_dir, "port", "host")
+                mock_h = []
+                mock_h.append("#ifndef MUI_I2C_MOCK_H")
+                mock_h.append("#define MUI_I2C_MOCK_H")
+                mock_h.append("#include <stdint.h>")
+                mock_h.append("extern uint32_t mui_i2c_bytes;      /* 总线字节数：每次传输含地址与控制字节 */")
+                mock_h.append("extern uint32_t mui_i2c_transfers;  /* START..STOP 传输次数 */")
+                mock_h.append(f"#define MUI_I2C_MOCK_WIDTH {oled_w}")
+                mock_h.append(f"#define MUI_I2C_MOCK_HEIGHT {oled_h}")
+                mock_h.append("extern uint8_t mui_i2c_gddram[MUI_I2C_MOCK_WIDTH*MUI_I2C_MOCK_HEIGHT/8];  /* 模拟的 SSD1306 显存，按屏幕尺寸只保留可见部分 */")
+                mock_h.append("void mui_i2c_mock_write(uint8_t addr,uint8_t control,const uint8_t* data,int len);")
+                mock_h.append("void mui_i2c_mock_reset_counters(void);")
+                mock_h.append("void mui_dma_mock_start(uint8_t addr,uint8_t control,const uint8_t* data,int len);")
+                mock_h.append("int mui_dma_mock_pending(void);")
+                mock_h.append("int mui_dma_mock_step(void);  /* 完成当前 DMA 传输并调用 gfx_flush_dma_irq，无传输时返回 0 */")
+                mock_h.append("/* 400 kHz 下每字节 9 个时钟（含 ACK） */")
+                mock_h.append("#define MUI_I2C_US(bytes) ((uint32_t)(bytes) * 9000u / 400u)")
+                mock_h.append("#endif")
+                mock_c = []
+                mock_c.append("#include \"i2c_mock.h\"")
+                mock_c.append("uint32_t mui_i2c_bytes = 0;")
+                mock_c.append("uint32_t mui_i2c_transfers = 0;")
+                mock_c.append("uint8_t mui_i2c_gddram[MUI_I2C_MOCK_WIDTH*MUI_I2C_MOCK_HEIGHT/8];")
+                mock_c.append("static uint8_t col_lo=0, col_hi=127, page_lo=0, page_hi=7, col=0, page=0;")
+                mock_c.append("static uint8_t cmd=0, argc=0, argv[2];")
+                mock_c.append("static uint8_t cmd_args(uint8_t c){ switch(c){ case 0x21: case 0x22: return 2; case 0x20: case 0x81: case 0x8D: case 0xA8: case 0xD3: case 0xD5: case 0xD9: case 0xDA: case 0xDB: return 1; default: return 0; } }")
+                # 命令参数可以跨传输发送（初始化时逐字节发送），解析状态需保留
+                mock_c.append("static void on_cmd_byte(uint8_t b){")
+                mock_c.append("  if(argc == 0){ cmd = b; argc = cmd_args(b); return; }")
+                mock_c.append("  argv[cmd_args(cmd) - argc] = b;")
+                mock_c.append("  if(--argc) return;")
+                mock_c.append("  if(cmd == 0x21){ col_lo = argv[0] & 0x7F; col_hi = argv[1] & 0x7F; col = col_lo; }")
+                mock_c.append("  if(cmd == 0x22){ page_lo = argv[0] & 0x07; page_hi = argv[1] & 0x07; page = page_lo; }")
+                mock_c.append("}")
+                mock_c.append("static void on_data_byte(uint8_t b){")
+                mock_c.append("  if(col < MUI_I2C_MOCK_WIDTH && page < MUI_I2C_MOCK_HEIGHT/8) mui_i2c_gddram[page*MUI_I2C_MOCK_WIDTH + col] = b;")
+                mock_c.append("  if(col++ >= col_hi){ col = col_lo; if(page++ >= page_hi) page = page_lo; }")
+                mock_c.append("}")
+                mock_c.append("void mui_i2c_mock_write(uint8_t addr,uint8_t control,const uint8_t* data,int len){")
+                mock_c.append("  (void)addr;")
+                mock_c.append("  mui_i2c_transfers++;")
+                mock_c.append("  mui_i2c_bytes += 2u + (uint32_t)len;")
+                mock_c.append("  for(int i=0;i<len;i++){ if(control == 0x40) on_data_byte(data[i]); else on_cmd_byte(data[i]); }")
+                mock_c.append("}")
+                mock_c.append("void mui_i2c_mock_reset_counters(void){ mui_i2c_bytes = 0; mui_i2c_transfers = 0; }")
+                mock_c.append("void gfx_flush_dma_irq(void);  /* gfx_port_stm32_std.c 的 DMA 完成中断处理 */")
+                mock_c.append("static uint8_t dma_addr, dma_control, dma_pending = 0; static const uint8_t* dma_data; static int dma_len;")
+                mock_c.append("void mui_dma_mock_start(uint8_t addr,uint8_t control,const uint8_t* data,int len){ dma_addr = addr; dma_control = control; dma_data = data; dma_len = len; dma_pending = 1; }")
+                mock_c.append("int mui_dma_mock_pending(void){ return dma_pending; }")
+                mock_c.append("int mui_dma_mock_step(void){")
+                mock_c.append("  if(!dma_pending) return 0;")
+                mock_c.append("  dma_pending = 0;")
+                mock_c.append("  mui_i2c_mock_write(dma_addr, dma_control, dma_data, dma_len);")
+                mock_c.append("  gfx_flush_dma_irq();")
+                mock_c.append("  return 1;")
+                mock_c.append("}")
+                _write(os.path.join(host_dir, "i2c_mock.h"), mock_h)
+                _write(os.path.join(host_dir, "i2c_mock.c"), mock_c)
+        if not no_u8g2:
+            # U8G2 帧缓由 u8g2 按 Setup 的后缀分配（_f 整屏，_1/_2 为 8/16 行页条），大小按工程的屏幕尺寸计算
+            sw, sh = self._screen_size()
+            buffer = self._u8g2_buffer()
+            if buffer == 'f':
+                self._account("帧缓与刷新", f"U8G2 全缓冲 {sw}x{sh}（_f）", ram=sw * ((sh + 7) // 8))
+            else:
+                self._account("帧缓与刷新", f"U8G2 页缓冲 {sw}x{8 * int(buffer)}（_{buffer}）", ram=sw * int(buffer))
+        self._check_budget()
+        self.log("占用统计（按 32 位 MCU 逐个数组计算，不含函数代码）:")
+        for line in self.footprint_table():
+            self.log("  " + line)
+        for path, lines in pending:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines))
+        self.log(f"MUI 代码已导出到目录: {mui_dir}")
+        return mui_dir
+
+# ---------------- 命令行 ----------------
+def _apply_export_options(settings, args):
+    """把导出相关的命令行参数覆盖到工程设置上（export 与 simulate 共用）"""
+    if args.no_u8g2 is not None:
+        settings['export_no_u8g2'] = args.no_u8g2
+    if args.no_font:
+        settings['emit_font_array'] = False
+    if args.no_cjk:
+        settings['emit_cjk_subset'] = False
+    if args.rle:
+        settings['glyph_rle'] = True
+    if args.page_major:
+        settings['glyph_page_major'] = True
+    if args.const_menu:
+        settings['menu_const_table'] = True
+    if args.preshape:
+        settings['preshape_labels'] = True
+    if args.u8g2_font:
+        settings['u8g2_font'] = True
+    if args.no_glyph_cache:
+        settings['glyph_cache'] = False
+    if args.glyph_cache_dir:
+        settings['glyph_cache_dir'] = args.glyph_cache_dir
+    if args.cjk_charset:
+        settings['cjk_charset'] = args.cjk_charset
+    if args.u8g2_buffer:
+        settings['u8g2_buffer'] = args.u8g2_buffer
+    if args.screen_type:
+        settings['screen_type'] = args.screen_type
+    if args.tft_strip is not None:
+        settings['tft_strip_lines'] = args.tft_strip
+    if args.tft_strip_bufs is not None:
+        settings['tft_strip_bufs'] = args.tft_strip_bufs
+    if args.workers is not None:
+        settings['glyph_workers'] = args.workers
+    if args.flash_budget is not None:
+        settings['flash_budget'] = args.flash_budget
+    if args.ram_budget is not None:
+        settings['ram_budget'] = args.ram_budget
+
+def _load_for_cli(args):
+    try:
+        settings, root = load_project(args.project)
+    except Exception as e:
+        print(f"加载工程失败: {e}", file=sys.stderr)
+        return None, None
+    if root is None:
+        print(f"工程中没有菜单数据: {args.project}", file=sys.stderr)
+        return None, None
+    _apply_export_options(settings, args)
+    return settings, root
+
+def run_export(args):
+    """无界面导出：读取工程设置并直接运行代码生成器"""
+    settings, root = _load_for_cli(args)
+    if root is None:
+        return 1
+    try:
+        MuiExporter(settings, root).export(args.out)
+    except MuiBudgetError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+def run_simulate(args):
+    """主机仿真：导出后用 gcc 编译，按键脚本逐帧绘制，与预览比较并统计帧率与指令数"""
+    import mui_sim
+    settings, root = _load_for_cli(args)
+    if root is None:
+        return 1
+    try:
+        keys = mui_sim.parse_keys(args.keys)
+        errors = mui_sim.simulate(settings, root, args.out, keys, u8g2_src=args.u8g2_src, port=args.port,
+                                  bench=args.bench, insns=not args.no_insns, preview=not args.no_preview,
+                                  baseline=args.baseline, update_baseline=args.update_baseline,
+                                  max_diff=args.max_diff, max_insns=args.max_insns, min_fps=args.min_fps,
+                                  insns_tol=args.insns_tolerance)
+    except (ValueError, RuntimeError) as e:
+        print(f"仿真失败: {e}", file=sys.stderr)
+        return 1
+    return 1 if errors else 0
+
+def run_bench_text(args):
+    """U8G2 混排文字基准：计数桩 u8g2 下逐个菜单文字统计字形解码次数与耗时"""
+    import mui_sim
+    settings, root = _load_for_cli(args)
+    if root is None:
+        return 1
+    try:
+        errors = mui_sim.bench_text(settings, root, args.out, bench=args.bench)
+    except (ValueError, RuntimeError) as e:
+        print(f"基准失败: {e}", file=sys.stderr)
+        return 1
+    return 1 if errors else 0
+
+def run_bench_glyphs(args):
+    """字形栅格化基准：对比逐像素读取与缓冲区打包两条路径"""
+    import mui_glyphs
+    try:
+        settings, root = load_project(args.project)
+    except Exception as e:
+        print(f"加载工程失败: {e}", file=sys.stderr)
+        return 1
+    exporter = MuiExporter(settings, root)
+    family = args.family or settings.get('font_family') or 'Segoe UI'
+    px = args.px or exporter._parse_font_px()
+    cjk = exporter._cjk_chars() if not args.cjk else [chr(0x4E00 + i) for i in range(args.cjk)]
+    chars = [chr(c) for c in range(32, 127)] + cjk
+    print(f"字体 {family} {px}px，ASCII 95 + 中文 {len(cjk)} 字形")
+    renderers = [
+        ("buffer", mui_glyphs.per_glyph(mui_glyphs.render_glyph_bitmap)),
+        ("atlas", mui_glyphs.render_glyph_atlas),
+    ]
+    for n in args.workers:
+        renderers.append((f"atlas×{n}", lambda cs, f, p, n=n: mui_glyphs.render_glyphs_parallel(cs, f, p, n)))
+    if not args.skip_pixel:
+        renderers.insert(0, ("pixel", mui_glyphs.per_glyph(mui_glyphs.render_glyph_bitmap_pixel)))
+    mui_glyphs.benchmark(chars, family, px, renderers)
+    return 0
+
+def _add_export_options(p):
+    """导出相关参数（export 与 simulate 共用）"""
+    mode = p.add_mutually_exclusive_group()
+    mode.add_argument("--no-u8g2", dest="no_u8g2", action="store_const", const=True, default=None, help="导出不依赖 U8G2 的裸机代码")
+    mode.add_argument("--u8g2", dest="no_u8g2", action="store_const", const=False, help="导出依赖 U8G2 的代码")
+    p.add_argument("--no-font", action="store_true", help="不导出 ASCII 字体数组")
+    p.add_argument("--no-cjk", action="store_true", help="不导出中文子集字库")
+    p.add_argument("--rle", action="store_true", help="字库位图使用游程压缩（RLE）")
+    p.add_argument("--page-major", action="store_true", help="裸机字库按 SSD1306 页布局（纵向字节）存储，按字节绘制")
+    p.add_argument("--const-menu", action="store_true", help="菜单树导出为 const 扁平节点表（16 位下标 + 回调表），整棵树放在 Flash")
+    p.add_argument("--preshape", action="store_true", help="菜单文字在导出时预排版为字形下标与 x 坐标，绘制时不再解码 UTF-8、不再查表")
+    p.add_argument("--u8g2-font", action="store_true", help="U8G2 模式下把 ASCII 与中文子集导出为原生 U8G2 字体，菜单用 u8g2_DrawUTF8 绘制")
+    p.add_argument("--no-glyph-cache", action="store_true", help="不使用磁盘字形缓存")
+    p.add_argument("--glyph-cache-dir", help="字形缓存目录（默认位于用户缓存目录）")
+    p.add_argument("--cjk-charset", choices=["menu", "gb2312_l1"], help="中文字库范围：菜单使用的汉字 / 另加 GB2312 一级汉字")
+    p.add_argument("--u8g2-buffer", choices=["f", "1", "2"], help="U8G2 模式的帧缓：f 全缓冲（ClearBuffer/SendBuffer）/ 1、2 为 8、16 行页缓冲（firstPage/nextPage）")
+    p.add_argument("--screen-type", choices=["OLED", "TFT"], help="屏幕类型：TFT 时裸机导出为 RGB565 页条输出（按工程的屏幕尺寸与配色）")
+    p.add_argument("--tft-strip", type=int, help="TFT 页条行数（RAM 为 屏宽 × 行数 × 2 字节 × 块数，块数见 --tft-strip-bufs）")
+    p.add_argument("--tft-strip-bufs", type=int, choices=[1, 2], help="TFT 页条缓冲块数：2 绘制与发送交替（默认）/ 1 每条先等上一条发完，RAM 减半")
+    p.add_argument("--workers", type=int, help="栅格化进程数（0 为 CPU 核数，1 为单进程）")
+    p.add_argument("--flash-budget", type=int, help="Flash 预算（字节，0 不限），超出时导出失败并列出明细")
+    p.add_argument("--ram-budget", type=int, help="RAM 预算（字节，0 不限），超出时导出失败并列出明细")
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="mui_core.py", description="MUI 代码生成器（无界面）")
+    sub = parser.add_subparsers(dest="command")
+    p_export = sub.add_parser("export", help="无界面导出 MUI C 代码")
+    p_export.add_argument("--project", default=SETTINGS_FILE, help="工程设置文件（默认 menu_designer_settings.json）")
+    p_export.add_argument("--out", required=True, help="导出目录，代码写入 <out>/MUI")
+    _add_export_options(p_export)
+    p_sim = sub.add_parser("simulate", help="主机仿真：编译导出代码，按键脚本逐帧绘制并与预览比较，统计帧率与指令数")
+    p_sim.add_argument("--project", default=SETTINGS_FILE, help="工程设置文件（默认 menu_designer_settings.json）")
+    p_sim.add_argument("--out", required=True, help="工作目录：导出到 <out>/MUI，仿真程序、帧 PNG 与对比图在 <out>/sim")
+    p_sim.add_argument("--keys", default="DDDDUUE", help="按键脚本：U 上 / D 下 / E 确认 / B 返回 / . 空闲")
+    p_sim.add_argument("--port", choices=["sim", "stm32"], default="sim", help="裸机模式使用的 gfx_port：内存帧缓 / STM32 模板 + I2C/DMA 模拟")
+    p_sim.add_argument("--u8g2-src", help="U8G2 源码目录（csrc），U8G2 模式仿真时必需")
+    p_sim.add_argument("--bench", type=int, default=200, help="每帧重复绘制次数，用于计算主机帧率（0 不计时）")
+    p_sim.add_argument("--no-insns", action="store_true", help="不做 ptrace 单步指令计数")
+    p_sim.add_argument("--no-preview", action="store_true", help="不与 MenuPreview 比较（无需 PySide6）")
+    p_sim.add_argument("--baseline", help="基线目录：逐帧比较画面与指令数")
+    p_sim.add_argument("--update-baseline", action="store_true", help="用本次结果覆盖基线")
+    p_sim.add_argument("--max-diff", type=float, help="静止帧与预览差异的上限（百分比），超过则失败")
+    p_sim.add_argument("--max-insns", type=int, help="每帧指令数上限，超过则失败")
+    p_sim.add_argument("--min-fps", type=float, help="主机帧率下限，低于则失败")
+    p_sim.add_argument("--insns-tolerance", type=float, default=2.0, help="与基线相比指令数允许增长的百分比（默认 2）")
+    _add_export_options(p_sim)
+    p_bench = sub.add_parser("bench-glyphs", help="字形栅格化基准测试（每秒字形数）")
+    p_bench.add_argument("--project", default=SETTINGS_FILE, help="工程设置文件，提供字体与菜单中的汉字")
+    p_bench.add_argument("--family", help="覆盖工程中的字体")
+    p_bench.add_argument("--px", type=int, help="覆盖工程中的字号（像素）")
+    p_bench.add_argument("--cjk", type=int, default=0, help="改用从 U+4E00 起的前 N 个汉字代替菜单中的汉字")
+    p_bench.add_argument("--skip-pixel", action="store_true", help="跳过很慢的逐像素参考路径")
+    p_bench.add_argument("--workers", type=lambda v: [int(x) for x in v.split(",") if x], default=[], help="多进程扩展性测试的进程数列表，如 2,4,8")
+    p_text = sub.add_parser("bench-text", help="U8G2 混排文字基准：计数桩 u8g2 下逐个菜单文字统计字形解码次数与耗时")
+    p_text.add_argument("--project", default=SETTINGS_FILE, help="工程设置文件（默认 menu_designer_settings.json）")
+    p_text.add_argument("--out", required=True, help="工作目录：导出到 <out>/MUI，基准程序在 <out>/bench_text")
+    p_text.add_argument("--bench", type=int, default=2000, help="每个文字重复绘制次数，用于计时（0 不计时）")
+    _add_export_options(p_text)
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        return run_export(args)
+    if args.command == "simulate":
+        return run_simulate(args)
+    if args.command == "bench-text":
+        return run_bench_text(args)
+    if args.command == "bench-glyphs":
+        return run_bench_glyphs(args)
+    parser.print_help()
+    return 1
+
+if __name__=="__main__":
+    sys.exit(main())
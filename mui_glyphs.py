@@ -0,0 +1,582 @@
+# mui_glyphs.py
+# 字形栅格化：Qt 仅在真正需要渲染字符时才被导入
+import os
+import time
+
+_glyph_app = None
+_np = False  # 延迟导入 NumPy，避免拖慢 mui_core 的冷启动导入
+
+def _numpy():
+    """返回 numpy 模块；未安装时返回 None，改用 bytes 级回退实现"""
+    global _np
+    if _np is False:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = None
+    return _np
+
+def _ensure_gui_app():
+    global _glyph_app
+    from PySide6.QtGui import QGuiApplication
+    if QGuiApplication.instance() is None:
+        # 无界面导出：使用 offscreen 平台提供字体系统
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        _glyph_app = QGuiApplication([])
+
+def _draw_glyph_image(ch, family, px, fmt=None):
+    """在 2px×2px 的画布上以白色绘制字符，基线位于 y=px"""
+    from PySide6.QtGui import QImage, QFont, QPainter
+    from PySide6.QtCore import Qt
+    _ensure_gui_app()
+    img = QImage(px*2, px*2, QImage.Format_Grayscale8 if fmt is None else fmt)
+    img.fill(Qt.black)
+    f = QFont(family, px)
+    p = QPainter(img)
+    p.setPen(Qt.white)
+    p.setFont(f)
+    p.drawText(0, px, ch)
+    p.end()
+    return img
+
+# 灰度 > 128 记为 1；与旧实现 (r+g+b)//3 > 128 的阈值一致（白字黑底时三通道相等）
+_THRESHOLD = 128
+_BIT_TABLE = bytes(0x31 if v > _THRESHOLD else 0x30 for v in range(256))
+
+def pack_gray_rows(buf, bpl, w, h):
+    """把 Grayscale8 缓冲区二值化，并打包为按行、高位在前的 1bpp 数据"""
+    np = _numpy()
+    if np is not None:
+        a = np.frombuffer(buf, dtype=np.uint8, count=bpl*h).reshape(h, bpl)[:, :w]
+        return np.packbits(a > _THRESHOLD, axis=1).ravel().tolist()
+    buf = bytes(buf)
+    pad = b'0' * (-w % 8)
+    nbytes = (w + 7) // 8
+    data = []
+    for y in range(h):
+        bits = buf[y*bpl:y*bpl + w].translate(_BIT_TABLE) + pad
+        data.extend(int(bits, 2).to_bytes(nbytes, 'big'))
+    return data
+
+def crop_glyph(w, h, data):
+    """把整格字形裁剪到墨迹包围盒，返回 (x_off, y_off, w, h, 数据)；空白字形返回 0×0"""
+    stride = (w + 7) // 8
+    bits = stride * 8
+    rows = [int.from_bytes(bytes(data[y*stride:(y + 1)*stride]), 'big') for y in range(h)]
+    ink = [y for y, r in enumerate(rows) if r]
+    if not ink:
+        return 0, 0, 0, 0, []
+    mask = 0
+    for r in rows:
+        mask |= r
+    x0 = bits - mask.bit_length()
+    x1 = bits - (mask & -mask).bit_length()  # 最右侧墨迹列
+    cw = x1 - x0 + 1
+    cstride = (cw + 7) // 8
+    shift = bits - 1 - x1
+    pad = cstride*8 - cw
+    out = []
+    for r in rows[ink[0]:ink[-1] + 1]:
+        out.extend((((r >> shift) & ((1 << cw) - 1)) << pad).to_bytes(cstride, 'big'))
+    return x0, ink[0], cw, ink[-1] - ink[0] + 1, out
+
+def glyph_to_pages(w, h, data):
+    """把按行数据转为 SSD1306 页布局：每 8 行为一页，页内逐列一个字节，低位在上"""
+    stride = (w + 7) // 8
+    rows = [int.from_bytes(bytes(data[y*stride:(y + 1)*stride]), 'big') for y in range(h)]
+    out = []
+    for top in range(0, h, 8):
+        band = rows[top:top + 8]
+        for x in range(w):
+            shift = stride*8 - 1 - x
+            b = 0
+            for k, r in enumerate(band):
+                b |= ((r >> shift) & 1) << k
+            out.append(b)
+    return out
+
+def glyph_advances(chars, family, px):
+    """按字体度量返回各字符的水平步进（像素），字体与栅格化时一致"""
+    from PySide6.QtGui import QFont, QFontMetrics
+    _ensure_gui_app()
+    fm = QFontMetrics(QFont(family, px))
+    return [fm.horizontalAdvance(ch) for ch in chars]
+
+def render_glyph_bitmap(ch, family, px):
+    """用 Qt 栅格化单个字符，返回 (w, h, 按行打包的 1bpp 数据)"""
+    img = _draw_glyph_image(ch, family, px)
+    w = min(img.width(), px*2)
+    h = min(img.height(), px)
+    return w, h, pack_gray_rows(img.constBits(), img.bytesPerLine(), w, h)
+
+# 单张图集的列数与最多字形数，限制图集内存（16px 时约 2048×1024 灰度）
+ATLAS_COLS = 64
+ATLAS_MAX_GLYPHS = 2048
+
+def render_glyph_atlas(chars, family, px):
+    """在一张图集上用同一个 QPainter 批量绘制字符，再切出各字形；结果与 render_glyph_bitmap 逐位一致"""
+    from PySide6.QtGui import QImage, QFont, QPainter
+    from PySide6.QtCore import Qt
+    _ensure_gui_app()
+    cell_w = cell_h = px*2
+    w, h = cell_w, px
+    out = []
+    f = QFont(family, px)
+    for start in range(0, len(chars), ATLAS_MAX_GLYPHS):
+        batch = chars[start:start + ATLAS_MAX_GLYPHS]
+        cols = min(ATLAS_COLS, len(batch))
+        rows = (len(batch) + cols - 1) // cols
+        img = QImage(cols*cell_w, rows*cell_h, QImage.Format_Grayscale8)
+        img.fill(Qt.black)
+        p = QPainter(img)
+        p.setPen(Qt.white)
+        p.setFont(f)
+        for i, ch in enumerate(batch):
+            x0 = (i % cols) * cell_w
+            y0 = (i // cols) * cell_h
+            # 裁剪到单元格，等价于单字形画布的图像边界
+            p.setClipRect(x0, y0, cell_w, cell_h)
+            p.drawText(x0, y0 + px, ch)
+        p.end()
+        bpl = img.bytesPerLine()
+        buf = img.constBits()
+        np = _numpy()
+        if np is not None:
+            a = np.frombuffer(buf, dtype=np.uint8, count=bpl*img.height()).reshape(img.height(), bpl)
+            for i in range(len(batch)):
+                x0 = (i % cols) * cell_w
+                y0 = (i // cols) * cell_h
+                cell = a[y0:y0 + h, x0:x0 + w]
+                out.append((w, h, np.packbits(cell > _THRESHOLD, axis=1).ravel().tolist()))
+        else:
+            buf = bytes(buf)
+            for i in range(len(batch)):
+                x0 = (i % cols) * cell_w
+                y0 = (i // cols) * cell_h
+                cell = b''.join(buf[(y0 + y)*bpl + x0:(y0 + y)*bpl + x0 + w] for y in range(h))
+                out.append((w, h, pack_gray_rows(cell, w, w, h)))
+    return out
+
+# ---------------- 多进程栅格化 ----------------
+# 字形数少于该值时进程启动开销大于收益，直接在本进程绘制
+PARALLEL_MIN_GLYPHS = 512
+
+def _atlas_worker(task):
+    platform, chars, family, px = task
+    # 每个工作进程使用与主进程相同的 Qt 平台插件，保证字体解析一致
+    if platform:
+        os.environ["QT_QPA_PLATFORM"] = platform
+    return render_glyph_atlas(chars, family, px)
+
+def render_glyphs_parallel(chars, family, px, workers=1):
+    """把码位按连续分片分配给进程池，各进程独立创建 Qt 上下文并用图集栅格化，结果按输入顺序合并"""
+    chars = list(chars)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, (len(chars) + ATLAS_COLS - 1) // ATLAS_COLS)
+    if workers <= 1 or len(chars) < PARALLEL_MIN_GLYPHS:
+        return render_glyph_atlas(chars, family, px)
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from PySide6.QtGui import QGuiApplication
+    _ensure_gui_app()
+    platform = QGuiApplication.platformName() or os.environ.get("QT_QPA_PLATFORM", "")
+    chunk = (len(chars) + workers - 1) // workers
+    tasks = [(platform, chars[i:i + chunk], family, px) for i in range(0, len(chars), chunk)]
+    # spawn：Qt 在 fork 出的子进程中不可用
+    with ProcessPoolExecutor(max_workers=len(tasks), mp_context=multiprocessing.get_context("spawn")) as ex:
+        parts = list(ex.map(_atlas_worker, tasks))
+    return [glyph for part in parts for glyph in part]
+
+def render_glyph_bitmap_pixel(ch, family, px):
+    """逐像素读取的参考实现（旧路径），用于校验与基准对比"""
+    from PySide6.QtGui import QColor, QImage
+    img = _draw_glyph_image(ch, family, px, QImage.Format_ARGB32)
+    w = min(img.width(), px*2)
+    h = min(img.height(), px)
+    data = []
+    for y in range(h):
+        byte = 0
+        bit_count = 0
+        for x in range(w):
+            c = QColor(img.pixel(x,y))
+            v = 1 if (c.red()+c.green()+c.blue())//3 > 128 else 0
+            byte = (byte<<1) | v
+            bit_count += 1
+            if bit_count == 8:
+                data.append(byte)
+                byte = 0
+                bit_count = 0
+        if bit_count:
+            data.append(byte << (8-bit_count))
+    return w, h, data
+
+# ---------------- 游程压缩 ----------------
+# 字形按行展开为像素流，编码为 (0 游程, 1 游程) 对，两者各用整表统一的位宽，按位高位在前紧密排列
+def glyph_runs(w, h, data):
+    """返回字形像素流的 (0 游程, 1 游程) 长度对列表"""
+    import re
+    stride = (w + 7) // 8
+    bits = ''.join(format(int.from_bytes(bytes(data[y*stride:(y + 1)*stride]), 'big'), f'0{stride*8}b')[:w]
+                   for y in range(h))
+    return [(len(z), len(o)) for z, o in re.findall('(0*)(1*)', bits) if z or o]
+
+def _rle_split(runs, m0, m1):
+    """把超出位宽上限的游程拆成多对"""
+    for z, o in runs:
+        while z > m0:
+            yield m0, 0
+            z -= m0
+        n = min(o, m1)
+        yield z, n
+        o -= n
+        while o:
+            n = min(o, m1)
+            yield 0, n
+            o -= n
+
+def rle_choose_bits(run_lists):
+    """按全部字形的游程分布选择总位数最少的 (0 游程位宽, 1 游程位宽)"""
+    from collections import Counter
+    zeros = Counter(z for runs in run_lists for z, _ in runs)
+    ones = Counter(o for runs in run_lists for _, o in runs)
+    best = None
+    for b0 in range(1, 9):
+        m0 = (1 << b0) - 1
+        extra = sum(c * ((z - 1) // m0) for z, c in zeros.items() if z)
+        for b1 in range(1, 9):
+            m1 = (1 << b1) - 1
+            pairs = extra + sum(c * max(1, (o + m1 - 1) // m1) for o, c in ones.items())
+            cost = pairs * (b0 + b1)
+            if best is None or cost < best[0]:
+                best = (cost, b0, b1)
+    return (best[1], best[2]) if best else (4, 4)
+
+def rle_encode(runs, b0, b1):
+    """编码单个字形，返回 (字节列表, 游程对数)"""
+    acc = 0
+    nbits = 0
+    pairs = 0
+    for z, o in _rle_split(runs, (1 << b0) - 1, (1 << b1) - 1):
+        acc = (acc << (b0 + b1)) | (z << b1) | o
+        nbits += b0 + b1
+        pairs += 1
+    pad = -nbits % 8
+    return list((acc << pad).to_bytes((nbits + pad) // 8, 'big')), pairs
+
+# ---------------- U8G2 字体格式 ----------------
+# 与 bdfconv 生成的字体布局相同，可直接交给 u8g2_SetFont（需 U8G2 2.23 起带 Unicode 跳转表的字体解码）：
+# 23 字节字体头；码位 0–255 的字形记录（1 字节码位 + 1 字节记录长度），以长度 0 结尾；
+# Unicode 跳转表（每项大端 2 字节段偏移 + 2 字节段末码位，末项码位 0xFFFF）与码位 256 起的字形记录
+# （大端 2 字节码位 + 1 字节记录长度），以码位 0 结尾。字形记录内是低位在前的位流：宽、高，
+# x/y 偏移与步进（加偏置的有符号数），再是 (0 游程, 1 游程) 对，每对之后 1 位为 1 表示重复上一对
+U8G2_FONT_HEADER = 23
+U8G2_JUMP_BLOCK = 128  # 跳转表每段至少包含的字节数，查找时先按段跳转再段内顺序查找
+
+class _BitWriter:
+    def __init__(self):
+        self.out = []
+        self.acc = 0
+        self.nbits = 0
+
+    def put(self, v, bits):
+        self.acc |= v << self.nbits
+        self.nbits += bits
+        while self.nbits >= 8:
+            self.out.append(self.acc & 0xFF)
+            self.acc >>= 8
+            self.nbits -= 8
+
+    def data(self):
+        return self.out + ([self.acc] if self.nbits else [])
+
+def _unsigned_bits(v):
+    return max(1, int(v).bit_length())
+
+def _signed_bits(lo, hi):
+    n = 1
+    while lo < -(1 << (n - 1)) or hi > (1 << (n - 1)) - 1:
+        n += 1
+    return n
+
+def _u8g2_groups(pairs):
+    """把相邻相同的游程对合并为 (0 游程, 1 游程, 重复次数)"""
+    out = []
+    for p in pairs:
+        if out and out[-1][:2] == p:
+            out[-1][2] += 1
+        else:
+            out.append([p[0], p[1], 1])
+    return out
+
+def _u8g2_choose_bits(run_lists):
+    """按整表实际编码位数选择 (0 游程位宽, 1 游程位宽)"""
+    best = None
+    for b0 in range(2, 8):
+        for b1 in range(1, 7):
+            cost = 0
+            for runs in run_lists:
+                for _, _, n in _u8g2_groups(_rle_split(runs, (1 << b0) - 1, (1 << b1) - 1)):
+                    cost += b0 + b1 + n
+            if best is None or cost < best[0]:
+                best = (cost, b0, b1)
+    return best[1], best[2]
+
+def u8g2_font(glyphs):
+    """把字形编码为 U8G2 字体。glyphs 为 [(码位, x 偏移, y 偏移, w, h, 按行数据, 步进)]，
+    偏移按 u8g2 约定（y 为包围盒底边在基线之上的行数）；返回 (字体字节列表, 统计字典)"""
+    glyphs = sorted(glyphs, key=lambda g: g[0])
+    inked = [g for g in glyphs if g[3] and g[4]]
+    runs = {g[0]: glyph_runs(g[3], g[4], g[5]) for g in inked}
+    b0, b1 = _u8g2_choose_bits(list(runs.values())) if runs else (2, 1)
+    m0, m1 = (1 << b0) - 1, (1 << b1) - 1
+    xs = [g[1] for g in inked] or [0]
+    ys = [g[2] for g in inked] or [0]
+    bits_w = _unsigned_bits(max(g[3] for g in glyphs) if glyphs else 0)
+    bits_h = _unsigned_bits(max(g[4] for g in glyphs) if glyphs else 0)
+    bits_x = _signed_bits(min(xs), max(xs))
+    bits_y = _signed_bits(min(ys), max(ys))
+    bits_d = _signed_bits(min(g[6] for g in glyphs) if glyphs else 0, max(g[6] for g in glyphs) if glyphs else 0)
+    if max(bits_w, bits_h, bits_x, bits_y, bits_d) > 8:
+        raise ValueError("字形尺寸或步进超出 U8G2 字体格式的 8 位字段，请减小字号")
+
+    def record(g):
+        code, xo, yo, w, h, _, adv = g
+        bw = _BitWriter()
+        bw.put(w, bits_w)
+        bw.put(h, bits_h)
+        bw.put(xo + (1 << (bits_x - 1)), bits_x)
+        bw.put(yo + (1 << (bits_y - 1)), bits_y)
+        bw.put(adv + (1 << (bits_d - 1)), bits_d)
+        if code in runs:
+            for a, b, n in _u8g2_groups(_rle_split(runs[code], m0, m1)):
+                bw.put(a, b0)
+                bw.put(b, b1)
+                bw.put((1 << (n - 1)) - 1, n)  # n-1 个重复位 1，再以 0 结束
+        return bw.data()
+
+    by_code = {g[0]: g for g in glyphs}
+    def metric(ch, top):
+        g = by_code.get(ord(ch))
+        if g is None or not (g[3] and g[4]):
+            return 0
+        return g[2] + g[4] if top else g[2]
+
+    body = []
+    pos_A = pos_a = None
+    for g in glyphs:
+        if g[0] > 0xFF:
+            break
+        if pos_A is None and g[0] >= ord('A'):
+            pos_A = len(body)
+        if pos_a is None and g[0] >= ord('a'):
+            pos_a = len(body)
+        rec = record(g)
+        if len(rec) + 2 > 0xFF:
+            raise ValueError(f"字形 U+{g[0]:04X} 编码后超过 255 字节")
+        body += [g[0], len(rec) + 2] + rec
+    if pos_A is None:
+        pos_A = len(body)
+    if pos_a is None:
+        pos_a = len(body)
+    body += [0, 0]
+    pos_unicode = len(body)
+    blocks = [[]]
+    ends = [0xFFFF]
+    for g in glyphs:
+        if g[0] <= 0xFF:
+            continue
+        rec = record(g)
+        if len(rec) + 3 > 0xFF:
+            raise ValueError(f"字形 U+{g[0]:04X} 编码后超过 255 字节")
+        if len(blocks[-1]) >= U8G2_JUMP_BLOCK:
+            blocks.append([])
+            ends.append(0xFFFF)
+        blocks[-1] += [g[0] >> 8, g[0] & 0xFF, len(rec) + 3] + rec
+        ends[-1] = g[0]
+    ends[-1] = 0xFFFF
+    offset = 4 * len(blocks)
+    for blk, end in zip(blocks, ends):
+        body += [offset >> 8, offset & 0xFF, end >> 8, end & 0xFF]
+        offset = len(blk)
+    for blk in blocks:
+        body += blk
+    body += [0, 0]
+
+    head = [min(len(glyphs), 0xFF), 0, b0, b1, bits_w, bits_h, bits_x, bits_y, bits_d,
+            max((g[1] + g[3] for g in inked), default=0) - min(xs),
+            max((g[2] + g[4] for g in inked), default=0) - min(ys),
+            min(xs) & 0xFF, min(ys) & 0xFF,
+            metric('A', True) & 0xFF, metric('g', False) & 0xFF, metric('(', True) & 0xFF, metric('(', False) & 0xFF,
+            pos_A >> 8, pos_A & 0xFF, pos_a >> 8, pos_a & 0xFF, pos_unicode >> 8, pos_unicode & 0xFF]
+    if max(pos_A, pos_a, pos_unicode) > 0xFFFF:
+        raise ValueError("U8G2 字体的 8 位码位部分超过 64 KB")
+    info = {'glyphs': len(glyphs), 'bits': (b0, b1), 'blocks': len(blocks),
+            'max_w': head[9], 'max_h': head[10]}
+    return head + body, info
+
+# ---------------- 磁盘字形缓存 ----------------
+# 栅格化结果格式或算法变化时递增，使旧缓存条目自动失效
+GLYPH_CACHE_VERSION = 1
+
+_font_digests = {}
+
+def font_digest(family):
+    """Qt 实际解析到的字体文件摘要（族名、样式与 head/name/maxp 表），字体升级后缓存随之失效"""
+    import hashlib
+    if family not in _font_digests:
+        from PySide6.QtGui import QFont, QRawFont
+        _ensure_gui_app()
+        raw = QRawFont.fromFont(QFont(family))
+        h = hashlib.sha1()
+        h.update(f"{raw.familyName()}\0{raw.styleName()}".encode('utf-8'))
+        for tag in ('head', 'name', 'maxp'):
+            h.update(bytes(raw.fontTable(tag)))
+        _font_digests[family] = h.hexdigest()
+    return _font_digests[family]
+
+_font_stamp = None
+
+def _font_dirs():
+    """系统与用户字体目录（Windows / Linux / macOS），另加 Qt 的 QT_QPA_FONTDIR"""
+    home = os.path.expanduser('~')
+    dirs = [os.path.join(os.environ.get('WINDIR', r'C:\Windows'), 'Fonts'),
+            os.path.join(os.environ.get('LOCALAPPDATA', home), 'Microsoft', 'Windows', 'Fonts'),
+            '/usr/share/fonts', '/usr/local/share/fonts', os.path.join(home, '.fonts'), os.path.join(home, '.local', 'share', 'fonts'),
+            '/Library/Fonts', '/System/Library/Fonts', os.path.join(home, 'Library', 'Fonts')]
+    if os.environ.get('QT_QPA_FONTDIR'):
+        dirs.append(os.environ['QT_QPA_FONTDIR'])
+    return [d for d in dirs if os.path.isdir(d)]
+
+def font_files_stamp():
+    """字体目录中所有文件的路径、大小与修改时间的摘要；不依赖 Qt，安装、删除或升级字体后随之变化"""
+    global _font_stamp
+    if _font_stamp is None:
+        import hashlib
+        h = hashlib.sha1()
+        for root in _font_dirs():
+            for path, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    try:
+                        st = os.stat(os.path.join(path, name))
+                    except OSError:
+                        continue
+                    h.update(f"{path}\0{name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode('utf-8', 'surrogateescape'))
+        _font_stamp = h.hexdigest()
+    return _font_stamp
+
+def default_cache_dir():
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'mui_tools', 'glyphs')
+
+class GlyphCache:
+    """内容寻址的磁盘字形缓存，键为 (字体族, 字体文件摘要, 字号, 阈值, 码位)，超出容量时按 LRU 淘汰；
+    字体摘要按字体目录指纹记在 fonts 表中，指纹不变时全部命中的导出不加载 Qt"""
+    def __init__(self, cache_dir=None, max_mb=64):
+        import sqlite3
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(self.cache_dir, 'glyphs.sqlite3'))
+        self.db.execute("CREATE TABLE IF NOT EXISTS glyphs (key TEXT PRIMARY KEY, w INTEGER, h INTEGER, data BLOB, last_used REAL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS advances (key TEXT PRIMARY KEY, advance INTEGER)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS fonts (family TEXT PRIMARY KEY, stamp TEXT, digest TEXT)")
+        self._digests = {}
+
+    def digest(self, family):
+        """字体文件摘要：字体目录指纹与记录一致时直接取 fonts 表，否则经 Qt 重新计算并记录"""
+        if family not in self._digests:
+            stamp = font_files_stamp()
+            row = self.db.execute("SELECT stamp, digest FROM fonts WHERE family=?", (family,)).fetchone()
+            if row is not None and row[0] == stamp:
+                self._digests[family] = row[1]
+            else:
+                self._digests[family] = font_digest(family)
+                self.db.execute("INSERT OR REPLACE INTO fonts VALUES (?, ?, ?)", (family, stamp, self._digests[family]))
+        return self._digests[family]
+
+    def key(self, family, px, ch):
+        import hashlib
+        ident = f"{GLYPH_CACHE_VERSION}\0{family}\0{self.digest(family)}\0{px}\0{_THRESHOLD}\0{ord(ch)}"
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()
+
+    def get(self, family, px, ch):
+        k = self.key(family, px, ch)
+        row = self.db.execute("SELECT w, h, data FROM glyphs WHERE key=?", (k,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE glyphs SET last_used=? WHERE key=?", (time.time(), k))
+        return row[0], row[1], list(row[2])
+
+    def put(self, family, px, ch, glyph):
+        w, h, data = glyph
+        self.db.execute("INSERT OR REPLACE INTO glyphs VALUES (?, ?, ?, ?, ?)",
+                        (self.key(family, px, ch), w, h, bytes(data), time.time()))
+
+    def advances(self, chars, family, px):
+        """字符步进：先查缓存，缺少的一次经 glyph_advances 取得并写回"""
+        keys = [self.key(family, px, ch) for ch in chars]
+        out = []
+        for k in keys:
+            row = self.db.execute("SELECT advance FROM advances WHERE key=?", (k,)).fetchone()
+            out.append(None if row is None else row[0])
+        todo = [i for i, adv in enumerate(out) if adv is None]
+        if todo:
+            for i, adv in zip(todo, glyph_advances([chars[i] for i in todo], family, px)):
+                out[i] = adv
+                self.db.execute("INSERT OR REPLACE INTO advances VALUES (?, ?)", (keys[i], adv))
+        return out
+
+    def evict(self):
+        """总大小超过上限时，从最久未使用的条目开始删除"""
+        total = self.db.execute("SELECT COALESCE(SUM(LENGTH(data) + 64), 0) FROM glyphs").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for k, size in self.db.execute("SELECT key, LENGTH(data) + 64 FROM glyphs ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM glyphs WHERE key=?", (k,))
+            self.db.execute("DELETE FROM advances WHERE key=?", (k,))
+            total -= size
+            removed += 1
+        return removed
+
+    def close(self):
+        self.evict()
+        self.db.commit()
+        self.db.close()
+
+    def render(self, ch, family, px, renderer=None):
+        """先查缓存，未命中时栅格化并写回"""
+        glyph = self.get(family, px, ch)
+        if glyph is None:
+            glyph = (renderer or render_glyph_bitmap)(ch, family, px)
+            self.put(family, px, ch, glyph)
+        return glyph
+
+# ---------------- 基准测试 ----------------
+def per_glyph(fn):
+    """把单字形渲染函数包装成批量接口 (chars, family, px) -> [glyph]"""
+    return lambda chars, family, px: [fn(ch, family, px) for ch in chars]
+
+def benchmark(chars, family, px, renderers, log=print):
+    """依次用各批量渲染函数栅格化 chars，打印每秒字形数，并校验输出与第一个渲染函数一致"""
+    ref = None
+    results = {}
+    for name, fn in renderers:
+        t0 = time.perf_counter()
+        out = fn(chars, family, px)
+        dt = max(time.perf_counter() - t0, 1e-9)
+        results[name] = len(chars) / dt
+        same = "" if ref is None else ("  一致" if out == ref else "  不一致!")
+        if ref is None:
+            ref = out
+        log(f"{name:<10} {len(chars)} 字形  {dt*1000:8.1f} ms  {results[name]:10.1f} 字形/秒{same}")
+    return results
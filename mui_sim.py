@@ -0,0 +1,709 @@
+# mui_sim.py
+# 主机仿真：用本机 gcc 编译导出的 MUI/ 代码（内存帧缓 gfx_port），按键脚本驱动菜单，
+# 逐帧导出 PNG，与 MenuPreview.render_menu 的预览逐像素比较，并统计主机帧率与每帧指令数
+import os
+import shutil
+import struct
+import subprocess
+import zlib
+
+# 按键脚本：U 上 / D 下 / E 确认 / B 返回 / . 空闲一帧（不按键），空白忽略
+SIM_KEYS = {'U': 1, 'D': 2, 'E': 3, 'B': 4, '.': 0}
+# 帧记录：步骤 u16、按键、是否静止、光标、视窗起点、菜单深度、填充、指令数 i32、单帧绘制耗时 ns u32，后接页布局帧缓
+FRAME_HDR = struct.Struct("<HBBBBBxiI")
+FRAMES_MAGIC = b"MUIS"
+
+def parse_keys(script):
+    keys = []
+    for ch in script.upper():
+        if ch.isspace() or ch == ',':
+            continue
+        if ch not in SIM_KEYS:
+            raise ValueError(f"未知按键 '{ch}'（可用 U/D/E/B/.）")
+        keys.append(SIM_KEYS[ch])
+    return keys
+
+# ---------------- 帧文件与 PNG ----------------
+class SimFrame:
+    __slots__ = ("step", "key", "settled", "cursor", "view_start", "depth", "insns", "draw_ns", "fb")
+
+    def __init__(self, step, key, settled, cursor, view_start, depth, insns, draw_ns, fb):
+        self.step = step
+        self.key = key
+        self.settled = settled
+        self.cursor = cursor
+        self.view_start = view_start
+        self.depth = depth
+        self.insns = insns
+        self.draw_ns = draw_ns
+        self.fb = fb
+
+    def pixels(self, w, h):
+        """页布局（每字节纵向 8 像素，低位在上）展开为 0/1 行"""
+        fb = self.fb
+        return [[(fb[(y >> 3) * w + x] >> (y & 7)) & 1 for x in range(w)] for y in range(h)]
+
+def read_frames(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != FRAMES_MAGIC:
+        raise ValueError(f"不是仿真帧文件: {path}")
+    w, h = struct.unpack_from("<HH", data, 4)
+    size = w * ((h + 7) // 8)
+    frames = []
+    pos = 8
+    while pos + FRAME_HDR.size + size <= len(data):
+        hdr = FRAME_HDR.unpack_from(data, pos)
+        pos += FRAME_HDR.size
+        frames.append(SimFrame(*hdr, data[pos:pos + size]))
+        pos += size
+    return w, h, frames
+
+def write_png(path, rows):
+    """rows 为 RGB 三元组的行列表；最小 PNG 编码（8 位 RGB、无滤波）"""
+    h = len(rows)
+    w = len(rows[0]) if h else 0
+    raw = b"".join(b"\x00" + bytes(c for px in row for c in px) for row in rows)
+    def chunk(tag, body):
+        return struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body) & 0xFFFFFFFF)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 9)))
+        f.write(chunk(b"IEND", b""))
+
+def _scale(rows, s):
+    if s == 1:
+        return rows
+    out = []
+    for row in rows:
+        wide = [px for px in row for _ in range(s)]
+        out.extend([wide] * s)
+    return out
+
+ON = (255, 255, 255)
+OFF = (0, 0, 0)
+
+# ---------------- C 源码生成 ----------------
+def sim_port_source(w, h):
+    """内存帧缓 gfx_port：页布局与 SSD1306/U8G2 一致，绘制原语保持最简单的逐像素写法，作为对照"""
+    x = []
+    x.append("#include \"gfx_port.h\"")
+    x.append("#include <string.h>")
+    x.append(f"#define SIM_W {w}")
+    x.append(f"#define SIM_H {h}")
+    x.append("uint8_t sim_fb[SIM_W*((SIM_H+7)/8)];")
+    x.append("const uint8_t* sim_frame(void){ return sim_fb; }")
+    x.append("int gfx_width(void){ return SIM_W; }")
+    x.append("int gfx_height(void){ return SIM_H; }")
+    x.append("void gfx_init(void){ memset(sim_fb,0,sizeof(sim_fb)); }")
+    x.append("void gfx_clear(void){ memset(sim_fb,0,sizeof(sim_fb)); }")
+    x.append("void gfx_send(void){}")
+    x.append("static void (*flush_done_cb)(void);")
+    x.append("void gfx_send_async(void){ if(flush_done_cb) flush_done_cb(); }")
+    x.append("int gfx_flush_busy(void){ return 0; }")
+    x.append("void gfx_set_flush_done_cb(void (*cb)(void)){ flush_done_cb = cb; }")
+    x.append("void gfx_draw_pixel(int x,int y){ if(x<0||x>=SIM_W||y<0||y>=SIM_H) return; sim_fb[(y>>3)*SIM_W + x] |= (uint8_t)(1<<(y&7)); }")
+    x.append("void gfx_fill_rect(int x,int y,int w,int h){ for(int yy=0; yy<h; ++yy) for(int xx=0; xx<w; ++xx) gfx_draw_pixel(x+xx,y+yy); }")
+    x.append("void gfx_hline(int x,int y,int w){ gfx_fill_rect(x,y,w,1); }")
+    x.append("void gfx_vline(int x,int y,int h){ gfx_fill_rect(x,y,1,h); }")
+    x.append("void gfx_draw_bitmap_1bpp(int x,int y,int w,int h,const uint8_t* data){ int stride=(w+7)/8; for(int yy=0; yy<h; ++yy) for(int xx=0; xx<w; ++xx) if(data[yy*stride+(xx>>3)] & (0x80>>(xx&7))) gfx_draw_pixel(x+xx,y+yy); }")
+    x.append("void gfx_draw_bitmap_pages(int x,int y,int w,int h,const uint8_t* data){ for(int yy=0; yy<h; ++yy) for(int xx=0; xx<w; ++xx) if(data[(yy>>3)*w+xx] & (1<<(yy&7))) gfx_draw_pixel(x+xx,y+yy); }")
+    return x
+
+def sim_tft_port_source():
+    """TFT 页条导出的仿真屏驱动：页条拷入整屏 RGB565 显存，取帧时按预览的二值化规则
+    （前景与选中条为亮，背景与选中文字为灭）还原为页布局，与单色帧共用比较与基线流程"""
+    x = []
+    x.append("#include \"gfx_port.h\"")
+    x.append("#include <string.h>")
+    x.append("static uint16_t sim_rgb[GFX_W*GFX_H];")
+    x.append("static uint8_t sim_fb[GFX_W*((GFX_H+7)/8)];")
+    x.append("void tft_panel_init(void){ memset(sim_rgb,0,sizeof(sim_rgb)); }")
+    x.append("void tft_panel_write(int y0,int h,const uint16_t* px){ memcpy(&sim_rgb[y0*GFX_W], px, (size_t)GFX_W*(size_t)h*sizeof(uint16_t)); gfx_tft_write_done(); }")
+    x.append("const uint16_t* sim_frame_rgb(void){ return sim_rgb; }")
+    x.append("const uint8_t* sim_frame(void){")
+    x.append("  const uint16_t fg=MUI_TFT_PX(MUI_COLOR_FG), sel=MUI_TFT_PX(MUI_COLOR_SEL_BG);")
+    x.append("  memset(sim_fb,0,sizeof(sim_fb));")
+    x.append("  for(int y=0; y<GFX_H; ++y) for(int x=0; x<GFX_W; ++x){ uint16_t c=sim_rgb[y*GFX_W+x]; if(c==fg||c==sel) sim_fb[(y>>3)*GFX_W+x] |= (uint8_t)(1<<(y&7)); }")
+    x.append("  return sim_fb;")
+    x.append("}")
+    return x
+
+def sim_main_source(w, h, u8g2, u8g2_buffer='f'):
+    """按键脚本驱动：每个按键后绘制到静止为止（动画每帧前进 16ms），记录帧缓、耗时与指令数。
+    U8G2 页缓冲模式下内存里只有一个页条，帧取自 SSD1306 命令/数据流还原出的屏上显存"""
+    x = []
+    x.append("#define _GNU_SOURCE")
+    if u8g2:
+        x.append("#include \"mui_bundle.h\"")
+    else:
+        x.append("#include \"menu_bare.h\"")
+        x.append("#include \"gfx_port.h\"")
+        x.append("#include \"input_port.h\"")
+    x.append("#include <stdio.h>")
+    x.append("#include <stdlib.h>")
+    x.append("#include <string.h>")
+    x.append("#include <time.h>")
+    x.append("#include <signal.h>")
+    x.append("#include <unistd.h>")
+    x.append("#include <sys/ptrace.h>")
+    x.append("#include <sys/wait.h>")
+    x.append(f"#define SIM_W {w}")
+    x.append(f"#define SIM_H {h}")
+    x.append("#define SIM_FB_SIZE (SIM_W*((SIM_H+7)/8))")
+    if u8g2:
+        x.append("static u8g2_t u8g2; static MenuNav nav;")
+        if u8g2_buffer == 'f':
+            x.append("static const uint8_t* sim_frame(void){ return u8g2_GetBufferPtr(&u8g2); }")
+            x.append("static void sim_init(void){ u8g2_Setup_ssd1306_128x64_noname_f(&u8g2, U8G2_R0, u8x8_byte_empty, u8x8_dummy_cb); menu_nav_init(&nav, menu_root); }")
+        else:
+            # 字节回调按 D/C 区分命令与数据：0xB0..0xB7 设页、0x1X/0x0X 设列高/低半字节，数据按页布局写入显存
+            x.append("static uint8_t sim_gddram[SIM_FB_SIZE]; static uint8_t sim_dc, sim_page, sim_col;")
+            x.append("static uint8_t sim_byte_cb(u8x8_t* u8x8, uint8_t msg, uint8_t arg_int, void* arg_ptr){")
+            x.append("  (void)u8x8; const uint8_t* p=(const uint8_t*)arg_ptr;")
+            x.append("  if(msg==U8X8_MSG_BYTE_SET_DC){ sim_dc=arg_int; return 1; }")
+            x.append("  if(msg!=U8X8_MSG_BYTE_SEND) return 1;")
+            x.append("  while(arg_int--){ uint8_t b=*p++;")
+            x.append("    if(sim_dc){ if(sim_page<SIM_H/8 && sim_col<SIM_W) sim_gddram[sim_page*SIM_W+sim_col]=b; sim_col++; }")
+            x.append("    else if(b>=0xB0 && b<=0xB7) sim_page=(uint8_t)(b&7);")
+            x.append("    else if(b>=0x10 && b<=0x1F) sim_col=(uint8_t)((sim_col&0x0F)|((b&0x0F)<<4));")
+            x.append("    else if(b<=0x0F) sim_col=(uint8_t)((sim_col&0xF0)|b);")
+            x.append("  }")
+            x.append("  return 1;")
+            x.append("}")
+            x.append("static const uint8_t* sim_frame(void){ return sim_gddram; }")
+            x.append(f"static void sim_init(void){{ u8g2_Setup_ssd1306_128x64_noname_{u8g2_buffer}(&u8g2, U8G2_R0, sim_byte_cb, u8x8_dummy_cb); menu_nav_init(&nav, menu_root); }}")
+        x.append("static void sim_draw(void){ draw_menu(&u8g2, nav.current, nav.state.cursor, nav.state.view_start); }")
+        x.append("static void sim_key(uint8_t k){ if(k) menu_nav_on_key(&nav, (MenuKey)k, menu_visible_lines(&u8g2)); }")
+        # U8G2 菜单没有滚动动画：每个按键绘制一帧
+        x.append("static int sim_pending=1;")
+        x.append("static int sim_tick(void){ sim_pending=0; return 0; }")
+        x.append("static void sim_state(uint8_t* s){ s[0]=nav.state.cursor; s[1]=nav.state.view_start; s[2]=nav.depth; }")
+    else:
+        x.append("const uint8_t* sim_frame(void);")
+        # 动画经 mui_set_tick_source 取桩实现的毫秒时基，与设备上的主循环走同一条路径
+        x.append("static void sim_init(void){ gfx_init(); input_port_init(); mui_nav_init(); mui_set_tick_source(input_port_millis); }")
+        x.append("static void sim_draw(void){ draw_menu_bare(mui_get_cursor(), mui_get_view_start()); }")
+        # 按键经桩实现的消抖与事件队列：按住 SIM_KEY_MS 毫秒再松开同样时长，然后取尽队列
+        x.append("#define SIM_KEY_MS 30")
+        x.append("static void sim_key(uint8_t k){")
+        x.append("  if(k){ input_port_sim_set((uint8_t)(1u<<(k-1))); input_port_sim_advance(SIM_KEY_MS); input_port_sim_set(0); input_port_sim_advance(SIM_KEY_MS); }")
+        x.append("  for(MenuKey e; (e=input_port_pop())!=MENU_KEY_NONE; ) mui_nav_on_key((uint8_t)e);")
+        x.append("}")
+        x.append("static int sim_tick(void){ input_port_sim_advance(16); mui_anim_update(); return mui_needs_redraw(); }")
+        x.append("static void sim_state(uint8_t* s){ s[0]=mui_get_cursor(); s[1]=mui_get_view_start(); s[2]=0; }")
+        x.append("#ifdef SIM_PORT_STM32")
+        # STM32 模板按 MUI_I2C_MOCK 编译：帧取自模拟屏的显存，同时覆盖局部刷新与 DMA 队列
+        x.append("#include \"i2c_mock.h\"")
+        x.append("const uint8_t* sim_frame(void){ while(gfx_flush_busy()) mui_dma_mock_step(); return mui_i2c_gddram; }")
+        x.append("#endif")
+    # 单步计数：fork 出的子进程在 SIGSTOP 处停住，父进程逐条单步直到子进程退出；减去空函数的固定开销
+    x.append("static void sim_nop(void){}")
+    x.append("static long sim_count_insns(void (*fn)(void)){")
+    x.append("  fflush(NULL);")
+    x.append("  pid_t pid=fork(); if(pid<0) return -1;")
+    x.append("  if(pid==0){ if(ptrace(PTRACE_TRACEME,0,0,0)<0) _exit(1); raise(SIGSTOP); fn(); _exit(0); }")
+    x.append("  int st; long n=0; waitpid(pid,&st,0);")
+    x.append("  if(!WIFSTOPPED(st)){ return -1; }")
+    x.append("  for(;;){ if(ptrace(PTRACE_SINGLESTEP,pid,0,0)<0){ kill(pid,SIGKILL); waitpid(pid,&st,0); return -1; } waitpid(pid,&st,0); if(WIFEXITED(st)||WIFSIGNALED(st)) break; n++; }")
+    x.append("  return n;")
+    x.append("}")
+    x.append("static long sim_insns_base=-1;")
+    x.append("static uint32_t sim_bench(int n){")
+    x.append("  struct timespec a,b; if(n<=0) return 0;")
+    x.append("  clock_gettime(CLOCK_MONOTONIC,&a); for(int i=0;i<n;i++) sim_draw(); clock_gettime(CLOCK_MONOTONIC,&b);")
+    x.append("  double ns=((double)(b.tv_sec-a.tv_sec)*1e9 + (double)(b.tv_nsec-a.tv_nsec))/n; return ns<1 ? 1u : (uint32_t)ns;")
+    x.append("}")
+    x.append("static void sim_put(FILE* f,uint32_t v,int n){ for(int i=0;i<n;i++) fputc((int)((v>>(8*i))&0xFF),f); }")
+    x.append("int main(int argc,char** argv){")
+    x.append("  if(argc<5){ fprintf(stderr,\"usage: %s frames.bin keys bench insns\\n\",argv[0]); return 2; }")
+    x.append("  FILE* out=fopen(argv[1],\"wb\"); if(!out){ perror(argv[1]); return 2; }")
+    x.append("  const char* keys=argv[2]; int bench=atoi(argv[3]); int insns=atoi(argv[4]);")
+    x.append("  fwrite(\"MUIS\",1,4,out); sim_put(out,SIM_W,2); sim_put(out,SIM_H,2);")
+    x.append("  if(insns){ sim_insns_base=sim_count_insns(sim_nop); if(sim_insns_base<0){ fprintf(stderr,\"ptrace 不可用，跳过指令计数\\n\"); insns=0; } }")
+    x.append("  sim_init();")
+    x.append("  int nkeys=(int)strlen(keys);")
+    x.append("  for(int step=0; step<=nkeys; step++){")
+    x.append("    uint8_t k = step ? (uint8_t)(keys[step-1]-'0') : 0;")
+    x.append("    if(step) sim_key(k);")
+    x.append("    int guard=0;")
+    x.append("    do {")
+    x.append("      long n = insns ? sim_count_insns(sim_draw) : -1; if(n>=0) n-=sim_insns_base;")
+    x.append("      uint32_t ns = sim_bench(bench);")
+    x.append("      sim_draw();")
+    x.append("      const uint8_t* fb=sim_frame();")
+    x.append("      uint8_t s[3]; sim_state(s);")
+    x.append("      int more = sim_tick();")
+    x.append("      sim_put(out,(uint32_t)step,2); fputc(k,out); fputc(more?0:1,out); fputc(s[0],out); fputc(s[1],out); fputc(s[2],out); fputc(0,out);")
+    x.append("      sim_put(out,(uint32_t)(int32_t)n,4); sim_put(out,ns,4);")
+    x.append("      fwrite(fb,1,SIM_FB_SIZE,out);")
+    x.append("      if(!more) break;")
+    x.append("    } while(++guard < 1000);")
+    if u8g2:
+        x.append("    sim_pending=1;")
+    x.append("  }")
+    x.append("  fclose(out);")
+    x.append("  return 0;")
+    x.append("}")
+    return x
+
+# ---------------- 编译与运行 ----------------
+class MuiSimulator:
+    """编译导出目录中的 MUI/ 并运行按键脚本。port 为 "sim"（内存帧缓）或 "stm32"（STM32 模板 + I2C/DMA 模拟）；
+    tft 为 TFT 页条导出，port 须为 "sim"，屏驱动换成 sim_tft_port_source"""
+    def __init__(self, mui_dir, work_dir, u8g2, width=128, height=64, port="sim", u8g2_src=None, cc="gcc", log=print, u8g2_buffer='f', tft=False):
+        self.mui_dir = os.path.abspath(mui_dir)
+        self.work_dir = os.path.abspath(work_dir)
+        self.u8g2 = u8g2
+        self.tft = tft
+        if tft and port != "sim":
+            raise RuntimeError("TFT 页条导出没有 STM32 总线模拟，请使用 --port sim")
+        self.port = port
+        self.u8g2_src = u8g2_src
+        self.u8g2_buffer = u8g2_buffer
+        self.cc = cc
+        self.log = log
+        if u8g2:
+            # U8G2 仿真固定用 ssd1306_128x64 缓冲
+            if (width, height) != (128, 64):
+                self.log(f"仿真屏幕按 128x64 运行（工程设置为 {width}x{height}）")
+            width, height = 128, 64
+        self.width = width
+        self.height = height
+        self.exe = os.path.join(self.work_dir, "mui_sim")
+
+    def _compile(self, args):
+        cmd = [self.cc] + args
+        r = subprocess.run(cmd, capture_output=True, text=True)
+        if r.returncode != 0:
+            raise RuntimeError("编译失败:\n" + " ".join(cmd) + "\n" + r.stderr)
+        if r.stderr.strip():
+            self.log(r.stderr.rstrip())
+
+    def _u8g2_lib(self):
+        """U8G2 源码只编译一次，按源码目录缓存为静态库"""
+        if not self.u8g2_src:
+            raise RuntimeError("U8G2 模式仿真需要 --u8g2-src 指向 U8G2 的 csrc 目录")
+        src = os.path.abspath(self.u8g2_src)
+        if os.path.isdir(os.path.join(src, "csrc")):
+            src = os.path.join(src, "csrc")
+        lib = os.path.join(self.work_dir, "libu8g2.a")
+        stamp = os.path.join(self.work_dir, "libu8g2.src")
+        if os.path.exists(lib) and os.path.exists(stamp) and open(stamp, encoding="utf-8").read() == src:
+            return src, lib
+        obj_dir = os.path.join(self.work_dir, "u8g2_obj")
+        os.makedirs(obj_dir, exist_ok=True)
+        objs = []
+        for name in sorted(os.listdir(src)):
+            if not name.endswith(".c"):
+                continue
+            obj = os.path.join(obj_dir, name[:-2] + ".o")
+            self._compile(["-O2", "-c", os.path.join(src, name), "-I", src, "-o", obj])
+            objs.append(obj)
+        if os.path.exists(lib):
+            os.remove(lib)
+        r = subprocess.run(["ar", "rcs", lib] + objs, capture_output=True, text=True)
+        if r.returncode != 0:
+            raise RuntimeError("生成 libu8g2.a 失败:\n" + r.stderr)
+        with open(stamp, "w", encoding="utf-8") as f:
+            f.write(src)
+        return src, lib
+
+    def build(self, cflags=("-O2",)):
+        os.makedirs(self.work_dir, exist_ok=True)
+        main_c = os.path.join(self.work_dir, "sim_main.c")
+        with open(main_c, "w", encoding="utf-8") as f:
+            f.write("\n".join(sim_main_source(self.width, self.height, self.u8g2, self.u8g2_buffer)))
+        m = self.mui_dir
+        args = list(cflags) + ["-Wall", "-DMUI_CB_PRINT(msg)=((void)(msg))"]
+        if self.u8g2:
+            src, lib = self._u8g2_lib()
+            sources = [main_c, os.path.join(m, "porting_interface.c")]
+            for sub in ("menu", "callbacks", "fonts"):
+                d = os.path.join(m, sub)
+                if os.path.isdir(d):
+                    sources += [os.path.join(d, n) for n in sorted(os.listdir(d)) if n.endswith(".c")]
+            args += ["-I", m, "-I", src] + sources + [lib]
+        else:
+            port = os.path.join(m, "port")
+            sources = [main_c, os.path.join(m, "menu", "menu_bare.c"), os.path.join(port, "gfx_text.c"), os.path.join(port, "input_port.c")]
+            inc = ["-I", os.path.join(m, "menu"), "-I", port]
+            if self.port == "stm32":
+                host = os.path.join(port, "host")
+                sources += [os.path.join(port, "stm32_std", "gfx_port_stm32_std.c"), os.path.join(host, "i2c_mock.c")]
+                inc += ["-I", host]
+                args += ["-DMUI_I2C_MOCK", "-DSIM_PORT_STM32"]
+            elif self.tft:
+                port_c = os.path.join(self.work_dir, "sim_tft_port.c")
+                with open(port_c, "w", encoding="utf-8") as f:
+                    f.write("\n".join(sim_tft_port_source()))
+                sources += [os.path.join(port, "gfx_tft.c"), port_c]
+            else:
+                port_c = os.path.join(self.work_dir, "sim_port.c")
+                with open(port_c, "w", encoding="utf-8") as f:
+                    f.write("\n".join(sim_port_source(self.width, self.height)))
+                sources.append(port_c)
+            args += inc + sources
+        self._compile(args + ["-o", self.exe])
+        return self.exe
+
+    def run(self, keys, bench=200, insns=True):
+        frames_bin = os.path.join(self.work_dir, "frames.bin")
+        script = "".join(str(k) for k in keys)
+        r = subprocess.run([self.exe, frames_bin, script, str(bench), "1" if insns else "0"], capture_output=True, text=True)
+        if r.stderr.strip():
+            self.log(r.stderr.rstrip())
+        if r.returncode != 0:
+            raise RuntimeError(f"仿真程序退出码 {r.returncode}")
+        return frames_bin
+
+# ---------------- 预览对照 ----------------
+def _ensure_qapp():
+    """预览控件需要 QApplication；须在导出（字形栅格化只建 QGuiApplication）之前创建"""
+    from PySide6.QtWidgets import QApplication
+    app = QApplication.instance()
+    if app is None:
+        if not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY"):
+            os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        app = QApplication([])
+    return app
+
+class PreviewRenderer:
+    """按帧记录中的光标驱动 MenuPreview，取静止帧并按最近颜色二值化（前景/选中条为亮）"""
+    def __init__(self, settings, root, w, h, u8g2):
+        from PySide6.QtGui import QColor
+        from mui_tools import MenuPreview
+        self.root = root
+        self.u8g2 = u8g2
+        self.w, self.h = w, h
+        self.preview = MenuPreview(fb_w=w, fb_h=h)
+        self.preview.set_screen_type(settings.get('screen_type', 'OLED'), settings.get('font_size', '中(12px)'),
+                                     settings.get('font_color', '#FFFFFF'), settings.get('bg_color', '#004080'),
+                                     settings.get('selected_bg', '#FFFFFF'), settings.get('selected_font', '#000000'),
+                                     font_family=settings.get('font_family'))
+        p = self.preview
+        nav_bg = QColor(20, 20, 20) if "OLED" in p.screen_type else QColor(50, 60, 80)
+        def rgb(c):
+            c = QColor(c)
+            return (c.red(), c.green(), c.blue())
+        # 选中条上的文字在预览中是暗色，按灭处理
+        self.palette = [(rgb(p.bg_color), 0), (rgb(nav_bg), 0), (rgb(p.fg_color), 1),
+                        (rgb(p.selected_bg_color), 1), (rgb(p.selected_fg_color), 0)]
+        self.stack = []
+        p.menu_root = root
+        p.cursor_index = 0
+
+    def key(self, k):
+        """在 Python 菜单树上重放导航，得到预览应显示的当前菜单（裸机导出只导航根菜单）"""
+        p = self.preview
+        if not self.u8g2:
+            return
+        visible = [c for c in p.menu_root.children if c.visible]
+        if k == 3 and 0 <= p.cursor_index < len(visible) and visible[p.cursor_index].children and not visible[p.cursor_index].is_exec:
+            self.stack.append(p.menu_root)
+            p.menu_root = visible[p.cursor_index]
+        elif k == 4 and self.stack:
+            p.menu_root = self.stack.pop()
+
+    def render(self, cursor):
+        p = self.preview
+        p.cursor_index = cursor
+        p.render_menu()
+        # 取动画结束后的静止画面
+        p.animating = False
+        p.content_animating = False
+        p.anim_prev_y = p.anim_target_y
+        if hasattr(p, 'anim_timer'):
+            p.anim_timer.stop()
+        p.render_menu()
+        p.animating = False
+        p.content_animating = False
+        img = p.framebuffer.toImage()
+        bits = []
+        for y in range(self.h):
+            row = []
+            for x in range(self.w):
+                c = img.pixel(x, y)
+                r, g, b = (c >> 16) & 0xFF, (c >> 8) & 0xFF, c & 0xFF
+                row.append(min(self.palette, key=lambda e: (e[0][0]-r)**2 + (e[0][1]-g)**2 + (e[0][2]-b)**2)[1])
+            bits.append(row)
+        return bits
+
+# ---------------- 报告与门限 ----------------
+def _fmt_insns(n):
+    return "n/a" if n < 0 else f"{n}"
+
+def compare_baseline(frames, base_frames, insns_tol):
+    """与基线逐帧比较：帧数、帧缓字节必须一致；指令数增长超过容差视为性能回退"""
+    errors = []
+    if len(frames) != len(base_frames):
+        errors.append(f"帧数 {len(frames)} 与基线 {len(base_frames)} 不同")
+    for i, (a, b) in enumerate(zip(frames, base_frames)):
+        if a.fb != b.fb:
+            errors.append(f"第 {i} 帧（步骤 {a.step}）画面与基线不同")
+        if a.insns >= 0 and b.insns > 0 and a.insns > b.insns * (1 + insns_tol / 100.0):
+            errors.append(f"第 {i} 帧（步骤 {a.step}）指令数 {a.insns} 超过基线 {b.insns} 的 {insns_tol}% 容差")
+    return errors
+
+def simulate(settings, root, out_dir, keys, u8g2_src=None, port="sim", bench=200, insns=True, preview=True,
+             baseline=None, update_baseline=False, max_diff=None, max_insns=None, min_fps=None, insns_tol=2.0,
+             log=print):
+    """导出 → 编译 → 运行按键脚本 → 输出 PNG 与报告；返回门限检查失败的条目列表"""
+    from mui_core import MuiExporter
+    u8g2 = not settings.get('export_no_u8g2', False)
+    try:
+        w = int(settings.get('screen_width', 128))
+        h = int(settings.get('screen_height', 64))
+    except (TypeError, ValueError):
+        w, h = 128, 64
+    if preview:
+        _ensure_qapp()
+    exporter = MuiExporter(settings, root, log=log)
+    mui_dir = exporter.export(out_dir)
+    sim_dir = os.path.join(out_dir, "sim")
+    if port == "stm32" and not u8g2:
+        # STM32 SSD1306 模板按控制器范围导出，仿真屏幕与之一致
+        w, h = exporter._oled_size()
+    sim = MuiSimulator(mui_dir, sim_dir, u8g2, w, h, port=port, u8g2_src=u8g2_src, log=log, u8g2_buffer=exporter._u8g2_buffer(),
+                       tft=exporter._tft())
+    sim.build()
+    frames_bin = sim.run(keys, bench=bench, insns=insns)
+    w, h, frames = read_frames(frames_bin)
+
+    frame_dir = os.path.join(sim_dir, "frames")
+    cmp_dir = os.path.join(sim_dir, "compare")
+    for d in (frame_dir, cmp_dir):
+        if os.path.isdir(d):
+            shutil.rmtree(d)
+        os.makedirs(d)
+    renderer = PreviewRenderer(settings, root, w, h, u8g2) if preview else None
+    diffs = {}
+    last_step = -1
+    for i, fr in enumerate(frames):
+        px = fr.pixels(w, h)
+        write_png(os.path.join(frame_dir, f"f{i:03d}_s{fr.step:02d}.png"), _scale([[ON if v else OFF for v in row] for row in px], 2))
+        if renderer and fr.step != last_step:
+            renderer.key(fr.key)
+            last_step = fr.step
+        if renderer and fr.settled:
+            ref = renderer.render(fr.cursor)
+            n = sum(1 for y in range(h) for x in range(w) if px[y][x] != ref[y][x])
+            diffs[fr.step] = n
+            gap = [(64, 64, 64)] * 2
+            rows = []
+            for y in range(h):
+                c = [ON if v else OFF for v in px[y]]
+                r = [ON if v else OFF for v in ref[y]]
+                d = [OFF if a == b else ((255, 64, 64) if a else (64, 160, 255)) for a, b in zip(px[y], ref[y])]
+                rows.append(c + gap + r + gap + d)
+            write_png(os.path.join(cmp_dir, f"s{fr.step:02d}.png"), _scale(rows, 2))
+
+    # 报告：每个步骤一行
+    total_px = w * h
+    log(f"仿真 {'U8G2' if u8g2 else ('裸机 TFT 页条' if sim.tft else '裸机')}（{port if not u8g2 else 'u8g2'}）{w}x{h}，{len(keys)} 个按键，{len(frames)} 帧")
+    log("步骤 按键 帧数 光标 视窗  与预览差异        主机帧率     指令数/帧(min/avg/max)")
+    names = {v: k for k, v in SIM_KEYS.items()}
+    fps_all = []
+    insn_all = []
+    for step in sorted(set(f.step for f in frames)):
+        fs = [f for f in frames if f.step == step]
+        last = fs[-1]
+        fps = [1e9 / f.draw_ns for f in fs if f.draw_ns]
+        ins = [f.insns for f in fs if f.insns >= 0]
+        fps_all += fps
+        insn_all += ins
+        d = diffs.get(step)
+        dtxt = "-" if d is None else f"{d} ({100.0 * d / total_px:.1f}%)"
+        ftxt = f"{min(fps):.0f}" if fps else "-"
+        itxt = f"{min(ins)}/{sum(ins)//len(ins)}/{max(ins)}" if ins else "n/a"
+        log(f"{step:>4} {names.get(fs[0].key, '?') if step else '-':>4} {len(fs):>4} {last.cursor:>4} {last.view_start:>4}  {dtxt:<17} {ftxt:>8} fps   {itxt}")
+    if fps_all:
+        log(f"主机帧率: 最低 {min(fps_all):.0f} fps，平均 {sum(fps_all)/len(fps_all):.0f} fps（每帧重复绘制 {bench} 次计时）")
+    if insn_all:
+        log(f"每帧指令数（主机 ptrace 单步计数，仅用于相对比较）: 最少 {min(insn_all)}，平均 {sum(insn_all)//len(insn_all)}，最多 {max(insn_all)}")
+    if diffs:
+        worst = max(diffs.values())
+        log(f"与 MenuPreview 静止帧的差异: 最多 {worst} 像素（{100.0 * worst / total_px:.1f}%），对比图见 {cmp_dir}")
+    log(f"帧 PNG: {frame_dir}")
+
+    # 门限
+    errors = []
+    if max_diff is not None and diffs:
+        for step, n in sorted(diffs.items()):
+            if 100.0 * n / total_px > max_diff:
+                errors.append(f"步骤 {step} 与预览差异 {100.0 * n / total_px:.1f}% 超过 {max_diff}%")
+    if max_insns is not None:
+        for i, f in enumerate(frames):
+            if f.insns > max_insns:
+                errors.append(f"第 {i} 帧指令数 {f.insns} 超过上限 {max_insns}")
+    if min_fps is not None and fps_all and min(fps_all) < min_fps:
+        errors.append(f"最低帧率 {min(fps_all):.0f} fps 低于 {min_fps} fps")
+    if baseline:
+        base_bin = os.path.join(baseline, "frames.bin")
+        if update_baseline:
+            os.makedirs(baseline, exist_ok=True)
+            shutil.copyfile(frames_bin, base_bin)
+            log(f"已更新基线: {base_bin}")
+        elif not os.path.exists(base_bin):
+            errors.append(f"基线不存在: {base_bin}（先用 --update-baseline 生成）")
+        else:
+            bw, bh, base_frames = read_frames(base_bin)
+            if (bw, bh) != (w, h):
+                errors.append(f"基线尺寸 {bw}x{bh} 与本次 {w}x{h} 不同")
+            else:
+                errors += compare_baseline(frames, base_frames, insns_tol)
+            if not errors:
+                log(f"与基线一致（{len(base_frames)} 帧）")
+    for e in errors:
+        log(f"失败: {e}")
+    return errors
+
+# ---------------- 混排文字基准（计数桩 u8g2） ----------------
+def _c_string(s):
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def text_stub_sources():
+    """计数用的 u8g2 桩（u8g2.h, u8g2_stub.c）：只实现混排与预排版绘制用到的接口。
+    每处理一个字形记一次解码（查找字形 + 读字形头，u8g2_DrawStr 与 u8g2_GetStrWidth 都要逐字做一遍）；
+    ASCII 按 u8g2_font_6x10_tf 等宽 6 像素，绘制内容折算为校验和，用于比较两种实现画出的结果"""
+    h = []
+    h.append("#ifndef U8G2_STUB_H")
+    h.append("#define U8G2_STUB_H")
+    h.append("#include <stdint.h>")
+    h.append("typedef uint16_t u8g2_uint_t;")
+    h.append("typedef struct { uint8_t max_char_height; } u8g2_t;")
+    h.append("extern uint32_t stub_decodes;  /* 字形解码次数 */")
+    h.append("extern uint32_t stub_calls;    /* 文字类 API 调用次数 */")
+    h.append("extern uint32_t stub_sum;      /* 绘制内容校验和 */")
+    h.append("u8g2_uint_t u8g2_DrawStr(u8g2_t *u8g2, u8g2_uint_t x, u8g2_uint_t y, const char *s);")
+    h.append("u8g2_uint_t u8g2_GetStrWidth(u8g2_t *u8g2, const char *s);")
+    h.append("u8g2_uint_t u8g2_DrawGlyph(u8g2_t *u8g2, u8g2_uint_t x, u8g2_uint_t y, uint16_t encoding);")
+    h.append("void u8g2_DrawPixel(u8g2_t *u8g2, u8g2_uint_t x, u8g2_uint_t y);")
+    h.append("int8_t u8g2_GetMaxCharHeight(u8g2_t *u8g2);")
+    h.append("#endif")
+    c = []
+    c.append("#include \"u8g2.h\"")
+    c.append("uint32_t stub_decodes, stub_calls, stub_sum;")
+    c.append("static void mix(uint32_t v){ stub_sum = (stub_sum ^ v) * 16777619u; }")
+    c.append("u8g2_uint_t u8g2_DrawGlyph(u8g2_t *u8g2, u8g2_uint_t x, u8g2_uint_t y, uint16_t encoding){")
+    c.append("  (void)u8g2; stub_decodes++; mix(((uint32_t)x<<20) ^ ((uint32_t)y<<12) ^ encoding); return 6;")
+    c.append("}")
+    c.append("u8g2_uint_t u8g2_DrawStr(u8g2_t *u8g2, u8g2_uint_t x, u8g2_uint_t y, const char *s){")
+    c.append("  u8g2_uint_t w=0; stub_calls++;")
+    c.append("  while(*s){ w += u8g2_DrawGlyph(u8g2, x+w, y, (uint8_t)*s++); }")
+    c.append("  return w;")
+    c.append("}")
+    c.append("u8g2_uint_t u8g2_GetStrWidth(u8g2_t *u8g2, const char *s){")
+    c.append("  u8g2_uint_t w=0; (void)u8g2; stub_calls++;")
+    c.append("  while(*s++){ stub_decodes++; w += 6; }")
+    c.append("  return w;")
+    c.append("}")
+    c.append("void u8g2_DrawPixel(u8g2_t *u8g2, u8g2_uint_t x, u8g2_uint_t y){ (void)u8g2; mix(0x80000000u ^ ((uint32_t)x<<16) ^ y); }")
+    c.append("int8_t u8g2_GetMaxCharHeight(u8g2_t *u8g2){ return (int8_t)u8g2->max_char_height; }")
+    return h, c
+
+def text_bench_source(labels, px, bench):
+    """逐个菜单文字：分别用导出的 draw_text_mixed 与逐字符参考实现（每个 ASCII 字符一次 DrawStr + 一次 GetStrWidth）
+    绘制一次统计解码/调用次数与校验和，再各重复 bench 次计时；每行输出一个文字的结果（制表符分隔）"""
+    x = []
+    x.append("#define _GNU_SOURCE")
+    x.append("#include <stdio.h>")
+    x.append("#include <time.h>")
+    x.append("#include \"cjk_font.h\"")
+    x.append("static const char *const labels[] = {")
+    for s in labels:
+        x.append(f"  {_c_string(s)},")
+    x.append("};")
+    x.append(f"#define N_LABELS {len(labels)}")
+    x.append(f"#define BENCH {bench}")
+    x.append("static uint32_t ref_utf8_next(const char *s, uint32_t *i){")
+    x.append("  uint8_t c=(uint8_t)s[*i];")
+    x.append("  if(c<0x80){ (*i)++; return c; }")
+    x.append("  if((c&0xE0)==0xC0){ uint32_t cp=(uint32_t)(c&0x1F)<<6; cp|=(uint8_t)s[*i+1]&0x3F; *i+=2; return cp; }")
+    x.append("  if((c&0xF0)==0xE0){ uint32_t cp=((uint32_t)(c&0x0F)<<12)|((uint32_t)((uint8_t)s[*i+1]&0x3F)<<6)|((uint8_t)s[*i+2]&0x3F); *i+=3; return cp; }")
+    x.append("  (*i)++; return 0x3F;")
+    x.append("}")
+    x.append("/* 改动前的逐字符实现，作对照 */")
+    x.append("static void ref_draw_text_mixed(u8g2_t *u8g2, const char *utf8, int x, int y){")
+    x.append("  uint32_t i=0; int cx=x;")
+    x.append("  while(utf8[i]){")
+    x.append("    uint32_t cp=ref_utf8_next(utf8,&i);")
+    x.append("    if(cp<128){ char buf[2]; buf[0]=(char)cp; buf[1]='\\0'; u8g2_DrawStr(u8g2, cx, y, buf); cx += u8g2_GetStrWidth(u8g2, buf); }")
+    x.append(f"    else {{ int idx=cjk_find_idx((uint16_t)cp); if(idx>=0){{ GlyphEntry e=cjk_table_{px}[idx]; draw_cjk_char(u8g2,(uint16_t)cp,cx,y - {px} + u8g2_GetMaxCharHeight(u8g2)); cx += e.advance; }} else {{ u8g2_DrawStr(u8g2, cx, y, \"?\"); cx += u8g2_GetStrWidth(u8g2, \"?\"); }} }}")
+    x.append("  }")
+    x.append("}")
+    x.append("typedef void (*draw_fn)(u8g2_t *, const char *, int, int);")
+    x.append("static void measure(draw_fn fn, u8g2_t *u8g2, const char *s, uint32_t out[3]){")
+    x.append("  stub_decodes=0; stub_calls=0; stub_sum=2166136261u;")
+    x.append("  fn(u8g2, s, 2, 12);")
+    x.append("  out[0]=stub_decodes; out[1]=stub_calls; out[2]=stub_sum;")
+    x.append("}")
+    x.append("static double time_ns(draw_fn fn, u8g2_t *u8g2, const char *s){")
+    x.append("  struct timespec t0, t1;")
+    x.append("  clock_gettime(CLOCK_MONOTONIC, &t0);")
+    x.append("  for(int k=0;k<BENCH;k++) fn(u8g2, s, 2, 12);")
+    x.append("  clock_gettime(CLOCK_MONOTONIC, &t1);")
+    x.append("  return ((t1.tv_sec-t0.tv_sec)*1e9 + (t1.tv_nsec-t0.tv_nsec)) / (BENCH>0 ? BENCH : 1);")
+    x.append("}")
+    x.append("int main(void){")
+    x.append("  u8g2_t u8g2 = { 10 };")
+    x.append("  for(int n=0;n<N_LABELS;n++){")
+    x.append("    uint32_t a[3], b[3];")
+    x.append("    measure(ref_draw_text_mixed, &u8g2, labels[n], a);")
+    x.append("    measure(draw_text_mixed, &u8g2, labels[n], b);")
+    x.append("    double ta = BENCH ? time_ns(ref_draw_text_mixed, &u8g2, labels[n]) : 0;")
+    x.append("    double tb = BENCH ? time_ns(draw_text_mixed, &u8g2, labels[n]) : 0;")
+    x.append("    printf(\"%d\\t%u\\t%u\\t%u\\t%u\\t%d\\t%.1f\\t%.1f\\n\", n, a[0], a[1], b[0], b[1], a[2]==b[2], ta, tb);")
+    x.append("  }")
+    x.append("  return 0;")
+    x.append("}")
+    return x
+
+def bench_text(settings, root, out_dir, bench=2000, cc="gcc", log=print):
+    """U8G2 混排文字基准：按工程导出（强制 U8G2 + 中文子集），用计数桩编译 cjk_font.c，
+    逐个菜单文字比较导出实现与逐字符参考实现的字形解码次数、API 调用次数与耗时；返回失败条目列表"""
+    from mui_core import MuiExporter
+    settings = dict(settings)
+    settings['export_no_u8g2'] = False
+    settings['emit_cjk_subset'] = True
+    settings['u8g2_font'] = False
+    exporter = MuiExporter(settings, root, log=lambda *a: None)
+    mui_dir = exporter.export(out_dir)
+    px = exporter._parse_font_px()
+    labels = exporter._labels()
+    work = os.path.join(out_dir, "bench_text")
+    os.makedirs(work, exist_ok=True)
+    stub_h, stub_c = text_stub_sources()
+    files = {"u8g2.h": stub_h, "u8g2_stub.c": stub_c, "bench_main.c": text_bench_source(labels, px, bench)}
+    for name, lines in files.items():
+        with open(os.path.join(work, name), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+    exe = os.path.join(work, "bench_text")
+    fonts = os.path.join(mui_dir, "fonts")
+    cmd = [cc, "-O2", "-Wall", "-I", work, "-I", fonts, os.path.join(work, "bench_main.c"), os.path.join(work, "u8g2_stub.c"),
+           os.path.join(fonts, "cjk_font.c"), "-o", exe]
+    r = subprocess.run(cmd, capture_output=True, text=True)
+    if r.returncode != 0:
+        raise RuntimeError("编译失败:\n" + " ".join(cmd) + "\n" + r.stderr)
+    r = subprocess.run([exe], capture_output=True, text=True)
+    if r.returncode != 0:
+        raise RuntimeError(f"基准程序退出码 {r.returncode}\n{r.stderr}")
+
+    errors = []
+    tot = [0, 0, 0, 0, 0.0, 0.0]
+    log(f"U8G2 混排文字（计数桩，{len(labels)} 个菜单文字，ASCII 按 6x10 等宽）：逐字符参考 → 导出实现")
+    log("   解码次数      API 调用      耗时 ns/次         文字")
+    for line in r.stdout.splitlines():
+        n, da, ca, db, cb, same, ta, tb = line.split("\t")
+        da, ca, db, cb, ta, tb = int(da), int(ca), int(db), int(cb), float(ta), float(tb)
+        for k, v in enumerate((da, ca, db, cb, ta, tb)):
+            tot[k] += v
+        ttxt = f"{ta:7.1f} → {tb:7.1f}" if bench else "-"
+        log(f"{da:5} → {db:<5}  {ca:5} → {cb:<5}  {ttxt:<18} {labels[int(n)]}")
+        if same != "1":
+            errors.append(f"文字 \"{labels[int(n)]}\" 两种实现绘制结果不同")
+    log(f"合计: 解码 {tot[0]} → {tot[2]}，API 调用 {tot[1]} → {tot[3]}" + (f"，耗时 {tot[4]:.0f} → {tot[5]:.0f} ns（每个文字重复 {bench} 次取平均）" if bench else ""))
+    for e in errors:
+        log(f"失败: {e}")
+    return errors
@@ -1,42 +1,16 @@
 # mcu_menu_designer_u8g2_final_complete.py
+import os
+import sys
+import json
 from PySide6.QtWidgets import (QApplication, QWidget, QTreeWidget, QTreeWidgetItem, QTextEdit,
     QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QLineEdit, QFileDialog, QGroupBox, QComboBox, QCheckBox, QScrollArea, QTabWidget)
+    QLineEdit, QFileDialog, QGroupBox, QComboBox, QCheckBox, QScrollArea, QTabWidget,
+    QDialog, QTableWidget, QTableWidgetItem, QHeaderView, QSpinBox)
 from PySide6.QtGui import (QTextOption, QPainter, QPixmap, QColor, QFont)
 from PySide6.QtCore import Qt, QTime, QTimer
 
-# ---------------- Menu 数据结构 ----------------
-class MenuItem:
-    _id_counter = 1
-    def __init__(self, name="菜单项", is_exec=False, visible=True, parent=None):
-        self.id = MenuItem._id_counter
-        MenuItem._id_counter += 1
-        self.name = name
-        self.is_exec = is_exec
-        self.visible = visible
-        self.parent = parent
-        self.children = []
-        self.cursor_pos = 0
-        self.callback_name = ""
-
-    def add_child(self, child):
-        child.parent = self
-        self.children.append(child)
-        
-        # 检查是否为最后一级菜单（叶子节点）
-        self.check_and_set_leaf_nodes_exec()
-    
-    def check_and_set_leaf_nodes_exec(self):
-        """自动检测并设置最后一级菜单为执行项"""
-        def set_leaf_nodes_exec_recursive(node):
-            if not node.children:  # 叶子节点
-                node.is_exec = True
-            else:
-                node.is_exec = False  # 非叶子节点为子菜单
-                for child in node.children:
-                    set_leaf_nodes_exec_recursive(child)
-        
-        set_leaf_nodes_exec_recursive(self)
+from mui_core import (MenuItem, MuiExporter, MuiBudgetError, DEFAULT_SETTINGS, SETTINGS_FILE,
+    serialize_menu, deserialize_menu, main as cli_main)
 
 # ---------------- 菜单预览控件 ----------------
 class MenuPreview(QWidget):
@@ -812,6 +786,43 @@ class MenuPreview(QWidget):
             font.setPointSize(8)
         return font
 
+# ---------------- 占用统计对话框 ----------------
+class FootprintDialog(QDialog):
+    """导出后的 Flash/RAM 占用表：分区小计与各数组明细；超出预算时顶部显示失败原因"""
+    def __init__(self, exporter, error="", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("导出失败：超出预算" if error else "导出完成：占用统计")
+        layout = QVBoxLayout(self)
+        if error:
+            msg = QLabel(error)
+            msg.setStyleSheet("color: #ff6b6b;")
+            msg.setWordWrap(True)
+            layout.addWidget(msg)
+        rows = exporter.footprint_rows(detail=True)
+        table = QTableWidget(len(rows), 3)
+        table.setHorizontalHeaderLabels(["分区 / 数组", "Flash (B)", "RAM (B)"])
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        for i, (name, flash, ram, bold) in enumerate(rows):
+            for j, v in enumerate((name if bold else "    " + name, flash, ram)):
+                item = QTableWidgetItem(str(v))
+                if j:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                if bold:
+                    font = item.font()
+                    font.setBold(True)
+                    item.setFont(font)
+                table.setItem(i, j, item)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(table)
+        note = QLabel("按 32 位 MCU 逐个数组计算（字符串字面量可能被链接器合并），不含函数代码，以链接器 map 为准")
+        note.setWordWrap(True)
+        layout.addWidget(note)
+        ok = QPushButton("关闭")
+        ok.clicked.connect(self.accept)
+        layout.addWidget(ok)
+        self.resize(520, 480)
+
 # ---------------- 主设计器 ----------------
 class MenuDesigner(QWidget):
     def __init__(self):
@@ -828,20 +839,7 @@ class MenuDesigner(QWidget):
         self.apply_modern_style()
         
         # 保存当前设置状态，避免切换时丢失
-        self.current_settings = {
-            'font_size': '中(12px)',
-            'color_mode': '单色',
-            'preview_size': '实际大小',
-            'bg_color': '#004080',
-            'font_color': '#FFFFFF',
-            'selected_bg': '#FFFFFF',
-            'selected_font': '#000000',
-            'font_family': 'Segoe UI',
-            'emit_font_array': True,
-            'emit_draw_skeleton': True,
-            'emit_cjk_subset': True,
-            'export_no_u8g2': False
-        }
+        self.current_settings = dict(DEFAULT_SETTINGS)
         
         # 加载保存的设置
         self.load_settings()
@@ -1445,16 +1443,86 @@ QPushButton:pressed {
         self.cb_emit_draw.setChecked(True)
         self.cb_emit_cjk = QCheckBox("包含中文子集字库（来自菜单使用的汉字）")
         self.cb_emit_cjk.setChecked(True)
+        self.cb_glyph_rle = QCheckBox("字库使用游程压缩（RLE，节省 Flash）")
+        self.cb_glyph_rle.setChecked(False)
+        self.cb_glyph_pages = QCheckBox("字库按 SSD1306 页排列（裸机，整字节绘制）")
+        self.cb_glyph_pages.setChecked(False)
+        self.cb_const_menu = QCheckBox("菜单表常量化（const 节点表，整棵树放 Flash）")
+        self.cb_const_menu.setChecked(False)
+        self.cb_preshape = QCheckBox("菜单文字预排版（导出时生成字形下标与坐标，绘制不再解码查表）")
+        self.cb_preshape.setChecked(False)
+        self.cb_u8g2_font = QCheckBox("中文子集导出为 U8G2 字体（含 ASCII，菜单用 u8g2_DrawUTF8 绘制）")
+        self.cb_u8g2_font.setChecked(False)
         self.cb_no_u8g2 = QCheckBox("导出不依赖U8G2的代码（含移植接口与示例）")
         self.cb_no_u8g2.setChecked(False)
         self.cb_emit_font.stateChanged.connect(lambda _: self.save_settings())
         self.cb_emit_draw.stateChanged.connect(lambda _: self.save_settings())
         self.cb_emit_cjk.stateChanged.connect(lambda _: self.save_settings())
+        self.cb_glyph_rle.stateChanged.connect(lambda _: self.save_settings())
+        self.cb_glyph_pages.stateChanged.connect(lambda _: self.save_settings())
+        self.cb_const_menu.stateChanged.connect(lambda _: self.save_settings())
+        self.cb_preshape.stateChanged.connect(lambda _: self.save_settings())
+        self.cb_u8g2_font.stateChanged.connect(lambda _: self.save_settings())
         self.cb_no_u8g2.stateChanged.connect(lambda _: self.save_settings())
         codegen_layout.addWidget(self.cb_emit_font)
         codegen_layout.addWidget(self.cb_emit_draw)
         codegen_layout.addWidget(self.cb_emit_cjk)
+        codegen_layout.addWidget(self.cb_glyph_rle)
+        codegen_layout.addWidget(self.cb_glyph_pages)
+        codegen_layout.addWidget(self.cb_const_menu)
+        codegen_layout.addWidget(self.cb_preshape)
+        codegen_layout.addWidget(self.cb_u8g2_font)
         codegen_layout.addWidget(self.cb_no_u8g2)
+        cjk_charset_layout = QHBoxLayout()
+        cjk_charset_layout.addWidget(QLabel("中文字库范围:"))
+        self.cjk_charset_combo = QComboBox()
+        self.cjk_charset_combo.addItem("菜单使用的汉字", "menu")
+        self.cjk_charset_combo.addItem("另加 GB2312 一级汉字（3755 字）", "gb2312_l1")
+        self.cjk_charset_combo.currentIndexChanged.connect(lambda _: self.save_settings())
+        cjk_charset_layout.addWidget(self.cjk_charset_combo)
+        cjk_charset_layout.addStretch()
+        codegen_layout.addLayout(cjk_charset_layout)
+        # U8G2 帧缓：全缓冲或 firstPage/nextPage 页缓冲（RAM 为屏宽 × 8/16 行）
+        u8g2_buffer_layout = QHBoxLayout()
+        u8g2_buffer_layout.addWidget(QLabel("U8G2 帧缓:"))
+        self.u8g2_buffer_combo = QComboBox()
+        self.u8g2_buffer_combo.addItem("全缓冲（_f 构造函数）", "f")
+        self.u8g2_buffer_combo.addItem("页缓冲 8 行（_1，firstPage/nextPage）", "1")
+        self.u8g2_buffer_combo.addItem("页缓冲 16 行（_2，firstPage/nextPage）", "2")
+        self.u8g2_buffer_combo.currentIndexChanged.connect(lambda _: self.save_settings())
+        u8g2_buffer_layout.addWidget(self.u8g2_buffer_combo)
+        u8g2_buffer_layout.addStretch()
+        codegen_layout.addLayout(u8g2_buffer_layout)
+        # TFT 页条：屏幕类型为 TFT 时裸机导出按页条绘制 RGB565（RAM 为屏宽 × 行数 × 2 字节 × 块数）
+        tft_strip_layout = QHBoxLayout()
+        tft_strip_layout.addWidget(QLabel("TFT 页条:"))
+        self.tft_strip_spin = QSpinBox()
+        self.tft_strip_spin.setRange(1, 65535)
+        self.tft_strip_spin.setSuffix(" 行")
+        self.tft_strip_spin.setValue(DEFAULT_SETTINGS['tft_strip_lines'])
+        self.tft_strip_spin.valueChanged.connect(lambda _: self.save_settings())
+        tft_strip_layout.addWidget(self.tft_strip_spin)
+        self.tft_bufs_combo = QComboBox()
+        self.tft_bufs_combo.addItem("双缓冲（2 块，绘制与发送交替）", 2)
+        self.tft_bufs_combo.addItem("单缓冲（1 块，RAM 减半）", 1)
+        self.tft_bufs_combo.currentIndexChanged.connect(lambda _: self.save_settings())
+        tft_strip_layout.addWidget(self.tft_bufs_combo)
+        tft_strip_layout.addStretch()
+        codegen_layout.addLayout(tft_strip_layout)
+        # 占用预算（字节，0 为不限）：导出时超出则失败并列出各数组占用
+        budget_layout = QHBoxLayout()
+        budget_layout.addWidget(QLabel("Flash 预算(B):"))
+        self.flash_budget_edit = QLineEdit("0")
+        self.flash_budget_edit.setMaximumWidth(80)
+        budget_layout.addWidget(self.flash_budget_edit)
+        budget_layout.addWidget(QLabel("RAM 预算(B):"))
+        self.ram_budget_edit = QLineEdit("0")
+        self.ram_budget_edit.setMaximumWidth(80)
+        budget_layout.addWidget(self.ram_budget_edit)
+        budget_layout.addStretch()
+        self.flash_budget_edit.editingFinished.connect(self.save_settings)
+        self.ram_budget_edit.editingFinished.connect(self.save_settings)
+        codegen_layout.addLayout(budget_layout)
 
         # 添加到配置选项卡（滚动容器）
         config_inner_layout.addWidget(basic_group)
@@ -1640,127 +1708,6 @@ QPushButton:pressed {
                     if child.title() == "颜色配置 (TFT模式)":
                         child.setVisible(show)
 
-    def _parse_font_px(self):
-        try:
-            txt = self.font_size_combo.currentText()
-            import re
-            m = re.search(r"\((\d+)px\)", txt)
-            return int(m.group(1)) if m else 12
-        except:
-            return 12
-
-    def _render_glyph_bitmap(self, ch, family, px):
-        from PySide6.QtGui import QImage, QFont
-        img = QImage(px*2, px*2, QImage.Format_ARGB32)
-        img.fill(Qt.black)
-        f = QFont(family, px)
-        p = QPainter(img)
-        p.setPen(Qt.white)
-        p.setFont(f)
-        p.drawText(0, px, ch)
-        p.end()
-        w = min(img.width(), px*2)
-        h = min(img.height(), px)
-        data = []
-        for y in range(h):
-            byte = 0
-            bit_count = 0
-            for x in range(w):
-                c = QColor(img.pixel(x,y))
-                v = 1 if (c.red()+c.green()+c.blue())//3 > 128 else 0
-                byte = (byte<<1) | v
-                bit_count += 1
-                if bit_count == 8:
-                    data.append(byte)
-                    byte = 0
-                    bit_count = 0
-            if bit_count:
-                data.append(byte << (8-bit_count))
-        return w, h, data
-
-    def _emit_ascii_font_array(self):
-        family = self.default_font_combo.currentText() if hasattr(self, 'default_font_combo') else 'Segoe UI'
-        px = self._parse_font_px()
-        lines = []
-        lines.append("")
-        lines.append(f"const uint8_t ascii_font_{px}[] = {{")
-        for code in range(32,127):
-            ch = chr(code)
-            w,h,buf = self._render_glyph_bitmap(ch, family, px)
-            lines.append(f"    /* {code} '{ch}' {w}x{h} */")
-            for i in range(0,len(buf),16):
-                part = ", ".join(f"0x{b:02X}" for b in buf[i:i+16])
-                lines.append(f"    {part},")
-        lines.append("};")
-        return lines
-
-    def _emit_ascii_font_full(self):
-        family = self.default_font_combo.currentText() if hasattr(self, 'default_font_combo') else 'Segoe UI'
-        px = self._parse_font_px()
-        bitmap = []
-        entries = []
-        offset = 0
-        for code in range(32,127):
-            ch = chr(code)
-            w,h,buf = self._render_glyph_bitmap(ch, family, px)
-            entries.append((code, offset, w, h))
-            bitmap.extend(buf)
-            offset += len(buf)
-        lines = []
-        lines.append("")
-        lines.append(f"const uint8_t ascii_bitmap_{px}[] = {{")
-        for i in range(0, len(bitmap), 16):
-            part = ", ".join(f"0x{b:02X}" for b in bitmap[i:i+16])
-            lines.append(f"    {part},")
-        lines.append("};")
-        lines.append("")
-        lines.append("typedef struct { uint16_t code; uint32_t offset; uint8_t w; uint8_t h; } AsciiGlyph;")
-        lines.append(f"const AsciiGlyph ascii_table_{px}[] = {{")
-        for code,off,w,h in entries:
-            lines.append(f"    {{0x{code:02X}, {off}, {w}, {h}}},")
-        lines.append("};")
-        return lines
-
-    def _collect_menu_chars(self):
-        s = set()
-        def walk(n):
-            s.update(list(n.name))
-            for c in n.children:
-                walk(c)
-        if self.menu_root:
-            walk(self.menu_root)
-        return s
-
-    def _emit_cjk_font_subset(self):
-        fam = self.default_font_combo.currentText() if hasattr(self, 'default_font_combo') else 'Microsoft YaHei'
-        px = self._parse_font_px()
-        used = sorted(self._collect_menu_chars())
-        cjk = [ch for ch in used if ('\u4e00' <= ch <= '\u9fff') or ('\u3000' <= ch <= '\u303f')]
-        if not cjk:
-            return []
-        bitmap = []
-        entries = []
-        offset = 0
-        for ch in cjk:
-            w,h,buf = self._render_glyph_bitmap(ch, fam, px)
-            entries.append((ord(ch), offset, w, h))
-            bitmap.extend(buf)
-            offset += len(buf)
-        lines = []
-        lines.append("")
-        lines.append(f"const uint8_t cjk_bitmap_{px}[] = {{")
-        for i in range(0, len(bitmap), 16):
-            part = ", ".join(f"0x{b:02X}" for b in bitmap[i:i+16])
-            lines.append(f"    {part},")
-        lines.append("};")
-        lines.append("")
-        lines.append("typedef struct { uint16_t code; uint32_t offset; uint8_t w; uint8_t h; } GlyphEntry;")
-        lines.append(f"const GlyphEntry cjk_table_{px}[] = {{")
-        for code,off,w,h in entries:
-            lines.append(f"    {{0x{code:04X}, {off}, {w}, {h}}},")
-        lines.append("};")
-        return lines
-        
     # ---------------- 颜色选择器方法 ----------------
     def filter_menu_tree(self):
         query = self.menu_search_edit.text().strip().lower() if hasattr(self, 'menu_search_edit') else ""
@@ -1901,12 +1848,11 @@ QPushButton:pressed {
             pass  # 忽略无效的HEX输入
     
     # ---------------- 设置保存和加载 ----------------
-    def save_settings(self):
-        """保存当前设置到文件"""
-        import json
-        import os
-        
-        settings = {
+    def collect_settings(self):
+        """收集界面上的当前设置（与设置文件格式一致）"""
+        # 以已加载的设置为底，保留界面上没有对应控件的选项（如字形缓存目录）
+        settings = dict(self.current_settings)
+        settings.update({
             'screen_type': self.screen_type_combo.currentText(),
             'font_size': self.font_size_combo.currentText(),
             'preview_size': self.preview_size_combo.currentText(),
@@ -1918,29 +1864,46 @@ QPushButton:pressed {
             'emit_font_array': self.cb_emit_font.isChecked() if hasattr(self, 'cb_emit_font') else True,
             'emit_draw_skeleton': self.cb_emit_draw.isChecked() if hasattr(self, 'cb_emit_draw') else True,
             'emit_cjk_subset': self.cb_emit_cjk.isChecked() if hasattr(self, 'cb_emit_cjk') else True,
+            'glyph_rle': self.cb_glyph_rle.isChecked() if hasattr(self, 'cb_glyph_rle') else False,
+            'glyph_page_major': self.cb_glyph_pages.isChecked() if hasattr(self, 'cb_glyph_pages') else False,
+            'menu_const_table': self.cb_const_menu.isChecked() if hasattr(self, 'cb_const_menu') else False,
+            'preshape_labels': self.cb_preshape.isChecked() if hasattr(self, 'cb_preshape') else False,
+            'u8g2_font': self.cb_u8g2_font.isChecked() if hasattr(self, 'cb_u8g2_font') else False,
             'export_no_u8g2': self.cb_no_u8g2.isChecked() if hasattr(self, 'cb_no_u8g2') else False,
+            'cjk_charset': self.cjk_charset_combo.currentData() if hasattr(self, 'cjk_charset_combo') else 'menu',
+            'u8g2_buffer': self.u8g2_buffer_combo.currentData() if hasattr(self, 'u8g2_buffer_combo') else 'f',
+            'tft_strip_lines': self.tft_strip_spin.value() if hasattr(self, 'tft_strip_spin') else 16,
+            'tft_strip_bufs': self.tft_bufs_combo.currentData() if hasattr(self, 'tft_bufs_combo') else 2,
+            'flash_budget': self._budget_value(self.flash_budget_edit) if hasattr(self, 'flash_budget_edit') else 0,
+            'ram_budget': self._budget_value(self.ram_budget_edit) if hasattr(self, 'ram_budget_edit') else 0,
             'screen_width': self.screen_width_edit.text(),
             'screen_height': self.screen_height_edit.text(),
             'menu_data': self.serialize_menu()  # 保存菜单数据
-        }
+        })
+        return settings
+
+    @staticmethod
+    def _budget_value(edit):
+        try:
+            return max(0, int(edit.text().strip() or 0))
+        except ValueError:
+            return 0
+
+    def save_settings(self):
+        """保存当前设置到文件"""
+        settings = self.collect_settings()
         
         try:
-            settings_file = os.path.join(os.path.dirname(__file__), 'menu_designer_settings.json')
-            with open(settings_file, 'w', encoding='utf-8') as f:
+            with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
                 json.dump(settings, f, indent=2, ensure_ascii=False)
         except Exception as e:
             print(f"保存设置失败: {e}")
     
     def load_settings(self):
         """从文件加载设置"""
-        import json
-        import os
-        
-        settings_file = os.path.join(os.path.dirname(__file__), 'menu_designer_settings.json')
-        
-        if os.path.exists(settings_file):
+        if os.path.exists(SETTINGS_FILE):
             try:
-                with open(settings_file, 'r', encoding='utf-8') as f:
+                with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
                     settings = json.load(f)
                     self.current_settings.update(settings)
             except Exception as e:
@@ -2015,10 +1978,59 @@ QPushButton:pressed {
                                 self.cb_emit_cjk.blockSignals(True)
                                 self.cb_emit_cjk.setChecked(bool(self.current_settings['emit_cjk_subset']))
                                 self.cb_emit_cjk.blockSignals(False)
+                            if hasattr(self, 'cb_glyph_rle') and 'glyph_rle' in self.current_settings:
+                                self.cb_glyph_rle.blockSignals(True)
+                                self.cb_glyph_rle.setChecked(bool(self.current_settings['glyph_rle']))
+                                self.cb_glyph_rle.blockSignals(False)
+                            if hasattr(self, 'cb_glyph_pages') and 'glyph_page_major' in self.current_settings:
+                                self.cb_glyph_pages.blockSignals(True)
+                                self.cb_glyph_pages.setChecked(bool(self.current_settings['glyph_page_major']))
+                                self.cb_glyph_pages.blockSignals(False)
+                            if hasattr(self, 'cb_const_menu') and 'menu_const_table' in self.current_settings:
+                                self.cb_const_menu.blockSignals(True)
+                                self.cb_const_menu.setChecked(bool(self.current_settings['menu_const_table']))
+                                self.cb_const_menu.blockSignals(False)
+                            if hasattr(self, 'cb_preshape') and 'preshape_labels' in self.current_settings:
+                                self.cb_preshape.blockSignals(True)
+                                self.cb_preshape.setChecked(bool(self.current_settings['preshape_labels']))
+                                self.cb_preshape.blockSignals(False)
+                            if hasattr(self, 'cb_u8g2_font') and 'u8g2_font' in self.current_settings:
+                                self.cb_u8g2_font.blockSignals(True)
+                                self.cb_u8g2_font.setChecked(bool(self.current_settings['u8g2_font']))
+                                self.cb_u8g2_font.blockSignals(False)
                             if hasattr(self, 'cb_no_u8g2') and 'export_no_u8g2' in self.current_settings:
                                 self.cb_no_u8g2.blockSignals(True)
                                 self.cb_no_u8g2.setChecked(bool(self.current_settings['export_no_u8g2']))
                                 self.cb_no_u8g2.blockSignals(False)
+                            if hasattr(self, 'cjk_charset_combo') and 'cjk_charset' in self.current_settings:
+                                i = self.cjk_charset_combo.findData(self.current_settings['cjk_charset'])
+                                if i >= 0:
+                                    self.cjk_charset_combo.blockSignals(True)
+                                    self.cjk_charset_combo.setCurrentIndex(i)
+                                    self.cjk_charset_combo.blockSignals(False)
+                            if hasattr(self, 'u8g2_buffer_combo') and 'u8g2_buffer' in self.current_settings:
+                                i = self.u8g2_buffer_combo.findData(self.current_settings['u8g2_buffer'])
+                                if i >= 0:
+                                    self.u8g2_buffer_combo.blockSignals(True)
+                                    self.u8g2_buffer_combo.setCurrentIndex(i)
+                                    self.u8g2_buffer_combo.blockSignals(False)
+                            if hasattr(self, 'tft_strip_spin') and 'tft_strip_lines' in self.current_settings:
+                                try:
+                                    lines = int(self.current_settings['tft_strip_lines'])
+                                except (TypeError, ValueError):
+                                    lines = DEFAULT_SETTINGS['tft_strip_lines']
+                                self.tft_strip_spin.blockSignals(True)
+                                self.tft_strip_spin.setValue(lines)
+                                self.tft_strip_spin.blockSignals(False)
+                            if hasattr(self, 'tft_bufs_combo') and 'tft_strip_bufs' in self.current_settings:
+                                i = self.tft_bufs_combo.findData(self.current_settings['tft_strip_bufs'])
+                                if i >= 0:
+                                    self.tft_bufs_combo.blockSignals(True)
+                                    self.tft_bufs_combo.setCurrentIndex(i)
+                                    self.tft_bufs_combo.blockSignals(False)
+                            if hasattr(self, 'flash_budget_edit'):
+                                self.flash_budget_edit.setText(str(self.current_settings.get('flash_budget', 0) or 0))
+                                self.ram_budget_edit.setText(str(self.current_settings.get('ram_budget', 0) or 0))
                             
                             # 应用屏幕尺寸
                             if hasattr(self, 'screen_width_edit') and 'screen_height_edit' and 'screen_width' in self.current_settings and 'screen_height' in self.current_settings:
@@ -2112,44 +2124,14 @@ QPushButton:pressed {
     
     def serialize_menu(self):
         """序列化菜单数据为字典格式"""
-        def serialize_node(node):
-            return {
-                'name': node.name,
-                'is_exec': node.is_exec,
-                'visible': node.visible,
-                'callback_name': node.callback_name,
-                'cursor_pos': node.cursor_pos,
-                'children': [serialize_node(child) for child in node.children]
-            }
-        
-        if self.menu_root:
-            return serialize_node(self.menu_root)
-        else:
-            return None
+        return serialize_menu(self.menu_root)
     
     def deserialize_menu(self, menu_data):
         """从字典数据反序列化菜单数据"""
-        def deserialize_node(data, parent=None):
-            node = MenuItem(
-                name=data.get('name', '菜单项'),
-                is_exec=data.get('is_exec', False),
-                visible=data.get('visible', True),
-                parent=parent
-            )
-            node.callback_name = data.get('callback_name', '')
-            node.cursor_pos = data.get('cursor_pos', 0)
-            
-            for child_data in data.get('children', []):
-                child_node = deserialize_node(child_data, node)
-                node.children.append(child_node)
-            
-            return node
-        
-        if menu_data:
-            self.menu_root = deserialize_node(menu_data)
-            return self.menu_root
-        else:
-            return None
+        root = deserialize_menu(menu_data)
+        if root:
+            self.menu_root = root
+        return root
         
     # ---------------- Tree操作 ----------------
     def refresh_tree(self):
@@ -3005,402 +2987,25 @@ QPushButton:pressed {
 
     # ---------------- 导出完整 C 代码 ----------------
     def export_code(self):
-        import os
         out_dir = QFileDialog.getExistingDirectory(self, "选择导出目录", "")
         if not out_dir:
             return
-        px = self._parse_font_px()
-        def _sanitize_ident(s, fallback):
-            import re
-            ident = re.sub(r"[^A-Za-z0-9_]", "_", s)
-            ident = re.sub(r"_+", "_", ident).strip("_")
-            if not ident or ident[0].isdigit():
-                ident = fallback
-            return ident
-        menu_h = []
-        menu_h.append("#ifndef MENU_H")
-        menu_h.append("#define MENU_H")
-        menu_h.append("#include <u8g2.h>")
-        menu_h.append("#include <stdint.h>")
-        menu_h.append("typedef struct MenuItem {")
-        menu_h.append("  const char *name;")
-        menu_h.append("  uint8_t is_exec;")
-        menu_h.append("  uint8_t child_count;")
-        menu_h.append("  struct MenuItem *children;")
-        menu_h.append("  void (*callback)(void);")
-        menu_h.append("} MenuItem;")
-        menu_h.append("extern MenuItem *menu_root;")
-        menu_h.append("void draw_menu(u8g2_t *u8g2, MenuItem *root, uint8_t cursor, uint8_t view_start);")
-        menu_h.append("#endif")
-
-        menu_c = []
-        menu_c.append("#include \"menu.h\"")
-        if hasattr(self, 'cb_emit_cjk') and self.cb_emit_cjk.isChecked():
-            menu_c.append("#include \"../fonts/cjk_font.h\"")
-        menu_c.append("#include \"../callbacks/callbacks.h\"")
-        menu_c.append("")
-        callbacks_h = []
-        callbacks_c = []
-        callbacks_h.append("#ifndef MENU_CALLBACKS_H")
-        callbacks_h.append("#define MENU_CALLBACKS_H")
-        callbacks_h.append("#include <stdint.h>")
-        callbacks_h.append("#ifndef MUI_CB_PRINT")
-        callbacks_h.append("#include <stdio.h>")
-        callbacks_h.append("#define MUI_CB_PRINT(msg) do { printf(\"%s\\n\", (msg)); } while(0)")
-        callbacks_h.append("#endif")
-        def gen_callbacks_to(node):
-            for c in node.children:
-                if c.is_exec:
-                    cb = c.callback_name if c.callback_name else f"menu_cb_{c.id}"
-                    cb = _sanitize_ident(cb, f"menu_cb_{c.id}")
-                    callbacks_h.append(f"void {cb}(void);")
-                    callbacks_c.append(f"void {cb}(void){{ MUI_CB_PRINT(\"{cb}\"); }}")
-                gen_callbacks_to(c)
-        gen_callbacks_to(self.menu_root)
-        callbacks_h.append("#endif")
-        def gen_nodes_to(lines, node):
-            for c in node.children:
-                if c.children:
-                    gen_nodes_to(lines, c)
-            arr_name = f"{_sanitize_ident(node.name, f'node_{node.id}')}_{node.id}_children"
-            lines.append(f"MenuItem {arr_name}[{len(node.children)}] = {{")
-            for c in node.children:
-                child_ptr = f"{_sanitize_ident(c.name, f'node_{c.id}')}_{c.id}_children" if c.children else "NULL"
-                cb_name = c.callback_name if c.callback_name else (f"menu_cb_{c.id}" if c.is_exec else "")
-                cb_ptr = _sanitize_ident(cb_name, f"menu_cb_{c.id}") if c.is_exec else "NULL"
-                lines.append(f'  {{"{c.name}", {1 if c.is_exec else 0}, {len(c.children)}, {child_ptr}, {cb_ptr}}},')
-            lines.append("};")
-            lines.append("")
-        gen_nodes_to(menu_c, self.menu_root)
-        root_arr_name = f"{_sanitize_ident(self.menu_root.name, f'node_{self.menu_root.id}')}_{self.menu_root.id}_children"
-        menu_c.append(f"MenuItem *menu_root = {root_arr_name};")
-        menu_c.append("")
-        menu_c.append("void draw_menu(u8g2_t *u8g2, MenuItem *root, uint8_t cursor, uint8_t view_start){")
-        menu_c.append("  u8g2_ClearBuffer(u8g2);")
-        menu_c.append("  u8g2_SetFont(u8g2, u8g2_font_6x10_tf);")
-        menu_c.append("  int base_y = 12; int line_h = 12;")
-        menu_c.append("  for (uint8_t i = 0; i < root->child_count; ++i) {")
-        menu_c.append("    const char *txt = root->children[i].name;")
-        menu_c.append("    int y = base_y + i * line_h;")
-        if hasattr(self, 'cb_emit_cjk') and self.cb_emit_cjk.isChecked():
-            menu_c.append("    draw_text_mixed(u8g2, txt, 2, y);")
-        else:
-            menu_c.append("    u8g2_DrawStr(u8g2, 2, y, txt);")
-        menu_c.append("  }")
-        menu_c.append("  u8g2_SendBuffer(u8g2);")
-        menu_c.append("}")
-
-        ascii_h = []
-        ascii_c = []
-        if hasattr(self, 'cb_emit_font') and self.cb_emit_font.isChecked():
-            ascii_h.append(f"#ifndef ASCII_FONT_PX_{px}_H")
-            ascii_h.append(f"#define ASCII_FONT_PX_{px}_H")
-            ascii_h.append("#include <stdint.h>")
-            ascii_h.append(f"extern const uint8_t ascii_font_{px}[];")
-            ascii_h.append("#endif")
-            ascii_c.append(f"#include \"ascii_font.h\"")
-            ascii_c.extend(self._emit_ascii_font_array())
-
-        cjk_h = []
-        cjk_c = []
-        if hasattr(self, 'cb_emit_cjk') and self.cb_emit_cjk.isChecked():
-            cjk_h.append(f"#ifndef CJK_FONT_PX_{px}_H")
-            cjk_h.append(f"#define CJK_FONT_PX_{px}_H")
-            cjk_h.append("#include <stdint.h>")
-            cjk_h.append("#include <u8g2.h>")
-            cjk_h.append("typedef struct { uint16_t code; uint32_t offset; uint8_t w; uint8_t h; } GlyphEntry;")
-            cjk_h.append(f"extern const uint8_t cjk_bitmap_{px}[];")
-            cjk_h.append(f"extern const GlyphEntry cjk_table_{px}[];")
-            cjk_h.append("int cjk_find_idx(uint16_t code);")
-            cjk_h.append("void draw_cjk_char(u8g2_t *u8g2, uint16_t code, int x, int y);")
-            cjk_h.append("void draw_text_mixed(u8g2_t *u8g2, const char *utf8, int x, int y);")
-            cjk_h.append("#endif")
-            cjk_c.append("#include \"cjk_font.h\"")
-            cjk_c.extend(self._emit_cjk_font_subset())
-            cjk_c.append("")
-            cjk_c.append("int cjk_find_idx(uint16_t code){")
-            cjk_c.append(f"  int l=0; int r=(int)(sizeof(cjk_table_{px})/sizeof(GlyphEntry))-1;")
-            cjk_c.append("  while(l<=r){")
-            cjk_c.append("    int m=(l+r)/2;")
-            cjk_c.append(f"    if(cjk_table_{px}[m].code==code) return m;")
-            cjk_c.append(f"    if(cjk_table_{px}[m].code<code) l=m+1; else r=m-1;")
-            cjk_c.append("  }")
-            cjk_c.append("  return -1;")
-            cjk_c.append("}")
-            cjk_c.append("")
-            cjk_c.append("void draw_cjk_char(u8g2_t *u8g2, uint16_t code, int x, int y){")
-            cjk_c.append("  int idx=cjk_find_idx(code);")
-            cjk_c.append("  if(idx<0) return;")
-            cjk_c.append(f"  GlyphEntry e=cjk_table_{px}[idx];")
-            cjk_c.append(f"  const uint8_t *p=cjk_bitmap_{px};")
-            cjk_c.append("  p+=e.offset;")
-            cjk_c.append("  uint8_t stride=(e.w+7)/8;")
-            cjk_c.append("  for(uint8_t yy=0; yy<e.h; ++yy){")
-            cjk_c.append("    const uint8_t *row=p+yy*stride;")
-            cjk_c.append("    uint8_t bit=0; uint8_t b=0;")
-            cjk_c.append("    for(uint8_t xx=0; xx<e.w; ++xx){")
-            cjk_c.append("      if(bit==0){ b=*row++; bit=8; }")
-            cjk_c.append("      uint8_t on=(b&0x80)?1:0; b<<=1; bit--;")
-            cjk_c.append("      if(on) u8g2_DrawPixel(u8g2, x+xx, y+yy);")
-            cjk_c.append("    }")
-            cjk_c.append("  }")
-            cjk_c.append("}")
-            cjk_c.append("")
-            cjk_c.append("static uint32_t utf8_next(const char *s, uint32_t *i){")
-            cjk_c.append("  uint8_t c=(uint8_t)s[*i];")
-            cjk_c.append("  if(c<0x80){ (*i)++; return c; }")
-            cjk_c.append("  if((c&0xE0)==0xC0){ uint32_t cp=(c&0x1F)<<6; c=(uint8_t)s[++(*i)]; cp|=(c&0x3F); (*i)++; return cp; }")
-            cjk_c.append("  if((c&0xF0)==0xE0){ uint8_t c1=(uint8_t)s[*i+1]; uint8_t c2=(uint8_t)s[*i+2]; uint32_t cp=((uint32_t)(c&0x0F)<<12)|((uint32_t)(c1&0x3F)<<6)|(uint32_t)(c2&0x3F); *i+=3; return cp; }")
-            cjk_c.append("  if((c&0xF8)==0xF0){ uint8_t c1=(uint8_t)s[*i+1]; uint8_t c2=(uint8_t)s[*i+2]; uint8_t c3=(uint8_t)s[*i+3]; uint32_t cp=((uint32_t)(c&0x07)<<18)|((uint32_t)(c1&0x3F)<<12)|((uint32_t)(c2&0x3F)<<6)|(uint32_t)(c3&0x3F); *i+=4; return cp; }")
-            cjk_c.append("  (*i)++; return 0x3F;")
-            cjk_c.append("}")
-            cjk_c.append("")
-            cjk_c.append("void draw_text_mixed(u8g2_t *u8g2, const char *utf8, int x, int y){")
-            cjk_c.append("  uint32_t i=0; int cx=x;")
-            cjk_c.append("  while(utf8[i]){")
-            cjk_c.append("    uint32_t cp=utf8_next(utf8,&i);")
-            cjk_c.append("    if(cp<128){ char buf[2]; buf[0]=(char)cp; buf[1]='\0'; u8g2_DrawStr(u8g2, cx, y, buf); cx += u8g2_GetStrWidth(u8g2, buf); }")
-            cjk_c.append(f"    else {{ int idx=cjk_find_idx((uint16_t)cp); if(idx>=0){{ GlyphEntry e=cjk_table_{px}[idx]; draw_cjk_char(u8g2,(uint16_t)cp,cx,y - e.h + u8g2_GetMaxCharHeight(u8g2)); cx += e.w + 1; }} else {{ u8g2_DrawStr(u8g2, cx, y, \"?\"); cx += u8g2_GetStrWidth(u8g2, \"?\"); }} }}")
-            cjk_c.append("  }")
-            cjk_c.append("}")
-
-        def _write(path, lines):
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            with open(path, "w", encoding="utf-8") as f:
-                f.write("\n".join(lines))
-
-        mui_dir = os.path.join(out_dir, "MUI")
-        no_u8g2 = hasattr(self, 'cb_no_u8g2') and self.cb_no_u8g2.isChecked()
-        if not no_u8g2:
-            menu_dir = os.path.join(mui_dir, "menu")
-            fonts_dir = os.path.join(mui_dir, "fonts")
-            callbacks_dir = os.path.join(mui_dir, "callbacks")
-            _write(os.path.join(menu_dir, "menu.h"), menu_h)
-            _write(os.path.join(menu_dir, "menu.c"), menu_c)
-            if ascii_h:
-                _write(os.path.join(fonts_dir, "ascii_font.h"), ascii_h)
-                _write(os.path.join(fonts_dir, "ascii_font.c"), ascii_c)
-            if cjk_h:
-                _write(os.path.join(fonts_dir, "cjk_font.h"), cjk_h)
-                _write(os.path.join(fonts_dir, "cjk_font.c"), cjk_c)
-            _write(os.path.join(callbacks_dir, "callbacks.h"), callbacks_h)
-            _write(os.path.join(callbacks_dir, "callbacks.c"), callbacks_c)
-            # 导出移植接口与聚合头
-            port_h = []
-            port_h.append("#ifndef PORTING_INTERFACE_H")
-            port_h.append("#define PORTING_INTERFACE_H")
-            port_h.append("#include <stdint.h>")
-            port_h.append("#include \"menu/menu.h\"")
-            port_h.append("typedef enum { MENU_KEY_NONE=0, MENU_KEY_UP, MENU_KEY_DOWN, MENU_KEY_ENTER, MENU_KEY_BACK } MenuKey;")
-            port_h.append("typedef struct { uint8_t cursor; uint8_t view_start; } MenuState;")
-            port_h.append("typedef struct { MenuItem* current; MenuItem* stack[16]; uint8_t depth; MenuState state; } MenuNav;")
-            port_h.append("void menu_nav_init(MenuNav* nav, MenuItem* root);")
-            port_h.append("void menu_nav_on_key(MenuNav* nav, MenuKey key, uint8_t visible_lines);")
-            port_h.append("#endif")
-            _write(os.path.join(mui_dir, "porting_interface.h"), port_h)
+        exporter = MuiExporter(self.collect_settings(), self.menu_root)
+        try:
+            exporter.export(out_dir)
+        except MuiBudgetError as e:
+            FootprintDialog(exporter, str(e).splitlines()[0], self).exec()
+            return
+        FootprintDialog(exporter, "", self).exec()
 
-            port_c = []
-            port_c.append("#include \"porting_interface.h\"")
-            port_c.append("")
-            port_c.append("void menu_nav_init(MenuNav* nav, MenuItem* root){")
-            port_c.append("  nav->current = root;")
-            port_c.append("  nav->depth = 0;")
-            port_c.append("  nav->state.cursor = 0;")
-            port_c.append("  nav->state.view_start = 0;")
-            port_c.append("}")
-            port_c.append("")
-            port_c.append("void menu_nav_on_key(MenuNav* nav, MenuKey key, uint8_t visible_lines){")
-            port_c.append("  if(!nav || !nav->current) return;")
-            port_c.append("  uint8_t count = nav->current->child_count;")
-            port_c.append("  switch(key){")
-            port_c.append("    case MENU_KEY_UP: if(nav->state.cursor > 0) nav->state.cursor--; break;")
-            port_c.append("    case MENU_KEY_DOWN: if(nav->state.cursor + 1 < count) nav->state.cursor++; break;")
-            port_c.append("    case MENU_KEY_ENTER: {")
-            port_c.append("      MenuItem* sel = &nav->current->children[nav->state.cursor];")
-            port_c.append("      if(sel->is_exec && sel->callback) sel->callback();")
-            port_c.append("      else if(sel->child_count){ if(nav->depth < 16) nav->stack[nav->depth++] = nav->current; nav->current = sel; nav->state.cursor = 0; nav->state.view_start = 0; }")
-            port_c.append("    } break;")
-            port_c.append("    case MENU_KEY_BACK: if(nav->depth > 0){ nav->current = nav->stack[--nav->depth]; nav->state.cursor = 0; nav->state.view_start = 0; } break;")
-            port_c.append("    default: break;")
-            port_c.append("  }")
-            port_c.append("  if(nav->state.cursor < nav->state.view_start) nav->state.view_start = nav->state.cursor;")
-            port_c.append("  if(visible_lines > 0 && nav->state.cursor >= nav->state.view_start + visible_lines) nav->state.view_start = nav->state.cursor - visible_lines + 1;")
-            port_c.append("}")
-            _write(os.path.join(mui_dir, "porting_interface.c"), port_c)
-            bundle_h = []
-            bundle_h.append("#ifndef U8G2_CODE_BUNDLE_H")
-            bundle_h.append("#define U8G2_CODE_BUNDLE_H")
-            bundle_h.append("#include \"menu/menu.h\"")
-            bundle_h.append("#include \"porting_interface.h\"")
-            bundle_h.append("#include \"callbacks/callbacks.h\"")
-            if cjk_h:
-                bundle_h.append("#include \"fonts/cjk_font.h\"")
-            bundle_h.append("#endif")
-            _write(os.path.join(mui_dir, "mui_bundle.h"), bundle_h)
-        else:
-            bare_dir = mui_dir
-            bare_menu_h = []
-            bare_menu_h.append("#ifndef MENU_BARE_H")
-            bare_menu_h.append("#define MENU_BARE_H")
-            bare_menu_h.append("#include <stdint.h>")
-            bare_menu_h.append("typedef struct MenuItem { const char *name; uint8_t is_exec; uint8_t child_count; struct MenuItem *children; void (*callback)(void); } MenuItem;")
-            bare_menu_h.append("extern MenuItem *menu_root;")
-            bare_menu_h.append("void draw_menu_bare(uint8_t cursor, uint8_t view_start);")
-            bare_menu_h.append("#ifndef MUI_CB_PRINT")
-            bare_menu_h.append("#include <stdio.h>")
-            bare_menu_h.append("#define MUI_CB_PRINT(msg) do { printf(\"%s\\n\", (msg)); } while(0)")
-            bare_menu_h.append("#endif")
-            bare_menu_h.append("#endif")
-            bare_menu_c = []
-            bare_menu_c.append("#include \"menu_bare.h\"")
-            bare_menu_c.append("#include \"gfx_port.h\"")
-            def gen_callbacks_to_bare(lines, node):
-                for c in node.children:
-                    if c.is_exec:
-                        cb = c.callback_name if c.callback_name else f"menu_cb_{c.id}"
-                        cb = _sanitize_ident(cb, f"menu_cb_{c.id}")
-                        lines.append(f"void {cb}(void){{ MUI_CB_PRINT(\"{cb}\"); }}")
-                    gen_callbacks_to_bare(lines, c)
-            gen_callbacks_to_bare(bare_menu_c, self.menu_root)
-            bare_menu_c.append("")
-            def gen_nodes_bare(lines, node):
-                for c in node.children:
-                    if c.children:
-                        gen_nodes_bare(lines, c)
-                arr_name = f"{_sanitize_ident(node.name, f'node_{node.id}')}_{node.id}_children"
-                lines.append(f"MenuItem {arr_name}[{len(node.children)}] = {{")
-                for c in node.children:
-                    child_ptr = f"{_sanitize_ident(c.name, f'node_{c.id}')}_{c.id}_children" if c.children else "NULL"
-                    cb_name = c.callback_name if c.callback_name else (f"menu_cb_{c.id}" if c.is_exec else "")
-                    cb_ptr = _sanitize_ident(cb_name, f"menu_cb_{c.id}") if c.is_exec else "NULL"
-                    lines.append(f'  {{"{c.name}", {1 if c.is_exec else 0}, {len(c.children)}, {child_ptr}, {cb_ptr}}},')
-                lines.append("};")
-                lines.append("")
-            gen_nodes_bare(bare_menu_c, self.menu_root)
-            root_arr_name_bare = f"{_sanitize_ident(self.menu_root.name, f'node_{self.menu_root.id}')}_{self.menu_root.id}_children"
-            bare_menu_c.append(f"MenuItem *menu_root = {root_arr_name_bare};")
-            bare_menu_c.append("")
-            bare_menu_c.append("static uint8_t g_cursor=0; static uint8_t g_view=0; static uint8_t g_last_view=0;")
-            bare_menu_c.append("static int g_from=0; static int g_to=0; static float g_prog=1.0f; static int g_anim_ms=140;")
-            bare_menu_c.append("static float _ease(float t){ return t*t*(3.0f - 2.0f*t); }")
-            bare_menu_c.append("void mui_anim_tick(int dt_ms){ if(g_prog < 1.0f){ g_prog += (float)dt_ms / (float)g_anim_ms; if(g_prog > 1.0f) g_prog = 1.0f; } }")
-            bare_menu_c.append("void mui_nav_init(void){ g_cursor=0; g_view=0; g_last_view=0; g_from=0; g_to=0; g_prog=1.0f; }")
-            bare_menu_c.append("void mui_nav_on_key(uint8_t key){ uint8_t count=menu_root->child_count; if(key==1){ if(g_cursor>0) g_cursor--; } else if(key==2){ if(g_cursor+1<count) g_cursor++; } else if(key==3){ MenuItem* sel=&menu_root->children[g_cursor]; if(sel->is_exec && sel->callback) sel->callback(); } else if(key==4){ } if(g_cursor < g_view) g_view = g_cursor; int scr_h=gfx_height(); int line_h=12; int bottom=12; int vis = (scr_h-bottom)/line_h; if(vis>0 && g_cursor >= g_view + vis) g_view = g_cursor - vis + 1; int delta = (int)g_view - (int)g_last_view; if(delta != 0){ int step = line_h * (delta>0 ? 1 : -1) * ( (delta>0?delta:-delta) > 3 ? 3 : (delta>0?delta:-delta) ); g_from = step; g_to = 0; g_prog = 0.0f; g_last_view = g_view; } }")
-            bare_menu_c.append("uint8_t mui_get_cursor(void){ return g_cursor; }")
-            bare_menu_c.append("uint8_t mui_get_view_start(void){ return g_view; }")
-            bare_menu_c.append("void draw_menu_bare(uint8_t cursor, uint8_t view_start){")
-            bare_menu_c.append("  int base_y=12; int line_h=12; int margin_x=2; int bottom_h=12;")
-            bare_menu_c.append("  int scr_w=gfx_width(); int scr_h=gfx_height(); int eff_h = scr_h - bottom_h; int vis = eff_h / line_h; if(vis<1) vis=1;")
-            bare_menu_c.append("  gfx_clear();")
-            bare_menu_c.append("  int total = menu_root->child_count;")
-            bare_menu_c.append("  int off = (int)( (float)g_from + ((float)g_to - (float)g_from) * _ease(g_prog) );")
-            bare_menu_c.append("  for(int i=0;i<vis;i++){ int idx = view_start + i; if(idx>=total) break; int y = base_y + i*line_h + off; if(idx==cursor){ gfx_fill_rect(0, y-(line_h-1), scr_w, line_h); } const char* txt = menu_root->children[idx].name; gfx_draw_text_mixed(margin_x, y, txt); }")
-            bare_menu_c.append("  if(total>vis){ int track_x = scr_w-3; int track_y = base_y- (line_h-1); int track_h = vis*line_h; gfx_fill_rect(track_x, track_y, 1, track_h); int thumb_h = track_h * vis / total; if(thumb_h<4) thumb_h=4; int thumb_y = track_y + (track_h - thumb_h) * view_start / (total - vis); gfx_fill_rect(track_x+1, thumb_y, 2, thumb_h); }")
-            bare_menu_c.append("  int nav_y = eff_h + (bottom_h/2); gfx_draw_text_mixed(2, nav_y, \"< 上/下 选择  确认 >\");")
-            bare_menu_c.append("  gfx_send();")
-            bare_menu_c.append("}")
-            gfx_h = []
-            gfx_h.append("#ifndef GFX_PORT_H")
-            gfx_h.append("#define GFX_PORT_H")
-            gfx_h.append("#include <stdint.h>")
-            gfx_h.append("void gfx_init(void);")
-            gfx_h.append("void gfx_clear(void);")
-            gfx_h.append("void gfx_send(void);")
-            gfx_h.append("void gfx_draw_pixel(int x,int y);")
-            gfx_h.append("void gfx_fill_rect(int x,int y,int w,int h);")
-            gfx_h.append("void gfx_draw_bitmap_1bpp(int x,int y,int w,int h,const uint8_t* data);")
-            gfx_h.append("void gfx_draw_text_mixed(int x,int y,const char* utf8);")
-            gfx_h.append("int gfx_width(void);")
-            gfx_h.append("int gfx_height(void);")
-            gfx_h.append("#endif")
-            gfx_c = []
-            gfx_c.append("#include \"gfx_port.h\"")
-            if hasattr(self, 'cb_emit_font') and self.cb_emit_font.isChecked():
-                gfx_c.extend(self._emit_ascii_font_full())
-            if hasattr(self, 'cb_emit_cjk') and self.cb_emit_cjk.isChecked():
-                gfx_c.extend(self._emit_cjk_font_subset())
-            gfx_c.append("")
-            gfx_c.append("int gfx_width(void){ return 128; }");
-            gfx_c.append("int gfx_height(void){ return 64; }");
-            gfx_c.append("void gfx_init(void){}");
-            gfx_c.append("void gfx_clear(void){}");
-            gfx_c.append("void gfx_send(void){}");
-            gfx_c.append("void gfx_draw_pixel(int x,int y){}");
-            gfx_c.append("void gfx_fill_rect(int x,int y,int w,int h){ for(int yy=0; yy<h; ++yy){ for(int xx=0; xx<w; ++xx){ gfx_draw_pixel(x+xx,y+yy); } } }");
-            gfx_c.append("void gfx_draw_bitmap_1bpp(int x,int y,int w,int h,const uint8_t* data){ int stride=(w+7)/8; for(int yy=0; yy<h; ++yy){ const uint8_t* row=data+yy*stride; int bit=0; uint8_t b=0; for(int xx=0; xx<w; ++xx){ if(bit==0){ b=*row++; bit=8; } int on=(b&0x80)?1:0; b<<=1; bit--; if(on) gfx_draw_pixel(x+xx,y+yy); } } }");
-            gfx_c.append("static int find_ascii(uint16_t code){ extern const AsciiGlyph ascii_table_" + str(px) + "[]; int n=sizeof(ascii_table_" + str(px) + ")/sizeof(AsciiGlyph); int l=0,r=n-1; while(l<=r){ int m=(l+r)/2; if(ascii_table_" + str(px) + "[m].code==code) return m; if(ascii_table_" + str(px) + "[m].code<code) l=m+1; else r=m-1;} return -1; }")
-            gfx_c.append("void gfx_draw_text_mixed(int x,int y,const char* utf8){")
-            gfx_c.append("  uint32_t i=0; int cx=x; while(utf8[i]){ uint8_t c=(uint8_t)utf8[i]; if(c<128){ int idx=find_ascii(c); if(idx>=0){ extern const uint8_t ascii_bitmap_" + str(px) + "[]; extern const AsciiGlyph ascii_table_" + str(px) + "[]; const AsciiGlyph a=ascii_table_" + str(px) + "[idx]; gfx_draw_bitmap_1bpp(cx, y-a.h+12, a.w, a.h, ascii_bitmap_" + str(px) + "+ a.offset); cx += a.w + 1; } i++; } else {")
-            gfx_c.append("    uint8_t c1=(uint8_t)utf8[i+1]; uint8_t c2=(uint8_t)utf8[i+2]; uint16_t cp=((c & 0x0F)<<12) | ((c1 & 0x3F)<<6) | (c2 & 0x3F); i+=3; ")
-            gfx_c.append("    int idx=cjk_find_idx(cp); if(idx>=0){ extern const uint8_t cjk_bitmap_" + str(px) + "[]; extern const GlyphEntry cjk_table_" + str(px) + "[]; GlyphEntry e=cjk_table_" + str(px) + "[idx]; gfx_draw_bitmap_1bpp(cx, y-e.h+12, e.w, e.h, cjk_bitmap_" + str(px) + "+ e.offset); cx += e.w + 1; } else { cx += 6; } }")
-            gfx_c.append("  }")
-            gfx_c.append("}")
-            example_c = []
-            example_c.append("#include \"menu_bare.h\"")
-            example_c.append("#include \"gfx_port.h\"")
-            example_c.append("#include \"input_port.h\"")
-            example_c.append("#include <stdint.h>")
-            example_c.append("int main(void){ gfx_init(); mui_nav_init(); for(;;){ MenuKey k=input_port_read(); mui_nav_on_key((uint8_t)k); mui_anim_tick(16); draw_menu_bare(mui_get_cursor(), mui_get_view_start()); } return 0; }")
-            os.makedirs(os.path.join(bare_dir, "menu"), exist_ok=True)
-            os.makedirs(os.path.join(bare_dir, "port"), exist_ok=True)
-            os.makedirs(os.path.join(bare_dir, "examples"), exist_ok=True)
-            _write(os.path.join(bare_dir, "menu", "menu_bare.h"), bare_menu_h)
-            _write(os.path.join(bare_dir, "menu", "menu_bare.c"), bare_menu_c)
-            _write(os.path.join(bare_dir, "port", "gfx_port.h"), gfx_h)
-            _write(os.path.join(bare_dir, "port", "gfx_port.c"), gfx_c)
-            # 输入接口文件
-            input_h = []
-            input_h.append("#ifndef INPUT_PORT_H")
-            input_h.append("#define INPUT_PORT_H")
-            input_h.append("#include <stdint.h>")
-            input_h.append("typedef enum { MENU_KEY_NONE=0, MENU_KEY_UP, MENU_KEY_DOWN, MENU_KEY_ENTER, MENU_KEY_BACK } MenuKey;")
-            input_h.append("MenuKey input_port_read(void);")
-            input_h.append("#endif")
-            input_c = []
-            input_c.append("#include \"input_port.h\"")
-            input_c.append("MenuKey input_port_read(void){ return MENU_KEY_NONE; }")
-            _write(os.path.join(bare_dir, "port", "input_port.h"), input_h)
-            _write(os.path.join(bare_dir, "port", "input_port.c"), input_c)
-            _write(os.path.join(bare_dir, "examples", "example_bare.c"), example_c)
-            # STM32 StdPeriph implementation templates
-            stm_dir = os.path.join(bare_dir, "port", "stm32_std")
-            os.makedirs(stm_dir, exist_ok=True)
-            stm_gfx = []
-            stm_gfx.append("#include \"stm32f10x.h\"")
-            stm_gfx.append("#include \"stm32f10x_rcc.h\"")
-            stm_gfx.append("#include \"stm32f10x_gpio.h\"")
-            stm_gfx.append("#include \"stm32f10x_i2c.h\"")
-            stm_gfx.append("#include \"gfx_port.h\"")
-            stm_gfx.append("#define SSD1306_ADDR 0x3C")
-            stm_gfx.append("#define GFX_W 128")
-            stm_gfx.append("#define GFX_H 64")
-            stm_gfx.append("static uint8_t fb[GFX_W*GFX_H/8];")
-            stm_gfx.append("static void clock_init(void){ RCC_APB2PeriphClockCmd(RCC_APB2Periph_GPIOB|RCC_APB2Periph_GPIOA, ENABLE); RCC_APB1PeriphClockCmd(RCC_APB1Periph_I2C1, ENABLE); }")
-            stm_gfx.append("static void gpio_init(void){ GPIO_InitTypeDef gi; gi.GPIO_Pin=GPIO_Pin_6|GPIO_Pin_7; gi.GPIO_Speed=GPIO_Speed_50MHz; gi.GPIO_Mode=GPIO_Mode_AF_OD; GPIO_Init(GPIOB,&gi); gi.GPIO_Pin=GPIO_Pin_0|GPIO_Pin_1|GPIO_Pin_2|GPIO_Pin_3; gi.GPIO_Speed=GPIO_Speed_50MHz; gi.GPIO_Mode=GPIO_Mode_IPU; GPIO_Init(GPIOA,&gi); }")
-            stm_gfx.append("static void i2c1_init(void){ I2C_InitTypeDef ii; I2C_DeInit(I2C1); ii.I2C_ClockSpeed=400000; ii.I2C_Mode=I2C_Mode_I2C; ii.I2C_DutyCycle=I2C_DutyCycle_2; ii.I2C_OwnAddress1=0x00; ii.I2C_Ack=I2C_Ack_Disable; ii.I2C_AcknowledgedAddress=I2C_AcknowledgedAddress_7bit; I2C_Init(I2C1,&ii); I2C_Cmd(I2C1,ENABLE); }")
-            stm_gfx.append("static void i2c1_write(uint8_t control,const uint8_t* data,int len){ while(I2C_GetFlagStatus(I2C1,I2C_FLAG_BUSY)); I2C_GenerateSTART(I2C1,ENABLE); while(!I2C_CheckEvent(I2C1,I2C_EVENT_MASTER_MODE_SELECT)); I2C_Send7bitAddress(I2C1,SSD1306_ADDR<<1,I2C_Direction_Transmitter); while(!I2C_CheckEvent(I2C1,I2C_EVENT_MASTER_TRANSMITTER_MODE_SELECTED)); I2C_SendData(I2C1,control); while(!I2C_CheckEvent(I2C1,I2C_EVENT_MASTER_BYTE_TRANSMITTED)); for(int i=0;i<len;i++){ I2C_SendData(I2C1,data[i]); while(!I2C_CheckEvent(I2C1,I2C_EVENT_MASTER_BYTE_TRANSMITTED)); } I2C_GenerateSTOP(I2C1,ENABLE); }")
-            stm_gfx.append("static void ssd1306_cmd(uint8_t c){ i2c1_write(0x00,&c,1); }")
-            stm_gfx.append("static void ssd1306_data(const uint8_t* d,int n){ i2c1_write(0x40,d,n); }")
-            stm_gfx.append("void gfx_init(void){ clock_init(); gpio_init(); i2c1_init(); ssd1306_cmd(0xAE); ssd1306_cmd(0x20); ssd1306_cmd(0x00); ssd1306_cmd(0xB0); ssd1306_cmd(0xC8); ssd1306_cmd(0x00); ssd1306_cmd(0x10); ssd1306_cmd(0x40); ssd1306_cmd(0x81); ssd1306_cmd(0x7F); ssd1306_cmd(0xA1); ssd1306_cmd(0xA6); ssd1306_cmd(0xA8); ssd1306_cmd(0x3F); ssd1306_cmd(0xA4); ssd1306_cmd(0xD3); ssd1306_cmd(0x00); ssd1306_cmd(0xD5); ssd1306_cmd(0x80); ssd1306_cmd(0xD9); ssd1306_cmd(0xF1); ssd1306_cmd(0xDA); ssd1306_cmd(0x12); ssd1306_cmd(0xDB); ssd1306_cmd(0x40); ssd1306_cmd(0x8D); ssd1306_cmd(0x14); ssd1306_cmd(0xAF); }")
-            stm_gfx.append("void gfx_clear(void){ for(int i=0;i<sizeof(fb);i++) fb[i]=0x00; }")
-            stm_gfx.append("void gfx_send(void){ for(uint8_t page=0; page<(GFX_H/8); page++){ ssd1306_cmd(0xB0+page); ssd1306_cmd(0x00); ssd1306_cmd(0x10); ssd1306_data(&fb[page*GFX_W], GFX_W); } }")
-            stm_gfx.append("void gfx_draw_pixel(int x,int y){ if(x<0||x>=GFX_W||y<0||y>=GFX_H) return; fb[(y>>3)*GFX_W + x] |= (1<<(y&7)); }")
-            stm_gfx.append("void gfx_fill_rect(int x,int y,int w,int h){ for(int yy=0; yy<h; ++yy){ for(int xx=0; xx<w; ++xx){ gfx_draw_pixel(x+xx,y+yy); } } }")
-            stm_gfx.append("void gfx_draw_bitmap_1bpp(int x,int y,int w,int h,const uint8_t* data){ int stride=(w+7)/8; for(int yy=0; yy<h; ++yy){ const uint8_t* row=data+yy*stride; int bit=0; uint8_t b=0; for(int xx=0; xx<w; ++xx){ if(bit==0){ b=*row++; bit=8; } if(b&0x80) gfx_draw_pixel(x+xx,y+yy); b<<=1; bit--; } } }")
-            _write(os.path.join(stm_dir, "gfx_port_stm32_std.c"), stm_gfx)
-            stm_input = []
-            stm_input.append("#include \"stm32f10x.h\"")
-            stm_input.append("#include \"stm32f10x_rcc.h\"")
-            stm_input.append("#include \"stm32f10x_gpio.h\"")
-            stm_input.append("#include \"input_port.h\"")
-            stm_input.append("static void input_init(void){ RCC_APB2PeriphClockCmd(RCC_APB2Periph_GPIOA, ENABLE); GPIO_InitTypeDef gi; gi.GPIO_Pin=GPIO_Pin_0|GPIO_Pin_1|GPIO_Pin_2|GPIO_Pin_3; gi.GPIO_Speed=GPIO_Speed_50MHz; gi.GPIO_Mode=GPIO_Mode_IPU; GPIO_Init(GPIOA,&gi); }")
-            stm_input.append("MenuKey input_port_read(void){ static int inited=0; if(!inited){ input_init(); inited=1; } if(GPIO_ReadInputDataBit(GPIOA,GPIO_Pin_0)==Bit_RESET) return MENU_KEY_UP; if(GPIO_ReadInputDataBit(GPIOA,GPIO_Pin_1)==Bit_RESET) return MENU_KEY_DOWN; if(GPIO_ReadInputDataBit(GPIOA,GPIO_Pin_2)==Bit_RESET) return MENU_KEY_ENTER; if(GPIO_ReadInputDataBit(GPIOA,GPIO_Pin_3)==Bit_RESET) return MENU_KEY_BACK; return MENU_KEY_NONE; }")
-            _write(os.path.join(stm_dir, "input_port_stm32_std.c"), stm_input)
-        print(f"MUI 代码已导出到目录: {mui_dir}")
 
 # ---------------- Main ----------------
-if __name__=="__main__":
+def run_gui():
     app = QApplication([])
     w = MenuDesigner()
     w.show()
-    app.exec()
+    return app.exec()
+
+if __name__=="__main__":
+    # 带子命令（如 export）时走无界面命令行，否则启动设计器
+    sys.exit(cli_main(sys.argv[1:]) if len(sys.argv) > 1 else run_gui())
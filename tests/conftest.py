@@ -0,0 +1,7 @@
+# 测试直接导入仓库根目录下的模块（mui_core / mui_glyphs / mui_sim / mui_tools）
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,87 @@
+# 裸机导出的滚动动画：经 mui_set_tick_source / mui_anim_update 走真实时基，与预览的缓动逐帧对照
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from mui_core import MenuItem, MuiExporter, DEFAULT_SETTINGS
+
+ANIM_MS = MuiExporter.ANIM_MS
+
+# 每次滚动后依次推进的毫秒数：含常规 16 ms、迟到的帧（跳帧）、0 ms 与超过整段动画的间隔（夹紧）
+DOWN_TICKS = [16, 16, 50, 16, 0, 16, 16, 16, 16]
+UP_TICKS = [33, 500, 16]
+
+# 假 gfx：只记录每帧第一行菜单文字的 y（base_y + off），其余图元忽略
+HARNESS = r"""
+#include <stdio.h>
+#include <stdint.h>
+#include "menu_bare.h"
+#include "gfx_port.h"
+static uint32_t g_now = 1000;
+static int g_row_y;
+static uint32_t fake_millis(void){ return g_now; }
+void gfx_clear(void){ g_row_y = -10000; }
+void gfx_send_async(void){}
+void gfx_fill_rect(int x,int y,int w,int h){ (void)x; (void)y; (void)w; (void)h; }
+void gfx_vline(int x,int y,int h){ (void)x; (void)y; (void)h; }
+void gfx_draw_text_mixed(int x,int y,const char* s){ (void)x; (void)s; if(g_row_y == -10000) g_row_y = y; }
+int gfx_width(void){ return 128; }
+int gfx_height(void){ return 64; }
+static void run(uint8_t key, int presses, const int* ticks, int n){
+  for(int i=0;i<presses;i++) mui_nav_on_key(key);
+  for(int i=0;i<n;i++){ g_now += (uint32_t)ticks[i]; mui_anim_update(); draw_menu_bare(0, 0); printf("%%d\n", g_row_y - 12); }
+}
+int main(void){
+  static const int down[] = { %(down)s };
+  static const int up[] = { %(up)s };
+  mui_nav_init(); mui_set_tick_source(fake_millis);
+  run(2, 4, down, %(n_down)d);  /* 第 4 次下移越过可见 4 行，视窗下滚一行 */
+  run(1, 4, up, %(n_up)d);      /* 回到第 0 项，视窗上滚一行 */
+  return 0;
+}
+"""
+
+def _ease(t):
+    mui_tools = pytest.importorskip("mui_tools")
+    return mui_tools.MenuPreview._ease(None, t)
+
+def _expected(prev, ticks):
+    """预览的 int(prev + (target-prev)*ease(t))，target 为 0，t 按已进行的毫秒数夹紧到 1"""
+    out, elapsed = [], 0
+    for dt in ticks:
+        elapsed = min(ANIM_MS, elapsed + dt)
+        out.append(int(prev + (0 - prev) * _ease(elapsed / ANIM_MS)))
+    return out
+
+@pytest.fixture
+def bare_dir(tmp_path):
+    root = MenuItem("root")
+    for i in range(12):
+        root.add_child(MenuItem(f"Item {i}", is_exec=True))
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(export_no_u8g2=True, emit_font_array=False, emit_cjk_subset=False,
+                    screen_width=128, screen_height=64)
+    return MuiExporter(settings, root, log=lambda *a: None).export(str(tmp_path / "out"))
+
+def test_tick_source_matches_preview_ease(bare_dir, tmp_path):
+    cc = shutil.which("gcc") or shutil.which("cc")
+    if not cc:
+        pytest.skip("没有 C 编译器")
+    src = tmp_path / "anim_main.c"
+    src.write_text(HARNESS % {"down": ", ".join(map(str, DOWN_TICKS)), "up": ", ".join(map(str, UP_TICKS)),
+                              "n_down": len(DOWN_TICKS), "n_up": len(UP_TICKS)}, encoding="utf-8")
+    exe = str(tmp_path / "anim_main")
+    menu = os.path.join(bare_dir, "menu")
+    port = os.path.join(bare_dir, "port")
+    subprocess.run([cc, "-O1", "-Wall", "-I", menu, "-I", port, str(src), os.path.join(menu, "menu_bare.c"), "-o", exe],
+                   check=True, capture_output=True, text=True)
+    offsets = [int(v) for v in subprocess.run([exe], check=True, capture_output=True, text=True).stdout.split()]
+
+    expected = _expected(12, DOWN_TICKS) + _expected(-12, UP_TICKS)
+    assert len(offsets) == len(expected)
+    for i, (got, want) in enumerate(zip(offsets, expected)):
+        assert abs(got - want) <= 1, f"第 {i} 帧：偏移 {got}，预览 {want}（{offsets} vs {expected}）"
+    # 迟到超过整段动画的一帧直接落到终点，不会多走
+    assert offsets[len(DOWN_TICKS) + 1] == 0
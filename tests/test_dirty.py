@@ -0,0 +1,65 @@
+# STM32 模板的局部刷新：经 I2C 模拟统计总线字节，空闲帧不发送，移动光标只发脏窗口
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from mui_core import MenuItem, MuiExporter, DEFAULT_SETTINGS
+
+W, H = 128, 64
+
+HARNESS = r"""
+#include <stdio.h>
+#include "menu_bare.h"
+#include "gfx_port.h"
+#include "i2c_mock.h"
+static uint32_t frame(void){
+  mui_i2c_mock_reset_counters();
+  draw_menu_bare(mui_get_cursor(), mui_get_view_start());
+  while(gfx_flush_busy()) mui_dma_mock_step();
+  return mui_i2c_bytes;
+}
+int main(void){
+  gfx_init(); mui_nav_init();
+  uint32_t full = frame();
+  uint32_t idle = frame();
+  mui_nav_on_key(2);
+  uint32_t move = frame();
+  uint32_t idle2 = frame();
+  printf("%u %u %u %u\n", (unsigned)full, (unsigned)idle, (unsigned)move, (unsigned)idle2);
+  return 0;
+}
+"""
+
+@pytest.fixture
+def bare_dir(tmp_path):
+    root = MenuItem("root")
+    for i in range(8):
+        root.add_child(MenuItem(f"Item {i}", is_exec=True))
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(export_no_u8g2=True, emit_font_array=False, emit_cjk_subset=False,
+                    screen_width=W, screen_height=H)
+    return MuiExporter(settings, root, log=lambda *a: None).export(str(tmp_path / "out"))
+
+def test_dirty_window_bytes(bare_dir, tmp_path):
+    cc = shutil.which("gcc") or shutil.which("cc")
+    if not cc:
+        pytest.skip("没有 C 编译器")
+    src = tmp_path / "dirty_main.c"
+    src.write_text(HARNESS, encoding="utf-8")
+    exe = str(tmp_path / "dirty_main")
+    menu = os.path.join(bare_dir, "menu")
+    port = os.path.join(bare_dir, "port")
+    host = os.path.join(port, "host")
+    subprocess.run([cc, "-O1", "-Wall", "-DMUI_I2C_MOCK", "-I", menu, "-I", port, "-I", host, str(src),
+                    os.path.join(menu, "menu_bare.c"), os.path.join(port, "gfx_text.c"),
+                    os.path.join(port, "stm32_std", "gfx_port_stm32_std.c"), os.path.join(host, "i2c_mock.c"),
+                    "-o", exe], check=True, capture_output=True, text=True)
+    full, idle, move, idle2 = map(int, subprocess.run([exe], check=True, capture_output=True, text=True).stdout.split())
+    # 首帧整屏：至少要发完全部显存
+    assert full >= W * H // 8
+    # 画面未变的帧不产生任何总线传输
+    assert idle == 0 and idle2 == 0
+    # 光标下移一行只重发选中条变化的窗口
+    assert 0 < move < W * H // 8
@@ -0,0 +1,67 @@
+# STM32 模板的 DMA 双缓冲刷新：用 -DMUI_I2C_MOCK 在主机上编译，逐段推进模拟 DMA
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from mui_core import MenuItem, MuiExporter, DEFAULT_SETTINGS
+
+# 直接包含模板源文件以便读到 static 的 shadow（前台缓冲）
+HARNESS = r"""
+#include <stdio.h>
+#include <string.h>
+#include "gfx_port_stm32_std.c"
+#include "i2c_mock.h"
+static int g_done;
+static void on_done(void){ g_done++; }
+int main(void){
+  static uint8_t front[sizeof(shadow)];
+  gfx_init(); gfx_set_flush_done_cb(on_done);
+  gfx_clear(); gfx_fill_rect(10, 3, 40, 20); gfx_hline(0, 60, 128);
+  gfx_send_async();
+  memcpy(front, shadow, sizeof(shadow));
+  int steps = 0, bad = 0;
+  while(mui_dma_mock_pending()){
+    /* 传输途中改写后台缓冲：前台缓冲不能跟着变，完成回调也不能提前触发 */
+    gfx_clear(); gfx_fill_rect(steps, 30, 20, 20);
+    if(memcmp(front, shadow, sizeof(shadow)) != 0) bad |= 1;
+    if(g_done != 0) bad |= 2;
+    mui_dma_mock_step(); steps++;
+  }
+  printf("%d %d %d %d %d\n", steps, g_done, gfx_flush_busy(), bad,
+         memcmp(front, mui_i2c_gddram, sizeof(front)) == 0);
+  return 0;
+}
+"""
+
+@pytest.fixture
+def port_dir(tmp_path):
+    root = MenuItem("root")
+    for i in range(4):
+        root.add_child(MenuItem(f"Item {i}", is_exec=True))
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(export_no_u8g2=True, emit_font_array=False, emit_cjk_subset=False,
+                    screen_width=128, screen_height=64)
+    return os.path.join(MuiExporter(settings, root, log=lambda *a: None).export(str(tmp_path / "out")), "port")
+
+def test_shadow_stable_while_dma_in_flight(port_dir, tmp_path):
+    cc = shutil.which("gcc") or shutil.which("cc")
+    if not cc:
+        pytest.skip("没有 C 编译器")
+    src = tmp_path / "flush_main.c"
+    src.write_text(HARNESS, encoding="utf-8")
+    exe = str(tmp_path / "flush_main")
+    stm32 = os.path.join(port_dir, "stm32_std")
+    host = os.path.join(port_dir, "host")
+    subprocess.run([cc, "-O1", "-Wall", "-DMUI_I2C_MOCK", "-I", port_dir, "-I", stm32, "-I", host,
+                    str(src), os.path.join(host, "i2c_mock.c"), "-o", exe],
+                   check=True, capture_output=True, text=True)
+    steps, done, busy, bad, match = map(int, subprocess.run([exe], check=True, capture_output=True,
+                                                            text=True).stdout.split())
+    # 首帧整屏刷新：每页一段窗口命令加一段数据
+    assert steps == 2 * 64 // 8
+    assert bad == 0, "传输途中前台缓冲被改写（1）或完成回调提前触发（2）"
+    assert done == 1 and busy == 0
+    # 显存收到的是发起时的那一帧，而不是之后改写的后台缓冲
+    assert match == 1
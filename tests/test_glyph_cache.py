@@ -0,0 +1,51 @@
+# 字形缓存全部命中时，导出不应加载 Qt：字形、步进与字体摘要都从缓存取得
+import filecmp
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+EXPORT = r"""
+import json, os, sys
+from mui_core import MenuItem, MuiExporter, DEFAULT_SETTINGS
+root = MenuItem("root")
+for name in ("Display", "设置", "About v1.2"):
+    root.add_child(MenuItem(name, is_exec=True))
+settings = dict(DEFAULT_SETTINGS)
+settings.update(json.loads(sys.argv[1]))
+MuiExporter(settings, root, log=lambda *a: None).export(sys.argv[2])
+print(json.dumps([m for m in sys.modules if m.split('.')[0] == 'PySide6']))
+sys.stdout.flush()
+os._exit(0)  # 跳过解释器退出时 Qt 的析构
+"""
+
+OPTIONS = [
+    {},
+    {'u8g2_font': True},
+    {'export_no_u8g2': True},
+    {'export_no_u8g2': True, 'preshape_labels': True, 'glyph_rle': True},
+]
+
+def _export(options, out):
+    import json
+    r = subprocess.run([sys.executable, "-c", EXPORT, json.dumps(options), str(out)], cwd=ROOT,
+                       capture_output=True, text=True, env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    assert r.returncode == 0, r.stderr
+    return json.loads(r.stdout.strip().splitlines()[-1])
+
+def _same_tree(a, b):
+    cmp = filecmp.dircmp(a, b)
+    if cmp.left_only or cmp.right_only or filecmp.cmpfiles(a, b, cmp.common_files, shallow=False)[1:] != ([], []):
+        return False
+    return all(_same_tree(os.path.join(a, d), os.path.join(b, d)) for d in cmp.common_dirs)
+
+@pytest.mark.parametrize("options", OPTIONS, ids=lambda o: ",".join(o) or "default")
+def test_cached_export_does_not_load_qt(options, tmp_path):
+    pytest.importorskip("PySide6")
+    options = dict(options, glyph_cache=True, glyph_cache_dir=str(tmp_path / "cache"))
+    assert _export(options, tmp_path / "cold"), "首次导出需要 Qt 栅格化"
+    assert _export(options, tmp_path / "warm") == []
+    assert _same_tree(str(tmp_path / "cold"), str(tmp_path / "warm"))
@@ -0,0 +1,22 @@
+# mui_core 供构建脚本导入：冷启动导入要快，且不能把 Qt 带进来
+import subprocess
+import sys
+
+from conftest import ROOT
+
+IMPORT_LIMIT_US = 50_000
+
+def _run(code, *flags):
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+def test_cold_import_time():
+    """-X importtime 的累计时间（微秒）取 mui_core 那一行，新解释器中测量，不受本进程已导入模块影响"""
+    r = _run("import mui_core", "-X", "importtime")
+    rows = [line.split("|") for line in r.stderr.splitlines() if line.rstrip().endswith("| mui_core")]
+    assert rows, r.stderr
+    cumulative = int(rows[-1][1])
+    assert cumulative < IMPORT_LIMIT_US, f"import mui_core 用时 {cumulative} us，超过 {IMPORT_LIMIT_US} us"
+
+def test_import_does_not_load_qt():
+    r = _run("import sys, mui_core; print([m for m in sys.modules if m.split('.')[0] == 'PySide6'])")
+    assert r.stdout.strip() == "[]"
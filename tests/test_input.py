@@ -0,0 +1,67 @@
+# 桩实现的按键消抖与事件队列：短于消抖时间的毛刺被忽略，按住只入队一次，队列满时丢弃新事件
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from mui_core import MenuItem, MuiExporter, DEFAULT_SETTINGS
+
+# 两者都按编译选项覆盖导出的默认值，与设备上的配置方式相同
+DEBOUNCE_MS = 10
+
+# 每个场景输出一行：依次取尽队列的事件，以 0 结尾
+HARNESS = r"""
+#include <stdio.h>
+#include "input_port.h"
+static void drain(void){ MenuKey k; while((k=input_port_pop())!=MENU_KEY_NONE) printf("%d ", (int)k); printf("0\n"); }
+static void press(uint8_t bits, uint32_t ms){ input_port_sim_set(bits); input_port_sim_advance(ms); input_port_sim_set(0); input_port_sim_advance(ms); }
+int main(void){
+  input_port_init();
+  /* 毛刺：按下 DEBOUNCE-1 ms 即松开 */
+  press(1u<<1, MUI_KEY_DEBOUNCE_MS-1); drain();
+  /* 抖动：反复在消抖时间内翻转，最终松开 */
+  for(int i=0;i<20;i++){ input_port_sim_set((uint8_t)((i&1)<<1)); input_port_sim_advance((uint32_t)(i%(MUI_KEY_DEBOUNCE_MS-1))+1); }
+  input_port_sim_set(0); input_port_sim_advance(50); drain();
+  /* 长按：只入队一次，按住期间 read 返回该键，松开后恢复 */
+  input_port_sim_set(1u<<2); input_port_sim_advance(500); printf("%d\n", (int)input_port_read()); drain();
+  input_port_sim_set(0); input_port_sim_advance(50); printf("%d\n", (int)input_port_read()); drain();
+  /* 溢出：不取事件连按 QUEUE_LEN+3 次，依次为 UP/DOWN/ENTER/BACK 循环 */
+  for(int i=0;i<MUI_KEY_QUEUE_LEN+3;i++) press((uint8_t)(1u<<(i&3)), MUI_KEY_DEBOUNCE_MS+2);
+  drain();
+  /* 取空后队列恢复可用 */
+  press(1u<<3, MUI_KEY_DEBOUNCE_MS+2); drain();
+  return 0;
+}
+"""
+
+@pytest.fixture(scope="module")
+def port_dir(tmp_path_factory):
+    root = MenuItem("root")
+    root.add_child(MenuItem("Item", is_exec=True))
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(export_no_u8g2=True, emit_font_array=False, emit_cjk_subset=False)
+    out = tmp_path_factory.mktemp("input") / "out"
+    return os.path.join(MuiExporter(settings, root, log=lambda *a: None).export(str(out)), "port")
+
+@pytest.mark.parametrize("queue_len", [8, 4])
+def test_debounce_and_queue_overflow(port_dir, tmp_path, queue_len):
+    cc = shutil.which("gcc") or shutil.which("cc")
+    if not cc:
+        pytest.skip("没有 C 编译器")
+    src = tmp_path / "input_main.c"
+    src.write_text(HARNESS, encoding="utf-8")
+    exe = str(tmp_path / "input_main")
+    subprocess.run([cc, "-O1", "-Wall", f"-DMUI_KEY_DEBOUNCE_MS={DEBOUNCE_MS}", f"-DMUI_KEY_QUEUE_LEN={queue_len}", "-I", port_dir, str(src),
+                    os.path.join(port_dir, "input_port.c"), "-o", exe], check=True, capture_output=True, text=True)
+    lines = subprocess.run([exe], check=True, capture_output=True, text=True).stdout.splitlines()
+    events = lambda line: [int(v) for v in line.split()][:-1]
+    up, down, enter, back = 1, 2, 3, 4
+    assert events(lines[0]) == [], "短于消抖时间的毛刺不应产生事件"
+    assert events(lines[1]) == [], "消抖时间内的抖动不应产生事件"
+    assert int(lines[2]) == enter and events(lines[3]) == [enter], "按住 500 ms 只入队一次"
+    assert int(lines[4]) == 0 and events(lines[5]) == []
+    # 队列满后丢弃新事件，保留最早的 queue_len 个
+    cycle = [up, down, enter, back]
+    assert events(lines[6]) == [cycle[i & 3] for i in range(queue_len)]
+    assert events(lines[7]) == [back]
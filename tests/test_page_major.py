@@ -0,0 +1,63 @@
+# 页布局字库（--page-major）只改变字形在 Flash 中的存放方式：仿真出的每一帧与默认按行导出逐字节相同
+import filecmp
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+pytestmark = [
+    pytest.mark.skipif(importlib.util.find_spec("PySide6") is None, reason="未安装 PySide6"),
+    pytest.mark.skipif(not (shutil.which("gcc") or shutil.which("cc")), reason="没有 C 编译器"),
+]
+
+KEYS = "DDDEDBUUD"
+
+SIMULATE = r"""
+import json, os, sys
+from mui_core import MenuItem, DEFAULT_SETTINGS
+from mui_sim import simulate, read_frames, parse_keys
+root = MenuItem("root")
+for name in ("Display", "Network", "About v1.2"):
+    root.add_child(MenuItem(name, is_exec=True))
+sub = MenuItem("Settings")
+for name in ("Brightness", "Contrast 50%", "Reset"):
+    sub.add_child(MenuItem(name, is_exec=True))
+root.add_child(sub)
+settings = dict(DEFAULT_SETTINGS)
+settings.update(json.loads(sys.argv[1]))
+out = sys.argv[2]
+simulate(settings, root, out, parse_keys(sys.argv[3]), bench=0, insns=False, preview=False, log=lambda *a: None)
+_, _, frames = read_frames(os.path.join(out, "sim", "frames.bin"))
+print(json.dumps([f.fb.hex() for f in frames]))
+sys.stdout.flush()
+os._exit(0)  # 跳过解释器退出时 Qt 的析构
+"""
+
+def _simulate(options, out):
+    base = {'export_no_u8g2': True, 'emit_cjk_subset': False, 'glyph_cache': False}
+    r = subprocess.run([sys.executable, "-c", SIMULATE, json.dumps(dict(base, **options)), str(out), KEYS], cwd=ROOT,
+                       capture_output=True, text=True, env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    assert r.returncode == 0, r.stderr
+    return json.loads(r.stdout.strip().splitlines()[-1])
+
+def test_page_major_renders_same_frames(tmp_path):
+    rows = _simulate({}, tmp_path / "rows")
+    pages = _simulate({'glyph_page_major': True}, tmp_path / "pages")
+    # 确认字库确实按页导出，且帧中画出了文字
+    with open(os.path.join(tmp_path / "pages", "MUI", "port", "gfx_text.c"), encoding="utf-8") as f:
+        assert "draw_bitmap_pages" in f.read()
+    assert any(int(fb, 16) for fb in rows)
+    assert len(rows) == len(pages)
+    for i, (a, b) in enumerate(zip(rows, pages)):
+        assert a == b, f"第 {i} 帧不同"
+    png_rows, png_pages = tmp_path / "rows" / "sim" / "frames", tmp_path / "pages" / "sim" / "frames"
+    names = sorted(os.listdir(png_rows))
+    assert names == sorted(os.listdir(png_pages))
+    match, mismatch, errors = filecmp.cmpfiles(png_rows, png_pages, names, shallow=False)
+    assert not mismatch and not errors
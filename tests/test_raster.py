@@ -0,0 +1,45 @@
+# 三条栅格化路径（逐像素参考、整图缓冲读取、图集批量绘制）对同一批字形给出逐位相同的位图
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+pytestmark = pytest.mark.skipif(importlib.util.find_spec("PySide6") is None, reason="未安装 PySide6")
+
+CHARS = "Ag8%设置菜单返回"
+
+RENDER = r"""
+import json, os, sys
+import mui_glyphs as g
+chars, px = sys.argv[1], int(sys.argv[2])
+family = "Microsoft YaHei"
+out = {
+    "pixel": [g.render_glyph_bitmap_pixel(ch, family, px) for ch in chars],
+    "buffer": [g.render_glyph_bitmap(ch, family, px) for ch in chars],
+    "atlas": g.render_glyph_atlas(chars, family, px),
+}
+g._np = None  # 无 NumPy 时的 bytes 回退
+out["atlas_bytes"] = g.render_glyph_atlas(chars, family, px)
+print(json.dumps({k: [[w, h, list(d)] for w, h, d in v] for k, v in out.items()}))
+sys.stdout.flush()
+os._exit(0)  # 跳过解释器退出时 Qt 的析构
+"""
+
+@pytest.mark.parametrize("px", [12, 16])
+def test_raster_paths_bit_identical(px):
+    r = subprocess.run([sys.executable, "-c", RENDER, CHARS, str(px)], cwd=ROOT, capture_output=True, text=True,
+                       env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    assert r.returncode == 0, r.stderr
+    paths = json.loads(r.stdout.strip().splitlines()[-1])
+    ref = paths.pop("pixel")
+    assert len(ref) == len(CHARS)
+    # 至少有字形含亮像素，否则比较没有意义
+    assert any(any(d) for _, _, d in ref)
+    for name, glyphs in paths.items():
+        for ch, want, got in zip(CHARS, ref, glyphs):
+            assert got == want, f"{name} 路径的 {ch!r}（{px}px）与逐像素参考不一致"
@@ -0,0 +1,57 @@
+# 游程压缩往返：整表统一选位宽编码后，用按位读取的参考解码还原，应与原位图逐位相同
+import random
+
+from mui_glyphs import glyph_runs, rle_choose_bits, rle_encode
+
+def _decode(data, w, h, b0, b1):
+    """与生成的 draw_glyph_rle 同序：高位在前读 (0 游程, 1 游程) 对，展开满 w*h 个像素为止"""
+    bits = ''.join(format(b, '08b') for b in data)
+    pixels, pos = [], 0
+    while len(pixels) < w * h:
+        z = int(bits[pos:pos + b0], 2)
+        o = int(bits[pos + b0:pos + b0 + b1], 2)
+        pos += b0 + b1
+        pixels += [0] * z + [1] * o
+    assert len(pixels) == w * h
+    stride = (w + 7) // 8
+    out = []
+    for y in range(h):
+        row = pixels[y*w:(y + 1)*w] + [0] * (stride*8 - w)
+        out += [int(''.join(map(str, row[i:i + 8])), 2) for i in range(0, stride*8, 8)]
+    return out
+
+def _glyph(w, h, fill):
+    stride = (w + 7) // 8
+    data = []
+    for y in range(h):
+        row = [fill(x, y) for x in range(w)] + [0] * (stride*8 - w)
+        data += [int(''.join(map(str, row[i:i + 8])), 2) for i in range(0, stride*8, 8)]
+    return w, h, data
+
+def _table():
+    rnd = random.Random(9)
+    return [
+        _glyph(16, 16, lambda x, y: 0),                      # 全 0：单个长 0 游程，需要拆分
+        _glyph(16, 16, lambda x, y: 1),                      # 全 0xFF：单个长 1 游程
+        _glyph(7, 12, lambda x, y: 1),                       # 宽度非 8 的倍数，行尾填充位不参与游程
+        _glyph(12, 12, lambda x, y: (x + y) & 1),            # 棋盘：全是长度 1 的游程
+        _glyph(11, 9, lambda x, y: int(x in (0, 10) or y in (0, 8))),
+        _glyph(1, 1, lambda x, y: 1),
+    ] + [_glyph(rnd.randint(1, 24), rnd.randint(1, 24), lambda x, y: int(rnd.random() < 0.3)) for _ in range(40)]
+
+def test_rle_round_trip_table():
+    table = _table()
+    runs = [glyph_runs(w, h, data) for w, h, data in table]
+    b0, b1 = rle_choose_bits(runs)
+    for (w, h, data), r in zip(table, runs):
+        enc, pairs = rle_encode(r, b0, b1)
+        assert len(enc) == (pairs * (b0 + b1) + 7) // 8
+        assert _decode(enc, w, h, b0, b1) == list(data)
+
+def test_rle_round_trip_narrow_widths():
+    # 位宽远小于游程长度时，超长游程拆成多对后仍可还原
+    for w, h, data in _table()[:4]:
+        runs = glyph_runs(w, h, data)
+        for b0, b1 in ((1, 1), (2, 3), (8, 1)):
+            enc, _ = rle_encode(runs, b0, b1)
+            assert _decode(enc, w, h, b0, b1) == list(data)
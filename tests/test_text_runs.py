@@ -0,0 +1,61 @@
+# U8G2 混排文字按 ASCII 段批量绘制：与逐字符参考实现画出的内容（计数桩校验和）相同，每个 ASCII 字符只解码一次
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+from mui_core import MuiExporter
+
+pytestmark = [
+    pytest.mark.skipif(importlib.util.find_spec("PySide6") is None, reason="未安装 PySide6"),
+    pytest.mark.skipif(not shutil.which("gcc"), reason="没有 gcc"),
+]
+
+RUN = MuiExporter.ASCII_RUN
+# 串中与串尾的段、恰好等于/超过 MUI_ASCII_RUN 的段（中间的段要分批拷贝）、段间夹中文与菜单外的字符
+LABELS = [
+    "Display",
+    "设置 Setup",
+    "Mode A/B 模式",
+    "x" * RUN + "设",
+    "L" * (RUN * 2 + 5) + "置" + "tail " * 10,
+    "a" * (RUN + 1) + "é" + "b" * (RUN - 1) + "菜单" + "c",
+    "中文",
+]
+
+BENCH = r"""
+import json, os, sys
+from mui_core import MenuItem, DEFAULT_SETTINGS
+from mui_sim import bench_text
+root = MenuItem("root")
+for name in json.loads(sys.argv[1]):
+    root.add_child(MenuItem(name, is_exec=True))
+settings = dict(DEFAULT_SETTINGS)
+settings.update(glyph_cache=False)
+lines = []
+errors = bench_text(settings, root, sys.argv[2], bench=0, log=lines.append)
+print(json.dumps({"errors": errors, "log": lines}))
+sys.stdout.flush()
+os._exit(0)  # 跳过解释器退出时 Qt 的析构
+"""
+
+def test_ascii_runs_match_per_char_reference(tmp_path):
+    r = subprocess.run([sys.executable, "-c", BENCH, json.dumps(LABELS), str(tmp_path / "out")], cwd=ROOT,
+                       capture_output=True, text=True, env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    assert r.returncode == 0, r.stderr
+    out = json.loads(r.stdout.strip().splitlines()[-1])
+    assert out["errors"] == []
+    # 每个菜单文字一行：参考实现每个字符解码两次（DrawStr 与 GetStrWidth 各一次），批量实现只解码一次
+    rows = {s: line.split() for line in out["log"] for s in LABELS if line.endswith(" " + s)}
+    assert len(rows) == len(LABELS)
+    for label, f in rows.items():
+        da, db = int(f[0]), int(f[2])
+        assert da == 2 * db and db >= sum(1 for ch in label if ord(ch) < 0x80), label
+    # 恰好 MUI_ASCII_RUN 个字符的中间段一次画完；更长的段按 MUI_ASCII_RUN 分批，串尾的段直接画原串
+    assert int(rows[LABELS[3]][5]) == 1
+    assert int(rows[LABELS[4]][5]) == -(-(RUN * 2 + 5) // RUN) + 1
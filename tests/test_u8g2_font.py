@@ -0,0 +1,127 @@
+# 原生 U8G2 字体：按 u8g2 的查找与解码流程读回导出的 mui_u8g2_font_{px}，与栅格化的源位图逐像素对照
+import importlib.util
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+pytestmark = pytest.mark.skipif(importlib.util.find_spec("PySide6") is None, reason="未安装 PySide6")
+
+# 含 0x80–0xFF 与 BMP 字符，后者多到跳转表分成多段
+LABELS = ("Café Größe", "Ελληνικά", "Русский язык", "设置菜单")
+
+EXPORT = r"""
+import json, os, sys
+from mui_core import MenuItem, MuiExporter, DEFAULT_SETTINGS
+from mui_glyphs import render_glyph_bitmap, crop_glyph, glyph_advances
+root = MenuItem("root")
+for name in json.loads(sys.argv[1]):
+    root.add_child(MenuItem(name, is_exec=True))
+settings = dict(DEFAULT_SETTINGS)
+settings.update(u8g2_font=True, glyph_cache=False)
+exporter = MuiExporter(settings, root, log=lambda *a: None)
+mui_dir = exporter.export(sys.argv[2])
+family = settings['font_family']
+px = exporter._parse_font_px()
+chars = exporter._u8g2_font_chars()
+src = []
+for ch, adv in zip(chars, glyph_advances(chars, family, px)):
+    xo, yo, w, h, data = crop_glyph(*render_glyph_bitmap(ch, family, px))
+    src.append([ord(ch), xo, px - (yo + h) if h else 0, w, h, list(data), max(0, min(adv, 127))])
+print(json.dumps({"dir": mui_dir, "px": px, "glyphs": src}))
+sys.stdout.flush()
+os._exit(0)  # 跳过解释器退出时 Qt 的析构
+"""
+
+class _Bits:
+    """u8g2_font_decode_get_unsigned_bits：字节内低位在前"""
+    def __init__(self, data, pos):
+        self.data, self.pos, self.bit = data, pos, 0
+
+    def get(self, n):
+        v = 0
+        for i in range(n):
+            v |= ((self.data[self.pos] >> self.bit) & 1) << i
+            self.bit += 1
+            if self.bit == 8:
+                self.bit, self.pos = 0, self.pos + 1
+        return v
+
+    def signed(self, n):
+        return self.get(n) - (1 << (n - 1))
+
+def _word(font, i):
+    return (font[i] << 8) | font[i + 1]
+
+def _find_glyph(font, code):
+    """u8g2_font_get_glyph_data：8 位码位从 A/a 起点顺序查找，其余先按跳转表定段再段内查找"""
+    body = 23
+    if code <= 0xFF:
+        p = body + (_word(font, 19) if code >= ord('a') else _word(font, 17) if code >= ord('A') else 0)
+        while font[p + 1]:
+            if font[p] == code:
+                return p + 2
+            p += font[p + 1]
+        return None
+    table = p = body + _word(font, 21)
+    while True:
+        p += _word(font, table)
+        end = _word(font, table + 2)
+        table += 4
+        if end >= code:
+            break
+    while True:
+        e = _word(font, p)
+        if e == 0:
+            return None
+        if e == code:
+            return p + 3
+        p += font[p + 2]
+
+def _decode(font, pos):
+    """u8g2_font_decode_glyph：读尺寸、偏移与步进，再展开 (0 游程, 1 游程, 重复位) 直到填满 h 行"""
+    bw, bh, bx, by, bd, b0, b1 = font[4], font[5], font[6], font[7], font[8], font[2], font[3]
+    r = _Bits(font, pos)
+    w, h = r.get(bw), r.get(bh)
+    xo, yo, adv = r.signed(bx), r.signed(by), r.signed(bd)
+    pixels = []
+    while w and len(pixels) < w * h:
+        a, b = r.get(b0), r.get(b1)
+        while True:
+            pixels += [0] * a + [1] * b
+            if not r.get(1):
+                break
+    return xo, yo, w, h, pixels[:w * h], adv
+
+def _unpack(w, h, data):
+    stride = (w + 7) // 8
+    return [(data[y*stride + x // 8] >> (7 - x % 8)) & 1 for y in range(h) for x in range(w)]
+
+def test_u8g2_font_decodes_to_source_bitmaps(tmp_path):
+    r = subprocess.run([sys.executable, "-c", EXPORT, json.dumps(LABELS), str(tmp_path / "out")], cwd=ROOT,
+                       capture_output=True, text=True, env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    assert r.returncode == 0, r.stderr
+    out = json.loads(r.stdout.strip().splitlines()[-1])
+    with open(os.path.join(out["dir"], "fonts", "mui_font.c"), encoding="utf-8") as f:
+        text = f.read()
+    m = re.search(r"const uint8_t mui_u8g2_font_%d\[(\d+)\][^=]*=\s*\{(.*?)\};" % out["px"], text, re.S)
+    assert m, "未找到导出的 U8G2 字体数组"
+    font = [int(v, 16) for v in re.findall(r"0x([0-9A-Fa-f]{2})", m.group(2))]
+    assert len(font) == int(m.group(1))
+
+    glyphs = out["glyphs"]
+    assert font[0] == len(glyphs)
+    assert any(code > 0xFF for code, *_ in glyphs) and any(0x80 <= code <= 0xFF for code, *_ in glyphs)
+    for code, xo, yo, w, h, data, adv in glyphs:
+        pos = _find_glyph(font, code)
+        assert pos is not None, f"U+{code:04X} 查找失败"
+        got = _decode(font, pos)
+        assert got[2:4] == (w, h) and got[0] == xo and got[1] == yo and got[5] == adv, f"U+{code:04X} 度量不一致"
+        assert got[4] == _unpack(w, h, data), f"U+{code:04X} 位图不一致"
+    # 不在字体中的码位查不到
+    assert _find_glyph(font, 0x7F) is None and _find_glyph(font, 0x4E00) is None